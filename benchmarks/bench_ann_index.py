@@ -0,0 +1,94 @@
+# benchmark for the IVF index over entity embeddings (data_api/ann_index.py): builds the
+# index over synthetic clustered unit vectors (embedding-like: many loose topics), then
+# compares recall@k and query latency for a range of nprobe values against exact
+# brute-force search, and times reopening the memory-mapped index and incremental inserts.
+#
+# usage: python benchmarks/bench_ann_index.py [--vectors 100000] [--dimensions 256] [--k 10]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_api'))
+
+from ann_index import IVFIndex
+
+def clustered_vectors(count: int, dimensions: int, clusters: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dimensions))
+    vectors = centers[rng.integers(0, clusters, count)] + rng.normal(scale=noise, size=(count, dimensions))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description='IVF index recall@k vs latency benchmark')
+    parser.add_argument('--vectors', type=int, default=100000)
+    parser.add_argument('--dimensions', type=int, default=256)
+    parser.add_argument('--clusters', type=int, default=500, help='Topics of the synthetic vectors')
+    parser.add_argument('--noise', type=float, default=1.5, help='Per-dimension spread around the topic centers')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', default='1,2,4,8,16,32,64', help='Comma-separated nprobe values to compare')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(args.seed)
+    vectors = clustered_vectors(args.vectors, args.dimensions, args.clusters, args.noise, rng)
+    keys = [f"bench-{i}" for i in range(args.vectors)]
+    # queries are perturbed indexed vectors, like a re-embedded, slightly changed description
+    queries = vectors[rng.integers(0, args.vectors, args.queries)] + rng.normal(scale=0.02, size=(args.queries, args.dimensions))
+    
+    index_dir = tempfile.mkdtemp(prefix='bench_ann_')
+    try:
+        start = time.perf_counter()
+        index = IVFIndex.build(index_dir, keys, vectors, args.nlist)
+        print(f"Built index of {len(index):,} x {args.dimensions} vectors in {index.nlist} lists "
+              f"in {time.perf_counter() - start:.1f}s")
+        
+        start = time.perf_counter()
+        index = IVFIndex(index_dir)
+        print(f"Reopened memory-mapped index in {(time.perf_counter() - start) * 1000:.1f} ms")
+        
+        exact = []
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            exact.append({key for key, _ in index.exact_search(query, args.k)})
+            latencies.append(time.perf_counter() - start)
+        print(f"\nexact        recall@{args.k} 1.000  p50 {percentile(latencies, 0.5) * 1000:7.3f} ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:7.3f} ms")
+        
+        for nprobe in map(int, args.nprobe.split(',')):
+            if nprobe > index.nlist:
+                break
+            latencies = []
+            found = 0
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                result = index.search(query, args.k, nprobe)
+                latencies.append(time.perf_counter() - start)
+                found += len(expected & {key for key, _ in result})
+            print(f"nprobe {nprobe:<5} recall@{args.k} {found / (args.k * len(queries)):.3f}  "
+                  f"p50 {percentile(latencies, 0.5) * 1000:7.3f} ms  p95 {percentile(latencies, 0.95) * 1000:7.3f} ms")
+        
+        extra = clustered_vectors(max(1, args.vectors // 100), args.dimensions, args.clusters, args.noise, rng)
+        start = time.perf_counter()
+        index.add([f"extra-{i}" for i in range(len(extra))], extra)
+        print(f"\nInserted {len(extra):,} vectors in {(time.perf_counter() - start) * 1000:.1f} ms")
+        hits = sum(index.search(vector, 1, 8)[0][0] == f"extra-{i}" for i, vector in enumerate(extra[:100]))
+        print(f"Inserted vectors found as their own nearest neighbour: {hits}/{min(100, len(extra))}")
+    finally:
+        shutil.rmtree(index_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmark for the bulk ingestion module (data_api/bulk_ingest.py) against a local
+# stand-in for the Weaviate batch endpoint: a threaded HTTP server that answers
+# POST /v1/batch/objects with a configurable per-request and per-object latency, a
+# share of transient 429/503 responses and per-object errors (it also serves the object
+# listing and batch delete used by data_api/delta_sync.py). It reports objects/s,
+# retries, the batch size the adaptive sizer settled on and how many objects the server
+# stored, which must equal the ingested count.
+#
+# usage: python benchmarks/bench_bulk_ingest.py [--objects 50000] [--workers 4] [--error-rate 0.05]
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_api'))
+
+from bulk_ingest import BATCH_ENDPOINT, AdaptiveBatchSizer, BatchClient, BulkIngester, iter_record_objects
+from kb_records import EntityRecord
+
+class StandInBatchServer(ThreadingHTTPServer):
+    """Emulates the Weaviate batch endpoint and keeps the stored objects by id"""
+    
+    daemon_threads = True
+    
+    def __init__(self, request_latency: float, object_latency: float, error_rate: float, object_error_rate: float,
+                 seed: int = 7):
+        super().__init__(('127.0.0.1', 0), StandInBatchHandler)
+        self.request_latency = request_latency
+        self.object_latency = object_latency
+        self.error_rate = error_rate
+        self.object_error_rate = object_error_rate
+        self.rng = random.Random(seed)
+        self.stored = {}
+        self.lock = threading.Lock()
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class StandInBatchHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def do_POST(self):
+        server = self.server
+        objects = json.loads(self.rfile.read(int(self.headers['Content-Length'])))["objects"]
+        if self.path != BATCH_ENDPOINT:
+            return self._reply(404, {"error": [{"message": f"no route {self.path}"}]})
+        
+        with server.lock:
+            transient = server.rng.random() < server.error_rate
+            object_errors = [server.rng.random() < server.object_error_rate for _ in objects]
+        time.sleep(server.request_latency + server.object_latency * len(objects))
+        if transient:
+            return self._reply(server.rng.choice([429, 503]), {"error": [{"message": "try again later"}]})
+        
+        results = []
+        with server.lock:
+            for obj, failed in zip(objects, object_errors):
+                if failed:
+                    results.append({"id": obj["id"], "result": {"errors": {"error": [{"message": "invalid object"}]}}})
+                else:
+                    server.stored[obj["id"]] = obj
+                    results.append({"id": obj["id"], "result": {}})
+        self._reply(200, results)
+    
+    def do_GET(self):
+        # cursor listing of /v1/objects, ordered by id like Weaviate's `after` cursor
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        with self.server.lock:
+            ids = sorted(object_id for object_id in self.server.stored if object_id > query.get('after', ''))
+            page = [self.server.stored[object_id] for object_id in ids[:int(query.get('limit', 25))]]
+        self._reply(200, {"objects": page, "totalResults": len(page)})
+    
+    def do_DELETE(self):
+        where = json.loads(self.rfile.read(int(self.headers['Content-Length'])))["match"]["where"]
+        with self.server.lock:
+            deleted = sum(self.server.stored.pop(object_id, None) is not None for object_id in where["valueTextArray"])
+        self._reply(200, {"results": {"matches": deleted, "successful": deleted, "failed": 0}})
+
+def synthetic_records(count: int):
+    for i in range(count):
+        yield EntityRecord("Synthetic", f"Synthetic\nName: Person {i}\nNotes: {'x' * 400}", f"bench-{i}", f"Person {i}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk ingestion benchmark against a local stand-in batch endpoint')
+    parser.add_argument('--objects', type=int, default=50000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--request-latency', type=float, default=0.02, help='Server latency per request (s)')
+    parser.add_argument('--object-latency', type=float, default=0.0002, help='Server latency per object (s)')
+    parser.add_argument('--error-rate', type=float, default=0.05, help='Share of requests answered with 429/503')
+    parser.add_argument('--object-error-rate', type=float, default=0.001, help='Share of objects rejected')
+    parser.add_argument('--target-latency', type=float, default=0.1, help='Batch latency the sizer aims for (s)')
+    args = parser.parse_args()
+    
+    server = StandInBatchServer(args.request_latency, args.object_latency, args.error_rate, args.object_error_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    failed_path = os.path.join(REPO_ROOT, 'benchmarks', 'bench_failed_objects.jsonl')
+    client = BatchClient(server.url)
+    sizer = AdaptiveBatchSizer(initial=50, maximum=2000, target_latency=args.target_latency)
+    ingester = BulkIngester(client, args.workers, sizer, max_retries=8, backoff_base=0.05, backoff_max=1.0,
+                            failed_path=failed_path)
+    try:
+        stats = ingester.run(iter_record_objects(synthetic_records(args.objects)), progress_every=args.objects + 1)
+    finally:
+        client.close()
+        server.shutdown()
+    
+    print(f"Ingested {stats['objects']:,} objects in {stats.elapsed:.2f}s: {stats.objects_per_second:,.0f} objects/s")
+    print(f"{stats['batches']} batches, {stats['retries']} retries, final batch size {sizer.size}, "
+          f"{stats['failed']} failed objects")
+    print(f"Server stored {len(server.stored):,} objects")
+    assert len(server.stored) == stats['objects'], "server and client disagree on stored objects"
+    if os.path.exists(failed_path):
+        os.remove(failed_path)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# benchmark for the offline fuzzy name index (data_api/name_index.py): builds the index
+# over a synthetic corpus of a few hundred thousand names, then times noisy queries
+# (typos, broken spacing, case and token order changes) derived from indexed names and
+# reports latency percentiles and recall of the true entity.
+#
+# usage: python benchmarks/bench_name_index.py [--entities 150000] [--queries 2000]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_api'))
+
+from name_index import NameIndex, JaroWinkler
+
+# onset + vowel + coda syllables give a letter distribution close to transliterated names
+ONSETS = ['', 'b', 'ch', 'd', 'f', 'g', 'h', 'j', 'k', 'kh', 'l', 'm', 'n', 'p', 'r', 's', 'sh', 't', 'v', 'y', 'z', 'zh']
+VOWELS = ['a', 'e', 'i', 'o', 'u', 'ai', 'ei', 'ia', 'ou', 'y']
+CODAS = ['', '', '', 'b', 'd', 'k', 'l', 'm', 'n', 'ng', 'r', 's', 't', 'v', 'z']
+SYLLABLES = [onset + vowel + coda for onset in ONSETS for vowel in VOWELS for coda in CODAS]
+
+def random_token(rng: random.Random) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+
+def random_name(rng: random.Random) -> str:
+    return ' '.join(random_token(rng) for _ in range(rng.randint(2, 4)))
+
+def perturb(name: str, rng: random.Random) -> str:
+    """One or two of: typo, dropped/added space, case change, token reordering"""
+    for _ in range(rng.randint(1, 2)):
+        kind = rng.choice(['typo', 'space', 'case', 'order'])
+        if kind == 'typo' and len(name) > 4:
+            i = rng.randrange(1, len(name) - 1)
+            name = name[:i] + rng.choice('aeioukst') + name[i + 1:]
+        elif kind == 'space' and len(name) > 4:
+            i = rng.randrange(1, len(name) - 1)
+            name = name[:i] + ' ' + name[i:] if name[i] != ' ' else name[:i] + name[i + 1:]
+        elif kind == 'case':
+            name = name.upper() if rng.random() < 0.5 else name.lower()
+        else:
+            tokens = name.split()
+            rng.shuffle(tokens)
+            name = ' '.join(tokens)
+    return name
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description='Fuzzy name index benchmark')
+    parser.add_argument('--entities', type=int, default=150000, help='Synthetic entities (each with 1-4 names)')
+    parser.add_argument('--queries', type=int, default=2000, help='Noisy queries to time')
+    parser.add_argument('--limit', type=int, default=10, help='Matches returned per query')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    index = NameIndex()
+    entity_names = []
+    
+    start = time.perf_counter()
+    for i in range(args.entities):
+        names = [random_name(rng) for _ in range(rng.randint(1, 4))]
+        entity_names.append(names)
+        index.add_entity(f"bench-{i}", "Synthetic", names)
+    index.freeze()
+    build_time = time.perf_counter() - start
+    print(f"Similarity backend: {'rapidfuzz' if JaroWinkler is not None else 'pure Python Jaro-Winkler'}")
+    print(f"Built index of {len(index):,} names / {args.entities:,} entities in {build_time:.1f}s")
+    
+    queries = []
+    for _ in range(args.queries):
+        entity = rng.randrange(args.entities)
+        queries.append((f"bench-{entity}", perturb(rng.choice(entity_names[entity]), rng)))
+    
+    latencies = []
+    hits_at_1 = hits_at_k = 0
+    for expected_id, query in queries:
+        start = time.perf_counter()
+        matches = index.search(query, args.limit)
+        latencies.append(time.perf_counter() - start)
+        
+        ids = [match.entity_id for match in matches]
+        hits_at_1 += bool(ids) and ids[0] == expected_id
+        hits_at_k += expected_id in ids
+    
+    print(f"Latency: p50 {percentile(latencies, 0.50) * 1000:.3f} ms, p95 {percentile(latencies, 0.95) * 1000:.3f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.3f} ms, mean {statistics.mean(latencies) * 1000:.3f} ms")
+    print(f"Throughput: {len(queries) / sum(latencies):,.0f} queries/s")
+    print(f"Recall@1 {hits_at_1 / len(queries):.3f}, recall@{args.limit} {hits_at_k / len(queries):.3f}")
+
+if __name__ == "__main__":
+    main()
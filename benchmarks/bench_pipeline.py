@@ -0,0 +1,250 @@
+# end-to-end benchmark of the knowledge-base build and the local search paths on a synthetic
+# corpus of configurable size (synthetic_corpus.py): times process_json_files (serial, with
+# a process pool and with cross-dataset merging), process_tpl_csv, format_entity_description
+# per entity, save_results_to_files, and building and querying LocalSearch (BM25) and NameIndex.
+# Every stage reports throughput, latency percentiles (per call for the per-entity and query
+# stages, per run for the bulk stages) and peak Python heap from a separate tracemalloc
+# pass. Results are written as JSON with the git commit, so two runs can be compared with
+# --compare to spot regressions.
+#
+# usage: python benchmarks/bench_pipeline.py [--entities 200000] [--repeat 3] [--workers 4]
+#            [--output bench_pipeline.json] [--compare previous.json] [--corpus-dir DIR]
+
+import argparse
+import collections
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_preprocessing'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_api'))
+
+import data_preprocess
+from local_search import LocalSearch
+from name_index import NameIndex
+
+from bench_name_index import perturb, percentile
+from synthetic_corpus import generate_corpus
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def latency_summary(seconds: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": percentile(seconds, 0.50) * 1000,
+        "p95_ms": percentile(seconds, 0.95) * 1000,
+        "p99_ms": percentile(seconds, 0.99) * 1000,
+        "mean_ms": statistics.mean(seconds) * 1000,
+    }
+
+def peak_heap_mb(function: Callable[[], Any]) -> float:
+    """Peak Python heap allocated while function runs (worker processes are not seen)"""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+def bench_runs(function: Callable[[], Any], items: int, repeat: int, trace_memory: bool) -> Dict[str, Any]:
+    """Time whole runs of a bulk stage; throughput is items per second of the median run"""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return {
+        "items": items,
+        "runs": repeat,
+        "throughput": items / statistics.median(seconds),
+        "latency": latency_summary(seconds),
+        "peak_heap_mb": peak_heap_mb(function) if trace_memory else None,
+    }
+
+def bench_calls(function: Callable[[Any], Any], inputs: Sequence[Any], trace_memory: bool) -> Dict[str, Any]:
+    """Time every call of a per-item stage; throughput is calls per second of summed latency"""
+    seconds = []
+    for value in inputs:
+        start = time.perf_counter()
+        function(value)
+        seconds.append(time.perf_counter() - start)
+    
+    def one_pass():
+        for value in inputs:
+            function(value)
+    
+    return {
+        "items": len(inputs),
+        "runs": 1,
+        "throughput": len(inputs) / sum(seconds),
+        "latency": latency_summary(seconds),
+        "peak_heap_mb": peak_heap_mb(one_pass) if trace_memory else None,
+    }
+
+def quiet(function: Callable[..., Any]) -> Callable[..., Any]:
+    """Drop the per-folder progress lines the pipeline prints"""
+    def call(*args, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function(*args, **kwargs)
+    return call
+
+def decoded_entities(data_raw_path: str, limit: int) -> List[Tuple[Dict[str, Any], str]]:
+    """(entity, dataset name) pairs of the first limit target entities, for the formatter stage"""
+    entities = []
+    stats = collections.Counter()
+    for _, json_file_path, dataset_name in data_preprocess.find_entity_files(data_raw_path):
+        with data_preprocess.open_entity_lines(json_file_path) as lines:
+            for line in lines:
+                entity = data_preprocess.decode_entity_line(line, json_file_path, stats)
+                if entity is not None:
+                    entities.append((entity, dataset_name))
+                    if len(entities) >= limit:
+                        return entities
+    return entities
+
+def run_stages(corpus: Dict[str, Any], args) -> Dict[str, Dict[str, Any]]:
+    data_raw_path = corpus["data_raw_path"]
+    lines = sum(info["lines"] for info in corpus["datasets"].values())
+    stages = {}
+    
+    def report(stage: str, result: Dict[str, Any], unit: str):
+        result["unit"] = unit
+        stages[stage] = result
+        latency = result["latency"]
+        memory = f", peak heap {result['peak_heap_mb']:.1f} MB" if result["peak_heap_mb"] is not None else ""
+        print(f"{stage:<28} {result['throughput']:>12,.0f} {unit}/s   p50 {latency['p50_ms']:9.3f} ms  "
+              f"p95 {latency['p95_ms']:9.3f} ms  p99 {latency['p99_ms']:9.3f} ms{memory}")
+    
+    process_json_files = quiet(data_preprocess.process_json_files)
+    report("process_json_files", bench_runs(lambda: process_json_files(data_raw_path), lines, args.repeat, args.memory), "lines")
+    if args.workers > 1:
+        report(f"process_json_files_x{args.workers}",
+               bench_runs(lambda: process_json_files(data_raw_path, args.workers), lines, args.repeat, False), "lines")
+    report("process_json_files_merge",
+           bench_runs(lambda: process_json_files(data_raw_path, merge=True), lines, args.repeat, args.memory), "lines")
+    
+    process_tpl_csv = quiet(data_preprocess.process_tpl_csv)
+    report("process_tpl_csv", bench_runs(lambda: process_tpl_csv(corpus["tpl_csv_path"]), corpus["tpl_rows"],
+                                         args.repeat, args.memory), "rows")
+    
+    entities = decoded_entities(data_raw_path, args.format_sample)
+    report("format_entity_description",
+           bench_calls(lambda pair: data_preprocess.format_entity_description(*pair), entities, args.memory), "entities")
+    
+    sources, descriptions, ids, names = process_json_files(data_raw_path)
+    output_dir = tempfile.mkdtemp(prefix='bench_pipeline_out_')
+    try:
+        save_results_to_files = quiet(data_preprocess.save_results_to_files)
+        report("save_results_to_files",
+               bench_runs(lambda: save_results_to_files(sources, descriptions, ids, names, output_dir),
+                          len(ids), args.repeat, args.memory), "records")
+        stages["save_results_to_files"]["output_bytes"] = sum(
+            os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir))
+    finally:
+        shutil.rmtree(output_dir)
+    
+    records = [data_preprocess.EntityRecord(*row) for row in zip(sources, descriptions, ids, names)]
+    rng = random.Random(args.seed)
+    name_queries = [perturb(rng.choice(records).name, rng) for _ in range(args.queries)]
+    text_queries = [' '.join(rng.sample(record.description.split(), 3)) for record in rng.sample(records, args.queries)]
+    
+    search = None
+    
+    def build_local_search():
+        nonlocal search
+        search = LocalSearch(records)
+    report("local_search_build", bench_runs(build_local_search, len(records), 1, args.memory), "records")
+    report("local_search_bm25", bench_calls(lambda query: search.bm25(query, 10), text_queries, args.memory), "queries")
+    
+    index = None
+    
+    def build_name_index():
+        nonlocal index
+        index = NameIndex.from_records(records)
+    report("name_index_build", bench_runs(build_name_index, len(records), 1, args.memory), "records")
+    report("name_index_search", bench_calls(lambda query: index.search(query, 10), name_queries, args.memory), "queries")
+    
+    return stages
+
+def compare(results: Dict[str, Any], baseline_path: str):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {(baseline.get('commit') or 'unknown')[:10]}):")
+    if baseline.get("params") != results["params"]:
+        print("Warning: the runs used different parameters, bulk stage latencies are not comparable")
+    for stage, result in results["stages"].items():
+        previous = baseline["stages"].get(stage)
+        if previous is None:
+            print(f"{stage:<28} new stage")
+            continue
+        ratio = result["throughput"] / previous["throughput"]
+        p95 = result["latency"]["p95_ms"] / previous["latency"]["p95_ms"]
+        print(f"{stage:<28} throughput x{ratio:.2f}  p95 x{p95:.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Preprocessing and search benchmark on a synthetic corpus')
+    parser.add_argument('--entities', type=int, default=200000, help='Synthetic entity lines over all datasets')
+    parser.add_argument('--tpl-rows', type=int, default=2000)
+    parser.add_argument('--corpus-dir', default=None, help='Keep the generated corpus here (default: temporary)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs of every bulk stage')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes for the parallel ingest stage')
+    parser.add_argument('--format-sample', type=int, default=50000, help='Entities timed one by one in the formatter stage')
+    parser.add_argument('--queries', type=int, default=1000, help='Queries per search stage')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the tracemalloc passes')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='bench_pipeline.json', help='JSON results file')
+    parser.add_argument('--compare', default=None, help='Results file of an earlier run to compare against')
+    args = parser.parse_args()
+    
+    corpus_dir = args.corpus_dir or tempfile.mkdtemp(prefix='bench_pipeline_corpus_')
+    try:
+        start = time.perf_counter()
+        corpus = generate_corpus(corpus_dir, args.entities, args.tpl_rows, args.seed)
+        corpus_bytes = sum(info["bytes"] for info in corpus["datasets"].values())
+        print(f"Generated {args.entities:,} entity lines ({corpus_bytes / 1024 / 1024:.0f} MB) and "
+              f"{args.tpl_rows:,} TPL rows in {time.perf_counter() - start:.1f}s")
+        
+        stages = run_stages(corpus, args)
+    finally:
+        if args.corpus_dir is None:
+            shutil.rmtree(corpus_dir)
+    
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "orjson": data_preprocess.orjson is not None,
+        "params": {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'corpus_dir')},
+        "corpus": {"datasets": corpus["datasets"], "tpl_rows": corpus["tpl_rows"], "tpl_bytes": corpus["tpl_bytes"]},
+        "stages": stages,
+        # ru_maxrss is in KB on Linux
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+    
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
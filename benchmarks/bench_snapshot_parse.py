@@ -0,0 +1,106 @@
+# benchmark for the offline TPS parse stage (data_intake/parse_snapshots.py): writes a
+# synthetic snapshot archive of detail pages padded with site boilerplate (navigation,
+# footer, scripts) to the size of real TPS pages, then times re-parsing it with the old
+# inline BeautifulSoup html.parser extraction, the lxml extraction in one process, and the
+# lxml extraction in a process pool, and checks that all three extract the same fields.
+#
+# usage: python benchmarks/bench_snapshot_parse.py [--pages 5000] [--workers 4]
+
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from urllib.parse import urljoin
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_intake'))
+
+from bs4 import BeautifulSoup
+
+from parse_snapshots import parse_snapshots
+from snapshot_archive import SnapshotArchive, iter_snapshots
+
+BASE_URL = "https://www.tps.ca"
+SUSPECT_PATH = "/organizational-chart/specialized-operations-command/detective-operations/investigative-services/homicide/suspect/{}/"
+
+NAV = '\n'.join(f'<li><a href="/section-{i}/">Section {i} of the Toronto Police Service site</a></li>' for i in range(250))
+SCRIPT = "<script>window.dataLayer = window.dataLayer || []; function gtag(){dataLayer.push(arguments);} var note = 'Age: 0';</script>" * 20
+
+def detail_page(i: int) -> str:
+    return f"""<html><head><title>Suspect {i}</title>{SCRIPT}</head><body>
+<nav><ul>{NAV}</ul></nav>
+<main><h1>Suspect NUMBER{i}</h1>
+<p>Case #: 2025-{1000000 + i}</p>
+<p>{i % 55 + 11} Division</p>
+<p>Date of Birth: Nov. {i % 28 + 1}, {1960 + i % 40}</p>
+<p>Age: {20 + i % 50}</p>
+<p>Gender: {'MF'[i % 2]}</p>
+<img src="/media/homicide/suspect/{i % 10}/{i}.jpg.350x400_q85.jpg">
+<p>{'Anyone with information is asked to contact police. ' * 40}</p></main>
+<footer>{NAV}</footer></body></html>"""
+
+def old_extract(html: str):
+    """The scraper's former inline extraction"""
+    soup = BeautifulSoup(html, 'html.parser')
+    text_content = soup.get_text()
+    patterns = {
+        'case_number': r'Case #:\s*([^\n]+)',
+        'division': r'(\d+)\s+Division',
+        'date_of_birth': r'Date of Birth:\s*([^\n]+)',
+        'age': r'Age:\s*(\d+)',
+        'gender': r'Gender:\s*([MF])',
+        'homicide_case': r'Homicide #:\s*([^\n]+)'
+    }
+    details = {}
+    for field, pattern in patterns.items():
+        match = re.search(pattern, text_content)
+        if match:
+            details[field] = match.group(1).strip()
+    photo_img = soup.find('img', src=re.compile(r'/media/homicide/suspect/'))
+    if photo_img:
+        details['photo_url'] = urljoin(BASE_URL, photo_img['src'])
+    return details
+
+def main():
+    parser = argparse.ArgumentParser(description='BeautifulSoup vs lxml (serial and parallel) snapshot parsing')
+    parser.add_argument('--pages', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--baseline-pages', type=int, default=500, help='Pages timed with the BeautifulSoup baseline')
+    args = parser.parse_args()
+    
+    archive_dir = tempfile.mkdtemp(prefix='bench_snapshots_')
+    try:
+        start = time.perf_counter()
+        with SnapshotArchive(archive_dir) as archive:
+            for i in range(args.pages):
+                url = BASE_URL + SUSPECT_PATH.format(i)
+                archive.add(url, detail_page(i), 'detail', suspect_id=str(i), name=f"Suspect NUMBER{i}", link=url)
+        raw_size = sum(len(detail_page(i).encode('utf-8')) for i in range(min(args.pages, 100))) / min(args.pages, 100)
+        print(f"Archived {args.pages} pages of ~{raw_size / 1024:.0f} KB in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(archive.path) / 1024 / 1024:.1f} MB compressed "
+              f"({os.path.getsize(archive.path) / (raw_size * args.pages):.1%} of raw)")
+        
+        snapshots = list(iter_snapshots(archive_dir))
+        
+        start = time.perf_counter()
+        baseline = [old_extract(snapshot['html']) for snapshot in snapshots[:args.baseline_pages]]
+        elapsed = time.perf_counter() - start
+        print(f"BeautifulSoup html.parser  {len(baseline) / elapsed:8.0f} pages/s")
+        
+        results = {}
+        for label, workers in (('lxml, 1 process', 1), (f'lxml, {args.workers} processes', args.workers)):
+            start = time.perf_counter()
+            results[label] = [extracted for _, _, extracted in parse_snapshots(iter_snapshots(archive_dir), workers)]
+            elapsed = time.perf_counter() - start
+            print(f"{label:<26} {len(results[label]) / elapsed:8.0f} pages/s (including decompression)")
+        
+        same = all(result[:len(baseline)] == baseline for result in results.values())
+        print(f"Extracted fields identical to the BeautifulSoup baseline: {same}")
+    finally:
+        shutil.rmtree(archive_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# benchmark and offline test of the TPS scraper's HTTP mode (data_intake/tpl_most_wanted_selenium.py):
+# serves a listing page and suspect detail pages from a local threaded HTTP server, either
+# saved TPS pages (--pages, one index.html per URL path, e.g.
+# <pages>/organizational-chart/.../homicide/most-wanted/index.html) or pages rendered from
+# tpl_most_wanted.csv, with a simulated per-request latency. Compares sequential and pooled
+# detail fetching, checks the per-host concurrency cap seen by the server and that the
+# extracted fields match the CSV. The server answers conditional requests (ETag), and an
+# incremental section counts the requests of repeated runs with a page cache: cold, with
+# nothing changed, and after one suspect's listing entry and detail page changed. A last
+# section lets the server throttle (429 + Retry-After above --server-rate requests/s) and
+# runs the scraper's adaptive rate limiter against it. The incremental runs archive their
+# pages, and the CSV rebuilt offline from that archive must equal the scraped one.
+#
+# usage: python benchmarks/bench_tps_fetch.py [--latency 0.2] [--workers 8] [--max-per-host 4] [--pages DIR]
+
+import argparse
+import collections
+import contextlib
+import csv
+import hashlib
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data_intake'))
+
+from parse_snapshots import parse_snapshots, rebuild_rows, write_rows
+from snapshot_archive import iter_snapshots
+from tpl_most_wanted_selenium import AdaptiveRateLimiter, SeleniumTPSScraper
+
+SUSPECT_PATH = "/organizational-chart/specialized-operations-command/detective-operations/investigative-services/homicide/suspect/{}/"
+CHECKED_FIELDS = ['name', 'suspect_id', 'case_number', 'division', 'date_of_birth', 'age', 'gender', 'photo_url']
+
+def render_listing(rows) -> str:
+    links = '\n'.join(f'<li><a href="{SUSPECT_PATH.format(row["suspect_id"])}">{escape(row["name"])}</a></li>' for row in rows)
+    return f"<html><head><title>Homicide Most Wanted</title></head><body><ul>\n{links}\n</ul></body></html>"
+
+def render_detail(row) -> str:
+    fields = [f"<h1>{escape(row['name'])}</h1>"]
+    if row.get('case_number'):
+        fields.append(f"<p>Case #: {escape(row['case_number'])}</p>")
+    if row.get('division'):
+        fields.append(f"<p>{escape(row['division'])} Division</p>")
+    if row.get('date_of_birth'):
+        fields.append(f"<p>Date of Birth: {escape(row['date_of_birth'])}</p>")
+    if row.get('age'):
+        fields.append(f"<p>Age: {escape(row['age'])}</p>")
+    if row.get('gender'):
+        fields.append(f"<p>Gender: {escape(row['gender'])}</p>")
+    if row.get('photo_url'):
+        fields.append(f'<img src="{escape(urlparse(row["photo_url"]).path)}">')
+    return "<html><head><title>Suspect</title></head><body>\n" + '\n'.join(fields) + "\n</body></html>"
+
+def csv_pages_for(rows, most_wanted_url: str):
+    pages = {most_wanted_url: render_listing(rows)}
+    for row in rows:
+        pages[SUSPECT_PATH.format(row['suspect_id'])] = render_detail(row)
+    return pages
+
+def csv_pages(csv_path: str, most_wanted_url: str):
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    return csv_pages_for(rows, most_wanted_url), rows
+
+def saved_pages(pages_dir: str):
+    pages = {}
+    for root, _, files in os.walk(pages_dir):
+        if 'index.html' in files:
+            relative = os.path.relpath(root, pages_dir)
+            path = '/' if relative == '.' else '/' + relative.replace(os.sep, '/') + '/'
+            with open(os.path.join(root, 'index.html'), 'r', encoding='utf-8') as f:
+                pages[path] = f.read()
+    return pages
+
+class StandInTPSServer(ThreadingHTTPServer):
+    """Serves fixed pages after a simulated latency and records peak concurrency"""
+    
+    daemon_threads = True
+    
+    def __init__(self, pages, latency: float, challenge_every: int = 0, max_rate: float = 0.0):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.pages = pages
+        self.latency = latency
+        self.challenge_every = challenge_every
+        self.max_rate = max_rate
+        self.recent = collections.deque()
+        self.requests = 0
+        self.not_modified = 0
+        self.throttled = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+    
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, *args):
+        pass
+    
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            number = server.requests
+            server.in_flight += 1
+            server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+            # sliding one-second window of accepted requests
+            now = time.monotonic()
+            while server.recent and server.recent[0] < now - 1:
+                server.recent.popleft()
+            throttle = bool(server.max_rate) and len(server.recent) >= server.max_rate
+            if throttle:
+                server.throttled += 1
+            else:
+                server.recent.append(now)
+        try:
+            if throttle:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            time.sleep(server.latency)
+            page = server.pages.get(urlparse(self.path).path)
+            status = 200 if page is not None else 404
+            challenge = '/suspect/' in self.path and server.challenge_every and number % server.challenge_every == 0
+            if challenge:
+                status, page = 403, ("<html><head><title>Just a moment...</title></head><body>"
+                                     "<form id=\"challenge-form\" action=\"/\" method=\"POST\"></form></body></html>")
+            body = (page or "<html><head><title>404 Not Found</title></head></html>").encode('utf-8')
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if status == 200 and self.headers.get('If-None-Match') == etag:
+                with server.lock:
+                    server.not_modified += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(status)
+            if status == 200:
+                self.send_header('ETag', etag)
+            if challenge:
+                self.send_header('Server', 'cloudflare')
+                self.send_header('cf-mitigated', 'challenge')
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+def unpaced() -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(rate=1000.0, burst=1000, max_rate=1000.0)
+
+def scrape(server: StandInTPSServer, workers: int, max_per_host: int, rate_limiter: AdaptiveRateLimiter):
+    scraper = SeleniumTPSScraper(headless=True, base_url=server.url, http=True, workers=workers, max_per_host=max_per_host,
+                                 rate_limiter=rate_limiter)
+    scraper.setup_session()
+    try:
+        suspects = scraper.get_suspects_from_main_page()
+        start = time.perf_counter()
+        details = list(scraper.iter_suspect_details(suspects))
+        return details, time.perf_counter() - start, scraper.browser_fallbacks
+    finally:
+        scraper.session.close()
+        if scraper.driver:
+            scraper.driver.quit()
+
+def incremental_run(server: StandInTPSServer, workers: int, max_per_host: int, output: str, cache_dir: str,
+                    snapshot_dir: str):
+    scraper = SeleniumTPSScraper(headless=True, base_url=server.url, http=True, workers=workers,
+                                 max_per_host=max_per_host, cache_dir=cache_dir, rate_limiter=unpaced(),
+                                 snapshot_dir=snapshot_dir)
+    requests_before, not_modified_before = server.requests, server.not_modified
+    with contextlib.redirect_stdout(io.StringIO()):
+        scraper.run(output)
+    return server.requests - requests_before, server.not_modified - not_modified_before
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequential vs pooled TPS detail-page fetching against a local server')
+    parser.add_argument('--csv', default=os.path.join(REPO_ROOT, 'data_intake', 'tpl_most_wanted.csv'),
+                        help='CSV the stand-in pages are rendered from (and checked against)')
+    parser.add_argument('--pages', default=None, help='Directory of saved TPS pages to serve instead')
+    parser.add_argument('--latency', type=float, default=0.2, help='Simulated server response time in seconds')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--max-per-host', type=int, default=4)
+    parser.add_argument('--challenge-every', type=int, default=0,
+                        help='Answer every n-th request with a 403 challenge page (exercises the browser fallback)')
+    parser.add_argument('--server-rate', type=float, default=5.0,
+                        help='Requests per second the server accepts in the throttling section')
+    args = parser.parse_args()
+    
+    logging.getLogger('tpl_most_wanted_selenium').setLevel(logging.WARNING)
+    most_wanted_url = SeleniumTPSScraper().most_wanted_url
+    if args.pages:
+        pages, expected = saved_pages(args.pages), None
+    else:
+        pages, expected = csv_pages(args.csv, most_wanted_url)
+    
+    server = StandInTPSServer(pages, args.latency, args.challenge_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    
+    # the scraper writes debug_page_source.html to the working directory
+    work_dir = tempfile.mkdtemp(prefix='bench_tps_')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        results = {}
+        for label, workers in (('sequential', 1), ('pooled', args.workers)):
+            server.peak_in_flight = 0
+            details, elapsed, fallbacks = scrape(server, workers, args.max_per_host, unpaced())
+            results[label] = details
+            print(f"{label:<10} {len(details)} detail pages in {elapsed:.2f}s ({len(details) / elapsed:.1f} pages/s), "
+                  f"peak {server.peak_in_flight} concurrent requests, {fallbacks} browser fallbacks")
+        
+        if expected is not None:
+            print()
+            output = os.path.join(work_dir, 'tpl_most_wanted.csv')
+            cache_dir = os.path.join(work_dir, 'page_cache')
+            snapshot_dir = os.path.join(work_dir, 'snapshots')
+            for label in ('cold', 'unchanged', 'one changed'):
+                if label == 'one changed':
+                    row = dict(expected[0], name=expected[0]['name'] + ' Jr', age='99')
+                    server.pages.update(csv_pages_for([row] + expected[1:], most_wanted_url))
+                requests, not_modified = incremental_run(server, args.workers, args.max_per_host, output, cache_dir,
+                                                         snapshot_dir)
+                print(f"incremental run, {label:<12} {requests:3} requests ({not_modified} not modified)")
+            
+            rebuilt = os.path.join(work_dir, 'rebuilt.csv')
+            write_rows(rebuild_rows(parse_snapshots(iter_snapshots(snapshot_dir), workers=2)), rebuilt)
+            with open(output, 'r', encoding='utf-8') as f, open(rebuilt, 'r', encoding='utf-8') as g:
+                scraped = [{k: v for k, v in row.items() if k != 'scraped_at'} for row in csv.DictReader(f)]
+                offline = [{k: v for k, v in row.items() if k != 'scraped_at'} for row in csv.DictReader(g)]
+            print(f"offline rebuild from the snapshot archive: {'matches' if scraped == offline else 'DIFFERS from'} the scraped CSV")
+        
+        # the browser mode's fixed pacing: 2-4 s after every load plus 2-5 s after every detail page
+        print(f"\nfixed random sleeps (old pacing) would take about {6.5 * len(results['pooled']):.0f}s")
+        server.max_rate = args.server_rate
+        server.throttled = 0
+        server.recent.clear()
+        limiter = AdaptiveRateLimiter()
+        details, elapsed, fallbacks = scrape(server, args.workers, args.max_per_host, limiter)
+        complete = sum(1 for row in details if row.get('case_number') or row.get('age'))
+        print(f"adaptive rate limit vs a {args.server_rate:g}/s server: {len(details)} detail pages in {elapsed:.2f}s, "
+              f"{complete} complete, {server.throttled} throttled (429), final rate {limiter.rate:.2f}/s")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir)
+        server.shutdown()
+    
+    if server.peak_in_flight > args.max_per_host:
+        print(f"FAIL: {server.peak_in_flight} concurrent requests exceed the per-host cap of {args.max_per_host}")
+    
+    if expected is not None:
+        got = {details['suspect_id']: details for details in results['pooled']}
+        # photo URLs are checked by path, the stand-in server is not www.tps.ca
+        mismatches = [(row['suspect_id'], field) for row in expected for field in CHECKED_FIELDS
+                      if urlparse(got.get(row['suspect_id'], {}).get(field, '')).path != urlparse(row[field]).path]
+        print(f"Field check against {os.path.basename(args.csv)}: "
+              f"{'ok' if not mismatches else f'{len(mismatches)} mismatches, e.g. {mismatches[:5]}'}")
+
+if __name__ == "__main__":
+    main()
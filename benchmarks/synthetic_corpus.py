@@ -0,0 +1,253 @@
+# generator of synthetic OpenSanctions-scale inputs for the preprocessing benchmarks: writes
+# a data_raw-style folder with one entities.ftm.json per dataset (OFAC SDN, Canadian
+# sanctions, FBI most wanted) in the compact FtM export layout, and a TPL-style most-wanted
+# CSV. Like the real exports most lines are not screening targets: Sanction, Address,
+# Identification and Ownership entities and target:false copies sit between the Person,
+# Organization, LegalEntity and Vessel targets, which carry many aliases (in several
+# scripts) and long multi-paragraph notes. A share of the targets of the later datasets
+# are the same person or company as a target listed before, linked by a shared referent.
+#
+# usage: python benchmarks/synthetic_corpus.py OUTPUT_DIR [--entities 200000] [--tpl-rows 2000] [--seed 7]
+
+import argparse
+import csv
+import json
+import os
+import random
+from typing import Any, Dict, List, Tuple
+
+from bench_name_index import random_name
+
+# folder name -> (share of the generated lines, dataset id); folder names follow infer_dataset_name
+DATASETS = {
+    'opensanctions-ofac-sdn': (0.70, 'us_ofac_sdn'),
+    'opensanctions-canada-sanctions': (0.25, 'ca_dfatd_sema_sanctions'),
+    'opensanctions-fbi-most-wanted': (0.05, 'us_fbi_most_wanted'),
+}
+
+# share of the lines per schema; the first four are the target schemas
+SCHEMA_WEIGHTS = {
+    'Person': 0.22,
+    'Organization': 0.12,
+    'LegalEntity': 0.04,
+    'Vessel': 0.02,
+    'Sanction': 0.30,
+    'Address': 0.12,
+    'Identification': 0.10,
+    'Ownership': 0.06,
+    'Airplane': 0.02,
+}
+NON_TARGET_SHARE = 0.08
+# share of the targets of every dataset after the first that were already listed by an earlier one
+CROSS_LISTED_SHARE = 0.15
+
+COUNTRIES = ['ru', 'ir', 'kp', 'sy', 'cn', 'ae', 'tr', 'by', 've', 'cu', 'mx', 'co', 'lb', 'iq', 'pa', 'us', 'ca', 'gb']
+PROGRAMS = ['SDGT', 'RUSSIA-EO14024', 'IRAN', 'DPRK3', 'CYBER2', 'SDNTK', 'UKRAINE-EO13662', 'GLOMAG', 'SEMA-RU']
+VESSEL_TYPES = ['Crude Oil Tanker', 'General Cargo', 'Bulk Carrier', 'Container Ship', 'LPG Tanker', 'Yacht']
+COMPANY_SUFFIXES = ['LLC', 'LTD', 'JSC', 'FZE', 'GMBH', 'TRADING CO', 'HOLDING', 'SHIPPING LTD', 'GROUP']
+SENTENCES = [
+    "is wanted for alleged involvement in a conspiracy to violate the International Emergency Economic Powers Act.",
+    "A federal arrest warrant was issued in the United States District Court after the subject was charged with wire fraud.",
+    "The entity is owned or controlled by, or acted for or on behalf of, a person whose property is blocked.",
+    "Operates in the technology sector of the Russian Federation economy and procures dual-use components.",
+    "Has been involved in the shipment of petroleum products in violation of applicable sanctions.",
+    "Should be considered armed and dangerous; the subject has ties to several countries in the region.",
+    "Provided financial, material, or technological support for, or goods or services to, a designated group.",
+]
+CYRILLIC = 'абвгдежзиклмнопрстуфхцчшщэюя'
+ARABIC = 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي'
+
+def random_script_name(rng: random.Random, alphabet: str) -> str:
+    return ' '.join(''.join(rng.choice(alphabet) for _ in range(rng.randint(4, 9))) for _ in range(rng.randint(2, 3)))
+
+def random_date(rng: random.Random, first_year: int = 1950, last_year: int = 2005) -> str:
+    return f"{rng.randint(first_year, last_year)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+def random_notes(rng: random.Random, subject: str) -> List[str]:
+    """One to three paragraphs, some of them several hundred characters long"""
+    return [' '.join(f"{subject} {rng.choice(SENTENCES)}" for _ in range(rng.randint(1, 8)))
+            for _ in range(rng.randint(1, 3))]
+
+def random_aliases(rng: random.Random, name: str) -> List[str]:
+    """Spelling variants and transliterations; a few entities get dozens"""
+    count = rng.choice([0, 1, 2, 3, 5, 8]) if rng.random() < 0.95 else rng.randint(20, 60)
+    aliases = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.5:
+            aliases.append(random_name(rng))
+        elif kind < 0.7:
+            aliases.append(name.title().replace(' ', '-', 1))
+        elif kind < 0.85:
+            aliases.append(random_script_name(rng, CYRILLIC))
+        else:
+            aliases.append(random_script_name(rng, ARABIC))
+    return aliases
+
+def target_properties(schema: str, name: str, rng: random.Random) -> Dict[str, List[str]]:
+    properties = {"name": [name], "topics": ["sanction"], "country": rng.sample(COUNTRIES, rng.randint(1, 2))}
+    if rng.random() < 0.8:
+        properties["alias"] = random_aliases(rng, name)
+    if rng.random() < 0.6:
+        properties["notes"] = random_notes(rng, name.title())
+    if rng.random() < 0.7:
+        properties["programId"] = rng.sample(PROGRAMS, rng.randint(1, 2))
+    if rng.random() < 0.5:
+        properties["address"] = [f"{rng.randint(1, 999)} {random_name(rng)} Street, {rng.choice(COUNTRIES).upper()}"]
+    properties["sourceUrl"] = [f"https://sanctionssearch.example.org/entity/{rng.getrandbits(48):x}"]
+    
+    if schema == 'Person':
+        tokens = name.split()
+        properties.update({
+            "firstName": [tokens[0]], "lastName": [tokens[-1]], "gender": [rng.choice(['male', 'female'])],
+            "birthDate": [random_date(rng) for _ in range(rng.randint(1, 2))],
+            "nationality": rng.sample(COUNTRIES, 1),
+        })
+        if len(tokens) > 2:
+            properties["middleName"] = tokens[1:-1]
+        if rng.random() < 0.3:
+            properties.update({"birthPlace": [f"{random_name(rng)}, {rng.choice(COUNTRIES).upper()}"],
+                               "height": [f"{rng.randint(5, 6)}'{rng.randint(0, 11)}\""],
+                               "weight": [f"{rng.randint(120, 260)} pounds"],
+                               "eyeColor": [rng.choice(['Brown', 'Blue', 'Green'])],
+                               "hairColor": [rng.choice(['Black', 'Brown', 'Blond'])]})
+        if rng.random() < 0.4:
+            properties["passportNumber"] = [f"{rng.randint(10**7, 10**8 - 1)}"]
+    elif schema in ('Organization', 'LegalEntity'):
+        properties["incorporationDate"] = [random_date(rng, 1990, 2023)]
+        properties["registrationNumber"] = [str(rng.randint(10**9, 10**10 - 1)) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.5:
+            properties["taxNumber"] = [str(rng.randint(10**9, 10**10 - 1))]
+    elif schema == 'Vessel':
+        properties.update({
+            "imoNumber": [str(rng.randint(9000000, 9999999))], "flag": rng.sample(COUNTRIES, 1),
+            "callSign": [''.join(rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ') for _ in range(4))],
+            "mmsi": [str(rng.randint(10**8, 10**9 - 1))], "type": [rng.choice(VESSEL_TYPES)],
+        })
+    return properties
+
+def other_properties(schema: str, rng: random.Random) -> Dict[str, List[str]]:
+    """Properties of the supporting entities that are never ingested"""
+    if schema == 'Sanction':
+        return {"authority": ["Office of Foreign Assets Control"], "program": rng.sample(PROGRAMS, 1),
+                "startDate": [random_date(rng, 2001, 2025)], "reason": random_notes(rng, "The subject")[:1]}
+    if schema == 'Address':
+        return {"full": [f"{rng.randint(1, 999)} {random_name(rng)} Street"], "country": rng.sample(COUNTRIES, 1)}
+    if schema == 'Identification':
+        return {"number": [str(rng.randint(10**7, 10**9))], "type": ["Passport"], "country": rng.sample(COUNTRIES, 1)}
+    if schema == 'Ownership':
+        return {"percentage": [str(rng.randint(1, 100))], "role": ["Shareholder"]}
+    return {"name": [random_name(rng).upper()], "registrationNumber": [f"EP-{rng.randint(100, 999)}"]}
+
+def random_entity(rng: random.Random, index: int, dataset_id: str, earlier: List[Tuple[str, str, str]],
+                  listed: List[Tuple[str, str, str]]) -> Dict[str, Any]:
+    """One entity line. earlier holds (schema, name, referent) of the targets of the datasets
+    written before, which this one may list again; new targets are appended to listed."""
+    schema = rng.choices(list(SCHEMA_WEIGHTS), weights=list(SCHEMA_WEIGHTS.values()))[0]
+    is_target_schema = schema in ('Person', 'Organization', 'LegalEntity', 'Vessel')
+    entity_id = f"NK-syn{dataset_id[:4]}{index:08d}"
+    referents = [f"{dataset_id}-{index}"] + [f"usgsa-{rng.getrandbits(40):x}" for _ in range(rng.randint(0, 2))]
+    
+    if is_target_schema:
+        if earlier and rng.random() < CROSS_LISTED_SHARE:
+            schema, name, listed_referent = rng.choice(earlier)
+            referents.append(listed_referent)
+        else:
+            name = random_name(rng).upper()
+            if schema in ('Organization', 'LegalEntity'):
+                name = f"{name} {rng.choice(COMPANY_SUFFIXES)}"
+            listed.append((schema, name, referents[0]))
+        properties = target_properties(schema, name, rng)
+        caption = name
+    else:
+        properties = other_properties(schema, rng)
+        caption = properties.get("name", [f"{schema} {index}"])[0]
+    
+    first_seen = f"{random_date(rng, 2015, 2024)}T{rng.randint(0, 23):02d}:00:00"
+    return {
+        "id": entity_id,
+        "caption": caption,
+        "schema": schema,
+        "properties": properties,
+        "referents": referents,
+        "datasets": [dataset_id],
+        "first_seen": first_seen,
+        "last_seen": "2025-07-22T17:29:01",
+        "last_change": first_seen,
+        "target": is_target_schema and rng.random() >= NON_TARGET_SHARE,
+    }
+
+def write_entities_file(path: str, count: int, dataset_id: str, rng: random.Random,
+                        earlier: List[Tuple[str, str, str]]) -> int:
+    """Write count entity lines in the compact export layout, return the file size;
+    the new targets are added to earlier once the file is written"""
+    listed = []
+    with open(path, 'w', encoding='utf-8') as f:
+        for index in range(count):
+            entity = random_entity(rng, index, dataset_id, earlier, listed)
+            f.write(json.dumps(entity, ensure_ascii=False, separators=(',', ':')))
+            f.write('\n')
+    earlier.extend(listed)
+    return os.path.getsize(path)
+
+def write_tpl_csv(path: str, count: int, rng: random.Random) -> int:
+    """Write a TPL most-wanted CSV with the scraper's columns, return the file size"""
+    headers = ['name', 'suspect_id', 'link', 'homicide_case', 'case_number', 'division',
+               'date_of_birth', 'age', 'gender', 'photo_url', 'scraped_at', 'source']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=headers)
+        writer.writeheader()
+        for index in range(count):
+            suspect_id = str(1000 + index)
+            tokens = random_name(rng).split()
+            writer.writerow({
+                'name': ' '.join(tokens[:-1] + [tokens[-1].upper()]),
+                'suspect_id': suspect_id,
+                'link': f"https://www.tps.ca/organizational-chart/specialized-operations-command/detective-operations/investigative-services/homicide/suspect/{suspect_id}/",
+                'homicide_case': f"{rng.randint(1, 90)}/{rng.randint(2010, 2025)}" if rng.random() < 0.3 else '',
+                'case_number': f"{rng.randint(2010, 2025)}-{rng.randint(1000000, 2999999)}",
+                'division': str(rng.choice([11, 12, 13, 14, 22, 23, 31, 32, 33, 41, 42, 43, 51, 52, 53, 55])),
+                'date_of_birth': f"Nov. {rng.randint(1, 28)}, {rng.randint(1960, 2005)}" if rng.random() < 0.7 else '',
+                'age': str(rng.randint(18, 70)),
+                'gender': rng.choice('MF'),
+                'photo_url': f"https://www.tps.ca/media/homicide/suspect/{suspect_id[-1]}/{rng.getrandbits(64):x}.jpg.350x400_q85.jpg",
+                'scraped_at': '2025-07-22 01:18:17',
+                'source': 'selenium_scraper',
+            })
+    return os.path.getsize(path)
+
+def generate_corpus(output_dir: str, entities: int, tpl_rows: int, seed: int = 7) -> Dict[str, Any]:
+    """Write <output_dir>/data_raw/<dataset>/entities.ftm.json and <output_dir>/tpl_most_wanted.csv;
+    return their paths, line counts and sizes"""
+    rng = random.Random(seed)
+    data_raw_path = os.path.join(output_dir, 'data_raw')
+    corpus = {"data_raw_path": data_raw_path, "seed": seed, "datasets": {}}
+    earlier = []
+    
+    for folder_name, (share, dataset_id) in DATASETS.items():
+        folder_path = os.path.join(data_raw_path, folder_name)
+        os.makedirs(folder_path, exist_ok=True)
+        count = max(1, int(entities * share))
+        size = write_entities_file(os.path.join(folder_path, 'entities.ftm.json'), count, dataset_id, rng, earlier)
+        corpus["datasets"][folder_name] = {"lines": count, "bytes": size}
+    
+    corpus["tpl_csv_path"] = os.path.join(output_dir, 'tpl_most_wanted.csv')
+    corpus["tpl_rows"] = tpl_rows
+    corpus["tpl_bytes"] = write_tpl_csv(corpus["tpl_csv_path"], tpl_rows, rng)
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic FtM + TPL corpus for the preprocessing benchmarks')
+    parser.add_argument('output_dir', help='Folder to write data_raw/ and tpl_most_wanted.csv into')
+    parser.add_argument('--entities', type=int, default=200000, help='Entity lines over all datasets')
+    parser.add_argument('--tpl-rows', type=int, default=2000, help='Rows of the TPL CSV')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    corpus = generate_corpus(args.output_dir, args.entities, args.tpl_rows, args.seed)
+    for folder_name, info in corpus["datasets"].items():
+        print(f"{folder_name}: {info['lines']:,} lines, {info['bytes'] / 1024 / 1024:.1f} MB")
+    print(f"{corpus['tpl_csv_path']}: {corpus['tpl_rows']:,} rows, {corpus['tpl_bytes'] / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    main()
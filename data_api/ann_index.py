@@ -0,0 +1,255 @@
+# persisted approximate-nearest-neighbour index over the entity embeddings (IVF-flat:
+# k-means coarse quantizer + inverted lists, cosine similarity), so vector search does
+# not scan every entity as more datasets are added. The index directory is append-only
+# and memory-mapped on load, so it opens without rebuilding, and new entities can be
+# inserted without retraining the centroids.
+#
+# index directory layout:
+#   meta.json       dimensions, list count, committed vector count and keys.txt size
+#   centroids.f32   nlist x dimensions unit-length float32 centroids
+#   vectors.f32     count x dimensions unit-length float32 vectors, in insertion order
+#   lists.i32       inverted list of every vector
+#   keys.txt        key (e.g. object uuid) of every vector, one per line
+# meta.json is replaced last, so a partially appended tail is ignored and truncated on the next insert.
+
+import json
+import os
+from typing import List, Iterable, Optional, Sequence, Tuple
+
+from kb_records import DEFAULT_KB_PATH, iter_kb_records, record_uuid
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+KMEANS_ITERATIONS = 20
+# Training sample per centroid; more barely improves the quantizer
+KMEANS_SAMPLE_PER_LIST = 256
+
+def _unit_rows(vectors) -> 'np.ndarray':
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    if not vectors.size:
+        raise ValueError("Expected at least one non-empty vector")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def train_centroids(vectors, nlist: int, seed: int = 0) -> 'np.ndarray':
+    """Spherical k-means on a sample of unit vectors"""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > nlist * KMEANS_SAMPLE_PER_LIST:
+        sample = vectors[rng.choice(len(vectors), nlist * KMEANS_SAMPLE_PER_LIST, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    
+    for _ in range(KMEANS_ITERATIONS):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=nlist)
+        # re-seed empty lists with random sample points
+        empty = counts == 0
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _unit_rows(sums)
+    return centroids
+
+class IVFIndex:
+    """IVF-flat cosine index stored in a directory (see module header).
+    
+    search() scores the nprobe lists whose centroids are closest to the query;
+    nprobe trades recall for latency (nprobe = nlist is exact search).
+    """
+    
+    def __init__(self, path: str):
+        if np is None:
+            raise ImportError("numpy is required for the ANN index")
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.dimensions = meta["dimensions"]
+        self.nlist = meta["nlist"]
+        self.count = meta["count"]
+        self._keys_size = meta["keys_size"]
+        
+        self.centroids = np.fromfile(os.path.join(path, 'centroids.f32'), dtype=np.float32).reshape(self.nlist, self.dimensions)
+        with open(os.path.join(path, 'keys.txt'), 'rb') as f:
+            self.keys = f.read(self._keys_size).decode('utf-8').splitlines()
+        self._map_vectors()
+    
+    def _map_vectors(self):
+        vectors_path = os.path.join(self.path, 'vectors.f32')
+        if self.count:
+            self.vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(self.count, self.dimensions))
+        else:
+            self.vectors = np.zeros((0, self.dimensions), dtype=np.float32)
+        lists = np.fromfile(os.path.join(self.path, 'lists.i32'), dtype=np.int32, count=self.count)
+        
+        # members of list i are order[offsets[i]:offsets[i + 1]]
+        self._order = np.argsort(lists, kind='stable').astype(np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=self.nlist))])
+    
+    def __len__(self):
+        return self.count
+    
+    @classmethod
+    def build(cls, path: str, keys: Sequence[str], vectors, nlist: Optional[int] = None, seed: int = 0) -> 'IVFIndex':
+        """Train the centroids on `vectors` and write a new index to `path`"""
+        if np is None:
+            raise ImportError("numpy is required for the ANN index")
+        if not len(keys) or not len(vectors):
+            raise ValueError("Cannot build an IVF index without keys and vectors")
+        if len(keys) != len(vectors):
+            raise ValueError(f"Got {len(keys)} keys for {len(vectors)} vectors")
+        vectors = _unit_rows(vectors)
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        
+        os.makedirs(path, exist_ok=True)
+        centroids = train_centroids(vectors, nlist, seed)
+        lists = np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+        
+        # store vectors grouped by list so every probed list is one contiguous read
+        order = np.argsort(lists, kind='stable')
+        centroids.tofile(os.path.join(path, 'centroids.f32'))
+        vectors[order].tofile(os.path.join(path, 'vectors.f32'))
+        lists[order].tofile(os.path.join(path, 'lists.i32'))
+        with open(os.path.join(path, 'keys.txt'), 'wb') as f:
+            keys_size = f.write(''.join(keys[i] + '\n' for i in order).encode('utf-8'))
+        _write_meta(path, vectors.shape[1], nlist, len(vectors), keys_size)
+        return cls(path)
+    
+    def add(self, keys: Sequence[str], vectors):
+        """Append vectors to their closest lists, keeping the trained centroids; adding
+        nothing is a no-op"""
+        if len(keys) != len(vectors):
+            raise ValueError(f"Got {len(keys)} keys for {len(vectors)} vectors")
+        if not len(keys):
+            return
+        vectors = _unit_rows(vectors)
+        if vectors.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+        lists = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+        
+        # drop a tail beyond the committed count left by an interrupted insert
+        committed = (('vectors.f32', self.count * self.dimensions * 4), ('lists.i32', self.count * 4),
+                     ('keys.txt', self._keys_size))
+        for name, size in committed:
+            os.truncate(os.path.join(self.path, name), size)
+        with open(os.path.join(self.path, 'vectors.f32'), 'ab') as f:
+            vectors.tofile(f)
+        with open(os.path.join(self.path, 'lists.i32'), 'ab') as f:
+            lists.tofile(f)
+        with open(os.path.join(self.path, 'keys.txt'), 'ab') as f:
+            self._keys_size += f.write(''.join(key + '\n' for key in keys).encode('utf-8'))
+        
+        _write_meta(self.path, self.dimensions, self.nlist, self.count + len(vectors), self._keys_size)
+        self.count += len(vectors)
+        self.keys.extend(keys)
+        self._map_vectors()
+    
+    def search(self, vector: Sequence[float], k: int = 10, nprobe: int = 8) -> List[Tuple[str, float]]:
+        """(key, cosine similarity) of the approximate k nearest vectors, best first"""
+        if k <= 0 or nprobe <= 0:
+            raise ValueError(f"k and nprobe must be positive, got k={k}, nprobe={nprobe}")
+        if not self.count:
+            return []
+        query = _unit_rows(vector)[0]
+        nprobe = min(nprobe, self.nlist)
+        probes = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        
+        candidates = np.concatenate([self._order[self._offsets[p]:self._offsets[p + 1]] for p in probes])
+        if not len(candidates):
+            return []
+        candidates.sort()
+        scores = self.vectors[candidates] @ query
+        
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.keys[candidates[i]], float(scores[i])) for i in top]
+    
+    def exact_search(self, vector: Sequence[float], k: int = 10) -> List[Tuple[str, float]]:
+        """Brute-force reference search over every vector"""
+        if k <= 0:
+            raise ValueError(f"k must be positive, got {k}")
+        if not self.count:
+            return []
+        scores = self.vectors @ _unit_rows(vector)[0]
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(self.keys[i], float(scores[i])) for i in top]
+
+def _write_meta(path: str, dimensions: int, nlist: int, count: int, keys_size: int):
+    tmp_path = os.path.join(path, 'meta.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"dimensions": dimensions, "nlist": nlist, "count": count, "keys_size": keys_size}, f)
+    os.replace(tmp_path, os.path.join(path, 'meta.json'))
+
+def cached_entity_vectors(records: Iterable, embedding_cache) -> Tuple[List[str], List[List[float]]]:
+    """(record uuids, vectors) of the records whose description is in the embedding cache"""
+    keys = []
+    vectors = []
+    for record in records:
+        vector = embedding_cache.get(record.description)
+        if vector is not None:
+            keys.append(record_uuid(record))
+            vectors.append(vector)
+    return keys, vectors
+
+def stale_keys(index: IVFIndex, keys: Sequence[str], vectors) -> Tuple[List[str], List[str]]:
+    """(changed, removed): keys of the index whose vector differs from the given one, and
+    keys of the index that are not given at all"""
+    positions = {key: i for i, key in enumerate(index.keys)}
+    known = [(positions[key], key, vector) for key, vector in zip(keys, vectors) if key in positions]
+    changed = []
+    if known:
+        stored = np.asarray(index.vectors[[i for i, _, _ in known]])
+        differs = np.abs(stored - _unit_rows([vector for _, _, vector in known])).max(axis=1) > 1e-5
+        changed = [key for (_, key, _), stale in zip(known, differs) if stale]
+    given = set(keys)
+    removed = [key for key in index.keys if key not in given]
+    return changed, removed
+
+def main():
+    import argparse
+    
+    from embedding_cache import DEFAULT_CACHE_DIR, EmbeddingCache
+    
+    parser = argparse.ArgumentParser(description='Build or extend the IVF index over the cached entity embeddings')
+    parser.add_argument('index', help='Index directory')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv or .kbc file')
+    parser.add_argument('--embedding-cache', default=DEFAULT_CACHE_DIR, help='EmbeddingCache directory with the entity vectors')
+    parser.add_argument('--nlist', type=int, default=None, help='Inverted lists (default 4 * sqrt(count))')
+    parser.add_argument('--add', action='store_true', help='Insert entities missing from an existing index instead of rebuilding; '
+                             'still rebuilds when an indexed entity changed or was removed')
+    
+    args = parser.parse_args()
+    
+    with EmbeddingCache(args.embedding_cache) as cache:
+        keys, vectors = cached_entity_vectors(iter_kb_records(args.kb), cache)
+    if not keys and not args.add:
+        raise SystemExit(f"No vectors of {args.kb} in {args.embedding_cache}, nothing to index")
+    
+    if args.add:
+        index = IVFIndex(args.index)
+        # the index is append-only: a changed vector or a removed entity needs a rebuild
+        changed, removed = stale_keys(index, keys, vectors)
+        if not changed and not removed:
+            known = set(index.keys)
+            new = [(key, vector) for key, vector in zip(keys, vectors) if key not in known]
+            if new:
+                index.add([key for key, _ in new], [vector for _, vector in new])
+            print(f"Added {len(new)} entities, index has {len(index)} vectors in {index.nlist} lists")
+            return
+        print(f"{len(changed)} indexed entities changed and {len(removed)} were removed, rebuilding")
+        if not keys:
+            raise SystemExit(f"No vectors of {args.kb} in {args.embedding_cache}, nothing to index")
+    
+    index = IVFIndex.build(args.index, keys, vectors, args.nlist)
+    print(f"Built index of {len(index)} vectors in {index.nlist} lists")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# batch screening of bulk counterparty files (CSV or JSONL of query names with optional
+# date of birth and country) against the processed knowledge base. The fuzzy name index
+# is built once and shared with a process pool; queries are screened in chunks and the
+# matches are streamed to a CSV or JSONL file in input order.
+#
+# usage: python batch_screening.py customers.csv --output matches.csv --workers 8
+#        python batch_screening.py vessels.csv --kb ../data_preprocessing/processed_entities_shards --schemas Vessel
+
+import collections
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+
+from kb_records import DEFAULT_KB_PATH, iter_kb_records, open_kb_text
+from data_preprocess import description_field_values
+from name_index import NameIndex
+
+DEFAULT_CHUNK_SIZE = 256
+
+# Score adjustments once the name matched; an unknown DOB/country on either side is neutral
+DOB_MATCH_BONUS = 0.05
+DOB_MISMATCH_PENALTY = 0.15
+COUNTRY_MATCH_BONUS = 0.02
+COUNTRY_MISMATCH_PENALTY = 0.05
+
+# Accepted input column names (case-insensitive) for each query field
+QUERY_COLUMNS = {
+    'query_id': ['query_id', 'id', 'customer_id', 'reference'],
+    'name': ['name', 'query', 'full_name'],
+    'birth_date': ['birth_date', 'dob', 'date_of_birth', 'birthdate'],
+    'country': ['country', 'nationality', 'country_code'],
+}
+
+OUTPUT_FIELDS = ['query_id', 'query_name', 'entity_id', 'source', 'matched_name',
+                 'name_score', 'dob_match', 'country_match', 'score']
+
+# Written formats: ISO dates/years (FtM) and "Oct. 21, 1986" style dates (TPL)
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m', '%Y', '%b %d, %Y', '%B %d, %Y', '%d/%m/%Y', '%d %b %Y', '%d %B %Y']
+_DATE_CLEANUP = re.compile(r'(?<=[A-Za-z])\.|(?<=Sep)t(?=\.? )')
+
+class ScreeningQuery(NamedTuple):
+    query_id: str
+    name: str
+    birth_date: Optional[str] = None
+    country: Optional[str] = None
+
+class EntityProfile(NamedTuple):
+    birth_dates: Tuple[Tuple[int, ...], ...]
+    countries: frozenset
+
+class ScreeningMatch(NamedTuple):
+    entity_id: str
+    source: str
+    matched_name: str
+    name_score: float
+    dob_match: Optional[bool]
+    country_match: Optional[bool]
+    score: float
+
+def parse_date(value: str) -> Optional[Tuple[int, ...]]:
+    """(year,), (year, month) or (year, month, day) of a written date, None if unparseable"""
+    value = _DATE_CLEANUP.sub('', value.strip())
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+        parts = (parsed.year, parsed.month, parsed.day)
+        return parts[:date_format.count('%') if date_format.startswith('%Y') else 3]
+    return None
+
+def dates_agree(a: Tuple[int, ...], b: Tuple[int, ...]) -> bool:
+    """Dates agree on every component both of them specify"""
+    return all(x == y for x, y in zip(a, b))
+
+def entity_profile(description: str) -> EntityProfile:
+    birth_dates = tuple(filter(None, map(parse_date, description_field_values(description, "Date of Birth"))))
+    countries = frozenset(description_field_values(description, "Nationality")
+                          + description_field_values(description, "Country"))
+    return EntityProfile(birth_dates, countries)
+
+def build_screening_index(kb_path: str = DEFAULT_KB_PATH, datasets: Optional[List[str]] = None,
+                          schemas: Optional[List[str]] = None, **kwargs) -> Tuple[NameIndex, Dict[Tuple[str, str], EntityProfile]]:
+    """Name index plus DOB/country profile of every entity (of the given datasets and
+    schemas, all by default), in one pass over the KB"""
+    index = NameIndex(**kwargs)
+    index.kb_path = kb_path
+    profiles = {}
+    for record in iter_kb_records(kb_path, datasets, schemas):
+        index.add_record(record)
+        profiles[(record.source, record.id)] = entity_profile(record.description)
+    return index.freeze(), profiles
+
+def screen_query(index: NameIndex, profiles: Dict[Tuple[str, str], EntityProfile], query: ScreeningQuery,
+                 limit: int = 5, min_score: float = 0.85) -> List[ScreeningMatch]:
+    """Name matches of one query, re-ranked by DOB and country agreement"""
+    query_date = parse_date(query.birth_date) if query.birth_date else None
+    query_country = query.country.strip().upper() if query.country else None
+    
+    matches = []
+    for match in index.search(query.name, limit, min_score):
+        profile = profiles.get((match.source, match.entity_id))
+        score = match.score
+        
+        dob_match = None
+        if query_date and profile and profile.birth_dates:
+            dob_match = any(dates_agree(query_date, birth_date) for birth_date in profile.birth_dates)
+            score += DOB_MATCH_BONUS if dob_match else -DOB_MISMATCH_PENALTY
+        
+        country_match = None
+        if query_country and profile and profile.countries:
+            country_match = query_country in profile.countries
+            score += COUNTRY_MATCH_BONUS if country_match else -COUNTRY_MISMATCH_PENALTY
+        
+        matches.append(ScreeningMatch(match.entity_id, match.source, match.name, match.score,
+                                      dob_match, country_match, round(min(max(score, 0.0), 1.0), 4)))
+    
+    matches.sort(key=lambda match: match.score, reverse=True)
+    return matches
+
+def _query_field(row: Dict[str, str], field: str) -> Optional[str]:
+    for column in QUERY_COLUMNS[field]:
+        value = row.get(column)
+        if value not in (None, ''):
+            return str(value)
+    return None
+
+def iter_queries(path: str) -> Iterator[ScreeningQuery]:
+    """Queries of a CSV or JSONL (.jsonl/.ndjson, optionally .gz/.zst) file; rows without a name are skipped"""
+    base_path = re.sub(r'\.(gz|zst)$', '', path)
+    with open_kb_text(path) as f:
+        if base_path.endswith(('.jsonl', '.ndjson')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        
+        for row_number, row in enumerate(rows, 1):
+            row = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+            name = _query_field(row, 'name')
+            if not name:
+                continue
+            yield ScreeningQuery(_query_field(row, 'query_id') or str(row_number), name,
+                                 _query_field(row, 'birth_date'), _query_field(row, 'country'))
+
+# Per-worker state, set once by the pool initializer instead of being pickled with every chunk
+_worker_state = {}
+
+def _init_worker(index: NameIndex, profiles: Dict[Tuple[str, str], EntityProfile], limit: int, min_score: float):
+    _worker_state.update(index=index, profiles=profiles, limit=limit, min_score=min_score)
+
+def _screen_chunk(queries: List[ScreeningQuery]) -> List[Tuple[ScreeningQuery, List[ScreeningMatch]]]:
+    state = _worker_state
+    return [(query, screen_query(state['index'], state['profiles'], query, state['limit'], state['min_score']))
+            for query in queries]
+
+def _chunks(queries: Iterable[ScreeningQuery], chunk_size: int) -> Iterator[List[ScreeningQuery]]:
+    chunk = []
+    for query in queries:
+        chunk.append(query)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def screen_batch(queries: Iterable[ScreeningQuery], index: NameIndex, profiles: Dict[Tuple[str, str], EntityProfile],
+                 workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE, limit: int = 5,
+                 min_score: float = 0.85) -> Iterator[Tuple[ScreeningQuery, List[ScreeningMatch]]]:
+    """Yield (query, matches) in input order.
+    
+    With several workers the index is handed to each pool process once, and at
+    most two chunks per worker are in flight so memory stays bounded.
+    """
+    if workers == 1:
+        for query in queries:
+            yield query, screen_query(index, profiles, query, limit, min_score)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(index, profiles, limit, min_score)) as executor:
+        pending = collections.deque()
+        chunk_iter = _chunks(queries, chunk_size)
+        
+        while True:
+            while len(pending) < workers * 2:
+                chunk = next(chunk_iter, None)
+                if chunk is None:
+                    break
+                pending.append(executor.submit(_screen_chunk, chunk))
+            
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+class MatchWriter:
+    """Stream matches to a CSV or JSONL (.jsonl/.ndjson) file, one row per (query, match)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.jsonl = path.endswith(('.jsonl', '.ndjson'))
+        self.rows = 0
+    
+    def __enter__(self):
+        self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        if not self.jsonl:
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(OUTPUT_FIELDS)
+        return self
+    
+    def write(self, query: ScreeningQuery, matches: List[ScreeningMatch]):
+        for match in matches:
+            row = [query.query_id, query.name, match.entity_id, match.source, match.matched_name,
+                   round(match.name_score, 4), match.dob_match, match.country_match, match.score]
+            if self.jsonl:
+                self._file.write(json.dumps(dict(zip(OUTPUT_FIELDS, row)), ensure_ascii=False) + '\n')
+            else:
+                self._writer.writerow(['' if value is None else value for value in row])
+            self.rows += 1
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        return False
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Batch name screening of a CSV/JSONL file against the processed knowledge base')
+    parser.add_argument('input', help='CSV or JSONL file with a name column and optional id, dob and country columns')
+    parser.add_argument('--output', default='screening_matches.csv', help='Matches file (.csv or .jsonl)')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv, .kbc file or shard directory')
+    parser.add_argument('--datasets', type=lambda value: value.split(','), default=None,
+                        help='Comma-separated datasets to screen against (default: all)')
+    parser.add_argument('--schemas', type=lambda value: value.split(','), default=None,
+                        help='Comma-separated schemas to screen against, e.g. Vessel (default: all)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Screening processes')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Queries per worker task')
+    parser.add_argument('--limit', type=int, default=5, help='Matches to keep per query')
+    parser.add_argument('--min-score', type=float, default=0.85, help='Minimum name similarity of a match')
+    
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error(f"--workers must be at least 1, got {args.workers}")
+    
+    start = time.perf_counter()
+    index, profiles = build_screening_index(args.kb, args.datasets, args.schemas)
+    print(f"Indexed {len(index)} names of {len(index.entity_ids)} entities in {time.perf_counter() - start:.1f}s")
+    
+    start = time.perf_counter()
+    query_count = matched_count = 0
+    with MatchWriter(args.output) as writer:
+        results = screen_batch(iter_queries(args.input), index, profiles, args.workers, args.chunk_size,
+                               args.limit, args.min_score)
+        for query, matches in results:
+            writer.write(query, matches)
+            query_count += 1
+            matched_count += bool(matches)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Screened {query_count} queries in {elapsed:.1f}s ({query_count / max(elapsed, 1e-9):,.0f} queries/s)")
+    print(f"{matched_count} queries with matches, {writer.rows} matches written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+# concurrent bulk ingestion of the processed knowledge base into a Weaviate collection
+# through the REST batch endpoint (POST /v1/batch/objects). Records are streamed from
+# the preprocessing output, batches are sent by a thread pool over persistent HTTP
+# connections, the batch size adapts to observed latency and errors, transient failures
+# are retried with exponential backoff and objects that still fail are written to a JSONL
+# file that can be replayed later.
+#
+# usage: python bulk_ingest.py --url http://localhost:8080 [--kb ...] [--workers 4]
+#        python bulk_ingest.py --url http://localhost:8080 --replay failed_objects.jsonl
+
+import collections
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+from kb_records import (
+    COLLECTION_NAME,
+    DEFAULT_KB_PATH,
+    VECTOR_NAME,
+    EntityRecord,
+    iter_kb_records,
+    record_properties,
+    record_uuid,
+)
+
+BATCH_ENDPOINT = "/v1/batch/objects"
+OBJECTS_ENDPOINT = "/v1/objects"
+DEFAULT_FAILED_PATH = "failed_objects.jsonl"
+
+# HTTP statuses worth retrying; anything else is a permanent rejection of the batch
+RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+class TransientBatchError(Exception):
+    """The batch request failed in a way that may succeed on retry"""
+
+class BatchRejectedError(Exception):
+    """The server rejected the whole batch (e.g. 401, 422)"""
+
+def record_object(record: EntityRecord, collection: str = COLLECTION_NAME,
+                  vector: Optional[List[float]] = None, vector_name: str = VECTOR_NAME) -> Dict[str, Any]:
+    """Batch endpoint object of a record, with a precomputed named vector if given"""
+    obj = {"class": collection, "id": record_uuid(record), "properties": record_properties(record)}
+    if vector is not None:
+        obj["vectors"] = {vector_name: vector}
+    return obj
+
+class BatchClient:
+    """Minimal client for the Weaviate REST batch and object endpoints, one keep-alive connection per thread"""
+    
+    def __init__(self, url: str, api_key: Optional[str] = None, timeout: float = 60.0):
+        parsed = urllib.parse.urlsplit(url)
+        self.scheme = parsed.scheme or 'http'
+        self.netloc = parsed.netloc
+        self.base_path = parsed.path.rstrip('/')
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        self._local = threading.local()
+        # every connection opened by any thread, so close() can close them all
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+    
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            connection = self._local.connection = connection_class(self.netloc, timeout=self.timeout)
+            with self._connections_lock:
+                self._connections.add(connection)
+        return connection
+    
+    def _reset_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+            # close() may already have taken it out of the set
+            with self._connections_lock:
+                self._connections.discard(connection)
+    
+    def request(self, method: str, path: str, payload: Any = None) -> Any:
+        """JSON request against the REST API, raising TransientBatchError / BatchRejectedError"""
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else None
+        try:
+            connection = self._connection()
+            connection.request(method, self.base_path + path, body=body, headers=self.headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self._reset_connection()
+            raise TransientBatchError(f"{type(e).__name__}: {e}") from e
+        
+        if response.status in RETRY_STATUSES:
+            raise TransientBatchError(f"HTTP {response.status}: {data[:200].decode('utf-8', 'replace')}")
+        if response.status >= 400:
+            raise BatchRejectedError(f"HTTP {response.status}: {data[:200].decode('utf-8', 'replace')}")
+        return json.loads(data) if data else None
+    
+    def post_batch(self, objects: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """Send one batch; returns the error message of every object (None if stored)"""
+        errors = []
+        for result in self.request('POST', BATCH_ENDPOINT, {"objects": objects}):
+            messages = [error.get("message", "") for error in
+                        (((result or {}).get("result") or {}).get("errors") or {}).get("error") or []]
+            errors.append("; ".join(messages) if messages else None)
+        if len(errors) != len(objects):
+            raise TransientBatchError(f"Expected {len(objects)} results, got {len(errors)}")
+        return errors
+    
+    def iter_objects(self, collection: str, page_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Every stored object of a collection, paged with the `after` cursor"""
+        after = None
+        while True:
+            query = {"class": collection, "limit": page_size}
+            if after is not None:
+                query["after"] = after
+            path = f"{OBJECTS_ENDPOINT}?{urllib.parse.urlencode(query)}"
+            objects = (with_retries(lambda: self.request('GET', path)) or {}).get("objects") or []
+            yield from objects
+            if len(objects) < page_size:
+                return
+            after = objects[-1]["id"]
+    
+    def delete_objects(self, collection: str, object_ids: List[str]) -> int:
+        """Delete objects by id with one batch delete; returns the number deleted"""
+        payload = {
+            "match": {"class": collection,
+                      "where": {"path": ["id"], "operator": "ContainsAny", "valueTextArray": object_ids}},
+            "output": "minimal",
+        }
+        results = (self.request('DELETE', BATCH_ENDPOINT, payload) or {}).get("results") or {}
+        return results.get("successful", 0)
+    
+    def close(self):
+        """Close the connections of every thread that used the client"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, set()
+        for connection in connections:
+            connection.close()
+        self._local.connection = None
+
+def backoff_delay(attempt: int, base: float = 0.5, maximum: float = 30.0) -> float:
+    # exponential backoff with full jitter, so workers do not retry in lockstep
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+def with_retries(call, max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0):
+    """Run call(), retrying TransientBatchError with backoff"""
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except TransientBatchError:
+            if attempt == max_retries:
+                raise
+            time.sleep(backoff_delay(attempt, backoff_base, backoff_max))
+
+class AdaptiveBatchSizer:
+    """Additive-increase / multiplicative-decrease batch size: grow while batches
+    complete under target_latency, shrink when they are slow or fail."""
+    
+    def __init__(self, initial: int = 100, minimum: int = 10, maximum: int = 1000,
+                 target_latency: float = 2.0, step: int = 20):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.step = step
+        self._lock = threading.Lock()
+    
+    def record_success(self, latency: float):
+        with self._lock:
+            if latency > self.target_latency:
+                self.size = max(self.minimum, int(self.size * 0.75))
+            else:
+                self.size = min(self.maximum, self.size + self.step)
+    
+    def record_failure(self):
+        with self._lock:
+            self.size = max(self.minimum, self.size // 2)
+
+class IngestStats(collections.Counter):
+    """Counters of an ingestion run: batches, retries, objects, failed"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.started = time.perf_counter()
+    
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+    
+    @property
+    def objects_per_second(self) -> float:
+        return self['objects'] / max(self.elapsed, 1e-9)
+
+class BulkIngester:
+    """Stream objects into the batch endpoint with a bounded number of batches in flight"""
+    
+    def __init__(self, client: BatchClient, workers: int = 4, sizer: Optional[AdaptiveBatchSizer] = None,
+                 max_retries: int = 5, backoff_base: float = 0.5, backoff_max: float = 30.0,
+                 failed_path: str = DEFAULT_FAILED_PATH):
+        self.client = client
+        self.workers = workers
+        self.sizer = sizer or AdaptiveBatchSizer()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failed_path = failed_path
+    
+    def _send(self, objects: List[Dict[str, Any]]) -> Tuple[List[Optional[str]], int]:
+        """Worker: send one batch with retries; returns (per-object errors, retries used)"""
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                errors = self.client.post_batch(objects)
+            except TransientBatchError as e:
+                self.sizer.record_failure()
+                if attempt == self.max_retries:
+                    return [f"gave up after {attempt + 1} attempts: {e}"] * len(objects), attempt
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                continue
+            except BatchRejectedError as e:
+                self.sizer.record_failure()
+                return [str(e)] * len(objects), attempt
+            
+            self.sizer.record_success(time.perf_counter() - start)
+            return errors, attempt
+    
+    def _batches(self, objects: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.sizer.size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    def run(self, objects: Iterable[Dict[str, Any]], progress_every: int = 10000) -> IngestStats:
+        stats = IngestStats()
+        next_progress = progress_every
+        
+        tmp_path = self.failed_path + ".tmp"
+        completed = False
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as failed_file, \
+                    ThreadPoolExecutor(max_workers=self.workers) as executor:
+                pending = collections.deque()
+                batch_iter = self._batches(objects)
+            
+                while True:
+                    while len(pending) < self.workers * 2:
+                        batch = next(batch_iter, None)
+                        if batch is None:
+                            break
+                        pending.append((batch, executor.submit(self._send, batch)))
+                
+                    if not pending:
+                        break
+                
+                    batch, future = pending.popleft()
+                    errors, retries = future.result()
+                    stats['batches'] += 1
+                    stats['retries'] += retries
+                    for obj, error in zip(batch, errors):
+                        if error is None:
+                            stats['objects'] += 1
+                        else:
+                            stats['failed'] += 1
+                            failed_file.write(json.dumps({"error": error, "object": obj}, ensure_ascii=False) + '\n')
+                
+                    if stats['objects'] >= next_progress:
+                        print(f"Ingested {stats['objects']} objects ({stats.objects_per_second:,.0f} objects/s, "
+                              f"batch size {self.sizer.size})")
+                        next_progress += progress_every
+            
+            completed = True
+        finally:
+            if not completed and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        # keep the failures of the last run only, and no empty file when all succeeded
+        if stats['failed']:
+            os.replace(tmp_path, self.failed_path)
+        else:
+            os.remove(tmp_path)
+            if os.path.exists(self.failed_path):
+                os.remove(self.failed_path)
+        return stats
+
+def iter_record_objects(records: Iterable[EntityRecord], collection: str = COLLECTION_NAME,
+                        embedding_cache=None) -> Iterator[Dict[str, Any]]:
+    """Batch objects of KB records, with vectors from an EmbeddingCache when it has them"""
+    for record in records:
+        vector = embedding_cache.get(record.description) if embedding_cache is not None else None
+        yield record_object(record, collection, vector)
+
+def iter_failed_objects(path: str = DEFAULT_FAILED_PATH) -> Iterator[Dict[str, Any]]:
+    """Objects persisted by a previous run, for replay"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)["object"]
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Concurrent bulk ingestion of the knowledge base into Weaviate')
+    parser.add_argument('--url', default=os.getenv("WEAVIATE_URL", "http://localhost:8080"), help='Weaviate REST endpoint')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv, .kbc file or shard directory')
+    parser.add_argument('--datasets', type=lambda value: value.split(','), default=None,
+                        help='Comma-separated datasets to ingest (default: all)')
+    parser.add_argument('--schemas', type=lambda value: value.split(','), default=None,
+                        help='Comma-separated schemas to ingest (default: all)')
+    parser.add_argument('--read-workers', type=int, default=1, help='Shards parsed at a time when --kb is a shard directory')
+    parser.add_argument('--collection', default=COLLECTION_NAME)
+    parser.add_argument('--replay', default=None, help='Re-send the objects of a failed objects file instead of the KB')
+    parser.add_argument('--failed', default=DEFAULT_FAILED_PATH, help='Where objects that still fail are written')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent batch requests')
+    parser.add_argument('--batch-size', type=int, default=100, help='Initial batch size')
+    parser.add_argument('--max-batch-size', type=int, default=1000)
+    parser.add_argument('--target-latency', type=float, default=2.0, help='Batch latency (s) above which batches shrink')
+    parser.add_argument('--max-retries', type=int, default=5)
+    parser.add_argument('--embedding-cache', default=None, help='EmbeddingCache directory to send precomputed vectors from')
+    
+    args = parser.parse_args()
+    
+    url = args.url if '://' in args.url else f"https://{args.url}"
+    client = BatchClient(url, os.getenv("WEAVIATE_API_KEY"))
+    sizer = AdaptiveBatchSizer(args.batch_size, maximum=args.max_batch_size, target_latency=args.target_latency)
+    ingester = BulkIngester(client, args.workers, sizer, args.max_retries, failed_path=args.failed)
+    
+    cache = None
+    if args.replay:
+        objects = iter_failed_objects(args.replay)
+    else:
+        if args.embedding_cache:
+            from embedding_cache import EmbeddingCache
+            cache = EmbeddingCache(args.embedding_cache)
+        records = iter_kb_records(args.kb, args.datasets, args.schemas, args.read_workers)
+        objects = iter_record_objects(records, args.collection, cache)
+    
+    try:
+        stats = ingester.run(objects)
+    finally:
+        client.close()
+        if cache is not None:
+            cache.close()
+    
+    print(f"Ingested {stats['objects']} objects in {stats.elapsed:.1f}s ({stats.objects_per_second:,.0f} objects/s), "
+          f"{stats['batches']} batches, {stats['retries']} retries, final batch size {sizer.size}")
+    if stats['failed']:
+        print(f"{stats['failed']} objects failed, written to {args.failed} (replay with --replay {args.failed})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# delta sync of the processed knowledge base into the Weaviate collection: every record
+# maps to a deterministic object UUID (kb_records.record_uuid), the stored objects are
+# listed once with their text hashes, and only the difference is sent: new records are
+# inserted, records whose description changed are upserted under the same UUID, and
+# objects no longer in the KB are deleted. Unchanged objects are never re-vectorized.
+#
+# usage: python delta_sync.py --url http://localhost:8080 [--kb ...] [--dry-run]
+
+import os
+import time
+from typing import List, Dict, Iterable, NamedTuple, Optional
+
+from kb_records import COLLECTION_NAME, DEFAULT_KB_PATH, EntityRecord, iter_kb_records, record_uuid
+from incremental_build import description_hash
+from bulk_ingest import (
+    DEFAULT_FAILED_PATH,
+    AdaptiveBatchSizer,
+    BatchClient,
+    BulkIngester,
+    iter_record_objects,
+    with_retries,
+)
+
+DELETE_CHUNK_SIZE = 500
+
+# A sync that would delete more than this share of the stored objects needs --force,
+# so syncing an empty or truncated KB by mistake cannot wipe the collection
+MAX_DELETE_RATIO = 0.5
+
+class SyncPlan(NamedTuple):
+    inserts: List[EntityRecord]
+    updates: List[EntityRecord]
+    deletes: List[str]
+    unchanged: int
+
+def stored_text_hashes(client: BatchClient, collection: str = COLLECTION_NAME,
+                       sources: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """UUID -> description hash of every stored object, optionally only of some sources; a
+    merged object's source lists its datasets joined by ' / ' and is kept for any of them"""
+    sources = set(sources) if sources is not None else None
+    hashes = {}
+    for obj in client.iter_objects(collection):
+        properties = obj.get("properties") or {}
+        if sources is not None and not sources.intersection((properties.get("source") or "").split(' / ')):
+            continue
+        hashes[obj["id"]] = description_hash(properties.get("text") or "")
+    return hashes
+
+def plan_sync(records: Iterable[EntityRecord], stored: Dict[str, str]) -> SyncPlan:
+    """Compare the KB against the stored hashes; only changed records are kept in memory"""
+    inserts = []
+    updates = []
+    unchanged = 0
+    seen = set()
+    for record in records:
+        object_uuid = record_uuid(record)
+        if object_uuid in seen:
+            continue
+        seen.add(object_uuid)
+        
+        stored_hash = stored.get(object_uuid)
+        if stored_hash is None:
+            inserts.append(record)
+        elif stored_hash != description_hash(record.description):
+            updates.append(record)
+        else:
+            unchanged += 1
+    
+    deletes = [object_uuid for object_uuid in stored if object_uuid not in seen]
+    return SyncPlan(inserts, updates, deletes, unchanged)
+
+def apply_sync(plan: SyncPlan, client: BatchClient, collection: str = COLLECTION_NAME,
+               ingester: Optional[BulkIngester] = None, embedding_cache=None) -> Dict[str, int]:
+    """Upsert the inserted and updated records, then delete the removed objects"""
+    ingester = ingester or BulkIngester(client)
+    stats = ingester.run(iter_record_objects(plan.inserts + plan.updates, collection, embedding_cache))
+    
+    deleted = 0
+    for start in range(0, len(plan.deletes), DELETE_CHUNK_SIZE):
+        chunk = plan.deletes[start:start + DELETE_CHUNK_SIZE]
+        deleted += with_retries(lambda: client.delete_objects(collection, chunk))
+    
+    return {"upserted": stats['objects'], "failed": stats['failed'], "deleted": deleted}
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Sync only inserted, changed and removed entities into Weaviate')
+    parser.add_argument('--url', default=os.getenv("WEAVIATE_URL", "http://localhost:8080"), help='Weaviate REST endpoint')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv or .kbc file')
+    parser.add_argument('--collection', default=COLLECTION_NAME)
+    parser.add_argument('--sources', default=None,
+                        help='Comma-separated sources to sync, merged "A / B" records included; '
+                             'stored objects of other sources are left alone')
+    parser.add_argument('--dry-run', action='store_true', help='Only print the planned inserts/updates/deletes')
+    parser.add_argument('--force', action='store_true',
+                        help=f'Allow deleting more than {MAX_DELETE_RATIO:.0%} of the stored objects')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent batch requests')
+    parser.add_argument('--failed', default=DEFAULT_FAILED_PATH, help='Where objects that fail to upsert are written')
+    parser.add_argument('--embedding-cache', default=None, help='EmbeddingCache directory to send precomputed vectors from')
+    
+    args = parser.parse_args()
+    
+    url = args.url if '://' in args.url else f"https://{args.url}"
+    client = BatchClient(url, os.getenv("WEAVIATE_API_KEY"))
+    sources = args.sources.split(',') if args.sources else None
+    
+    start = time.perf_counter()
+    stored = stored_text_hashes(client, args.collection, sources)
+    # selected by the same ' / ' rule as the stored objects
+    records = iter_kb_records(args.kb, datasets=sources)
+    plan = plan_sync(records, stored)
+    print(f"{len(stored)} stored objects: {len(plan.inserts)} to insert, {len(plan.updates)} to update, "
+          f"{len(plan.deletes)} to delete, {plan.unchanged} unchanged ({time.perf_counter() - start:.1f}s)")
+    
+    if args.dry_run:
+        client.close()
+        return
+    if stored and len(plan.deletes) > MAX_DELETE_RATIO * len(stored) and not args.force:
+        client.close()
+        raise SystemExit(f"Refusing to delete {len(plan.deletes)} of {len(stored)} objects, rerun with --force")
+    
+    cache = None
+    if args.embedding_cache:
+        from embedding_cache import EmbeddingCache
+        cache = EmbeddingCache(args.embedding_cache)
+    try:
+        ingester = BulkIngester(client, args.workers, AdaptiveBatchSizer(), failed_path=args.failed)
+        result = apply_sync(plan, client, args.collection, ingester, cache)
+    finally:
+        client.close()
+        if cache is not None:
+            cache.close()
+    
+    print(f"Synced in {time.perf_counter() - start:.1f}s: {result['upserted']} upserted, {result['failed']} failed, "
+          f"{result['deleted']} deleted")
+    if result['failed']:
+        print(f"Failed objects written to {args.failed} (replay with bulk_ingest.py --replay {args.failed})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# local on-disk embedding cache keyed by a hash of (model name, description text), so a
+# reload of the knowledge base into Weaviate only pays embedding cost for descriptions
+# that actually changed: cached vectors are imported as precomputed vectors, the rest is
+# vectorized (client-side if an embed function is given, otherwise by the collection's
+# text2vec module) and stored for the next run.
+#
+# cache layout, one directory per (model, dtype):
+#   meta.json     model, dtype, dimensions
+#   keys.bin      32-byte sha256 keys, one per slot
+#   vectors.bin   fixed-size little-endian float16/float32 vectors, one per slot
+
+import collections
+import hashlib
+import itertools
+import json
+import os
+import re
+import struct
+from typing import List, Callable, Iterable, Optional, Sequence
+
+from kb_records import (
+    DATA_PREPROCESSING_DIR,
+    DEFAULT_KB_PATH,
+    COLLECTION_NAME,
+    EMBEDDING_MODEL,
+    VECTOR_NAME,
+    EntityRecord,
+    iter_kb_records,
+    record_properties,
+    record_uuid,
+)
+
+DEFAULT_CACHE_DIR = os.path.join(DATA_PREPROCESSING_DIR, 'embedding_cache')
+
+KEY_SIZE = 32
+DTYPE_CODES = {'float16': 'e', 'float32': 'f'}
+
+def cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(model.encode('utf-8') + b'\0' + text.encode('utf-8')).digest()
+
+class EmbeddingCache:
+    """Append-only vector store addressed by cache_key(model, text).
+    
+    Keys are loaded into a dict on open; vectors stay on disk and are read on
+    lookup. A vector is written before its key, so a slot only becomes visible
+    once both are complete and an interrupted run is repaired on the next open.
+    """
+    
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, model: str = EMBEDDING_MODEL, dtype: str = 'float16'):
+        if dtype not in DTYPE_CODES:
+            raise ValueError(f"Unsupported embedding cache dtype {dtype!r}, expected one of {sorted(DTYPE_CODES)}")
+        self.model = model
+        self.dtype = dtype
+        self.path = os.path.join(cache_dir, f"{re.sub(r'[^A-Za-z0-9.-]+', '_', model)}-{dtype}")
+        self.hits = 0
+        self.misses = 0
+        
+        os.makedirs(self.path, exist_ok=True)
+        self._meta_path = os.path.join(self.path, 'meta.json')
+        self._keys_path = os.path.join(self.path, 'keys.bin')
+        self._vectors_path = os.path.join(self.path, 'vectors.bin')
+        
+        self.dimensions = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                self.dimensions = json.load(f)["dimensions"]
+        
+        self._slots = {}
+        self._codec = None
+        self._keys_file = None
+        self._vectors_file = None
+        self._reader = None
+        if self.dimensions:
+            self._open_store()
+    
+    def _open_store(self):
+        self._codec = struct.Struct(f"<{self.dimensions}{DTYPE_CODES[self.dtype]}")
+        for path in (self._keys_path, self._vectors_path):
+            open(path, 'ab').close()
+        
+        with open(self._keys_path, 'rb') as f:
+            keys = f.read()
+        slot_count = min(len(keys) // KEY_SIZE, os.path.getsize(self._vectors_path) // self._codec.size)
+        self._slots = {keys[i * KEY_SIZE:(i + 1) * KEY_SIZE]: i for i in range(slot_count)}
+        
+        # drop a partially written tail left by an interrupted run
+        for path, size in ((self._keys_path, slot_count * KEY_SIZE), (self._vectors_path, slot_count * self._codec.size)):
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+        
+        self._keys_file = open(self._keys_path, 'ab')
+        self._vectors_file = open(self._vectors_path, 'ab')
+        self._reader = open(self._vectors_path, 'rb')
+    
+    def __len__(self):
+        return len(self._slots)
+    
+    def __contains__(self, text: str) -> bool:
+        return cache_key(self.model, text) in self._slots
+    
+    def get(self, text: str) -> Optional[List[float]]:
+        slot = self._slots.get(cache_key(self.model, text))
+        if slot is None:
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        self._reader.seek(slot * self._codec.size)
+        return list(self._codec.unpack(self._reader.read(self._codec.size)))
+    
+    def put(self, text: str, vector: Sequence[float]):
+        key = cache_key(self.model, text)
+        if key in self._slots:
+            return
+        
+        if self.dimensions is None:
+            self.dimensions = len(vector)
+            with open(self._meta_path, 'w', encoding='utf-8') as f:
+                json.dump({"model": self.model, "dtype": self.dtype, "dimensions": self.dimensions}, f)
+            self._open_store()
+        elif len(vector) != self.dimensions:
+            raise ValueError(f"Expected a {self.dimensions}-dimensional vector for {self.model}, got {len(vector)}")
+        
+        self._vectors_file.write(self._codec.pack(*vector))
+        self._vectors_file.flush()
+        self._keys_file.write(key)
+        self._slots[key] = len(self._slots)
+    
+    def close(self):
+        for f in (self._vectors_file, self._keys_file, self._reader):
+            if f is not None:
+                f.close()
+        self._vectors_file = self._keys_file = self._reader = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+# Batches imported per round; after every round the vectors Weaviate computed for the
+# cache misses are read back in bulk, so only one round of descriptions is held in memory
+ROUND_BATCHES = 10
+
+def _import_round(collection, records: List[EntityRecord], cache: EmbeddingCache,
+                  embed: Optional[Callable[[List[str]], List[Sequence[float]]]], vector_name: str,
+                  batch_size: int, stats: collections.Counter):
+    server_vectorized = {}
+    with collection.batch.fixed_size(batch_size=batch_size) as batch:
+        missed = []
+        for record in records:
+            vector = cache.get(record.description)
+            if vector is not None:
+                batch.add_object(properties=record_properties(record), uuid=record_uuid(record),
+                                 vector={vector_name: vector})
+                stats['cached'] += 1
+            else:
+                missed.append(record)
+        
+        for start in range(0, len(missed), batch_size):
+            pending = missed[start:start + batch_size]
+            if embed is None:
+                for record in pending:
+                    object_uuid = record_uuid(record)
+                    batch.add_object(properties=record_properties(record), uuid=object_uuid)
+                    server_vectorized[object_uuid] = record.description
+                    stats['server_vectorized'] += 1
+                continue
+            
+            vectors = embed([record.description for record in pending])
+            if len(vectors) != len(pending):
+                raise ValueError(f"embed returned {len(vectors)} vectors for {len(pending)} texts")
+            for record, vector in zip(pending, vectors):
+                cache.put(record.description, vector)
+                batch.add_object(properties=record_properties(record), uuid=record_uuid(record),
+                                 vector={vector_name: list(vector)})
+                stats['embedded'] += 1
+    
+    failed = {str(failed_object.object_.uuid) for failed_object in collection.batch.failed_objects}
+    stats['failed'] += len(failed)
+    stored = [object_uuid for object_uuid in server_vectorized if object_uuid not in failed]
+    if not stored:
+        return
+    
+    from weaviate.classes.query import Filter
+    for start in range(0, len(stored), batch_size):
+        uuids = stored[start:start + batch_size]
+        response = collection.query.fetch_objects(filters=Filter.by_id().contains_any(uuids),
+                                                  include_vector=True, limit=len(uuids))
+        for obj in response.objects:
+            vector = obj.vector.get(vector_name) if obj.vector else None
+            if vector:
+                cache.put(server_vectorized[str(obj.uuid)], vector)
+                stats['cache_filled'] += 1
+
+def import_with_cache(collection, records: Iterable[EntityRecord], cache: EmbeddingCache,
+                      embed: Optional[Callable[[List[str]], List[Sequence[float]]]] = None,
+                      vector_name: str = VECTOR_NAME, batch_size: int = 200) -> collections.Counter:
+    """Import records into a Weaviate collection, with precomputed vectors where
+    the cache has one.
+    
+    Cache misses are embedded with `embed` (a batch of texts -> as many vectors,
+    e.g. a local model of the same name) when given. Otherwise they are imported
+    without a vector so the collection's vectorizer embeds them, and their
+    vectors are read back by id, batch_size at a time, after every round of
+    ROUND_BATCHES batches to fill the cache.
+    """
+    stats = collections.Counter()
+    records = iter(records)
+    while True:
+        round_records = list(itertools.islice(records, batch_size * ROUND_BATCHES))
+        if not round_records:
+            return stats
+        _import_round(collection, round_records, cache, embed, vector_name, batch_size, stats)
+
+def main():
+    import argparse
+    
+    import weaviate
+    from weaviate.classes.init import Auth
+    from dotenv import load_dotenv
+    
+    parser = argparse.ArgumentParser(description='Import the knowledge base into Weaviate, reusing cached embeddings')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv or .kbc file')
+    parser.add_argument('--collection', default=COLLECTION_NAME)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--model', default=EMBEDDING_MODEL, help='Embedding model of the collection vectorizer')
+    parser.add_argument('--dtype', choices=sorted(DTYPE_CODES), default='float16', help='Stored vector precision')
+    parser.add_argument('--batch-size', type=int, default=200)
+    
+    args = parser.parse_args()
+    
+    load_dotenv()
+    client = weaviate.connect_to_weaviate_cloud(
+        cluster_url=os.getenv("WEAVIATE_URL"),
+        auth_credentials=Auth.api_key(os.getenv("WEAVIATE_API_KEY")),
+    )
+    try:
+        collection = client.collections.get(args.collection)
+        with EmbeddingCache(args.cache_dir, args.model, args.dtype) as cache:
+            print(f"Embedding cache {cache.path}: {len(cache)} vectors")
+            stats = import_with_cache(collection, iter_kb_records(args.kb), cache, batch_size=args.batch_size)
+            print(f"Imported {stats['cached']} objects with cached vectors, {stats['server_vectorized']} vectorized by "
+                  f"Weaviate ({stats['cache_filled']} added to the cache), {stats['failed']} failed")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()
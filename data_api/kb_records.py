@@ -0,0 +1,86 @@
+# helpers to read the knowledge base produced by data_preprocessing/data_preprocess.py
+# (processed_entities.csv, optionally gzip/zstd compressed, the columnar .kbc file or the
+# processed_entities_shards/ directory) as a stream of EntityRecord(source, description,
+# id, name), and to map records to objects of the Weaviate collection used in explore.ipynb.
+
+import csv
+import gzip
+import os
+import sys
+import uuid
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+DATA_PREPROCESSING_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data_preprocessing')
+if DATA_PREPROCESSING_DIR not in sys.path:
+    sys.path.insert(0, DATA_PREPROCESSING_DIR)
+
+from data_preprocess import EntityRecord, zstandard
+
+DEFAULT_KB_PATH = os.path.join(DATA_PREPROCESSING_DIR, 'processed_entities.csv')
+
+# Collection, named vector and embedding model set up in explore.ipynb
+COLLECTION_NAME = "DemoCollection"
+VECTOR_NAME = "title_vector"
+EMBEDDING_MODEL = "Snowflake/snowflake-arctic-embed-l-v2.0"
+
+def open_kb_text(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd compressed outputs")
+        return zstandard.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+def iter_kb_records(path: str = DEFAULT_KB_PATH, datasets: Optional[Iterable[str]] = None,
+                    schemas: Optional[Iterable[str]] = None, workers: int = 1) -> Iterator[EntityRecord]:
+    """Yield the records of a processed_entities.csv[.gz|.zst] or .kbc file, or of a shard
+    directory (or its manifest.json). datasets and schemas keep only those records; a
+    shard directory reads just the matching shards, workers of them at a time."""
+    if os.path.isdir(path) or os.path.basename(path) == 'manifest.json':
+        from sharded_kb import iter_sharded_kb
+        yield from iter_sharded_kb(path, datasets, schemas, workers)
+        return
+    
+    if datasets is not None or schemas is not None:
+        from sharded_kb import record_schema
+        datasets = set(datasets) if datasets is not None else None
+        schemas = set(schemas) if schemas is not None else None
+        for record in iter_kb_records(path):
+            if ((datasets is None or datasets.intersection(record.source.split(' / ')))
+                    and (schemas is None or record_schema(record) in schemas)):
+                yield record
+        return
+    
+    if path.endswith('.kbc'):
+        from columnar_kb import ColumnarKB
+        with ColumnarKB(path) as kb:
+            yield from kb
+        return
+    
+    csv.field_size_limit(2**31 - 1)
+    with open_kb_text(path) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for source, entity_id, name, description in reader:
+            yield EntityRecord(source, description, entity_id, name)
+
+def kb_build_version(path: str = DEFAULT_KB_PATH) -> Optional[Tuple[int, int]]:
+    """Cheap version stamp of a KB build (size, mtime); outputs are replaced atomically so
+    every rebuild changes it; a shard directory is stamped by its manifest. None if the KB
+    does not exist."""
+    if os.path.isdir(path):
+        path = os.path.join(path, 'manifest.json')
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def record_properties(record: EntityRecord) -> Dict[str, str]:
+    """Collection properties of a record (Source/ID/Name/Description -> source/source_id/title/text)"""
+    return {"title": record.name, "source": record.source, "source_id": record.id, "text": record.description}
+
+def record_uuid(record: EntityRecord) -> str:
+    """Stable object UUID of a record, same as weaviate.util.generate_uuid5("source|id")"""
+    return str(uuid.uuid5(uuid.NAMESPACE_DNS, f"{record.source}|{record.id}"))
@@ -0,0 +1,255 @@
+# in-process hybrid search over processed_entities for air-gapped use, with the query shapes
+# of the Weaviate collection in explore.ipynb (near_text / near_vector / bm25 / hybrid with
+# limit and property filters): an inverted-index BM25 over the entity descriptions, a
+# brute-force dot-product search over stored embeddings (from the embedding cache), and
+# reciprocal rank fusion of both rankings with configurable weights.
+#
+# NumPy is used for scoring when installed; BM25 falls back to pure Python without it,
+# vector search requires it.
+
+import collections
+import heapq
+import math
+from array import array
+from typing import List, Dict, Any, Callable, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+from kb_records import DEFAULT_KB_PATH, EntityRecord, iter_kb_records, record_properties, record_uuid
+from name_keys import normalize_name
+from query_cache import filters_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+# Terms in (nearly) every description, like the "Name"/"Nationality" labels, change no
+# ranking but would cost a pass over the whole collection
+MIN_IDF = 0.01
+
+class SearchObject(NamedTuple):
+    uuid: str
+    properties: Dict[str, str]
+    score: float
+
+class SearchResponse(NamedTuple):
+    objects: List[SearchObject]
+
+def tokenize(text: str) -> List[str]:
+    # same folding as the name keys, so "ALBAN-ESE", "Albanèse" and "albanese" meet
+    return normalize_name(text).split()
+
+class LocalSearch:
+    """BM25 + vector hybrid search over KB records held in memory.
+    
+    Filters are property equality conditions such as {"source": "US FBI Most Wanted"}
+    on the collection properties (title, source, source_id, text).
+    """
+    
+    def __init__(self, records: Iterable[EntityRecord], vectors: Optional[Sequence[Optional[Sequence[float]]]] = None,
+                 embed: Optional[Callable[[str], Sequence[float]]] = None):
+        self.embed = embed
+        self.records = []
+        self.uuids = []
+        
+        term_docs = collections.defaultdict(lambda: array('I'))
+        term_freqs = collections.defaultdict(lambda: array('I'))
+        doc_lengths = array('I')
+        for doc_id, record in enumerate(records):
+            self.records.append(record)
+            self.uuids.append(record_uuid(record))
+            tokens = tokenize(record.description)
+            doc_lengths.append(len(tokens))
+            for term, count in collections.Counter(tokens).items():
+                term_docs[term].append(doc_id)
+                term_freqs[term].append(count)
+        
+        count = len(self.records)
+        average_length = sum(doc_lengths) / count if count else 0.0
+        # per-document BM25 length normalization k1 * (1 - b + b * |d| / avgdl)
+        norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / average_length) if average_length else BM25_K1
+                 for length in doc_lengths]
+        
+        self._idf = {term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in term_docs.items()}
+        if np is not None:
+            self._postings = {term: (np.frombuffer(docs, dtype=np.uint32), np.frombuffer(term_freqs[term], dtype=np.uint32).astype(np.float32))
+                              for term, docs in term_docs.items()}
+            self._norms = np.array(norms, dtype=np.float32)
+        else:
+            self._postings = {term: (docs, term_freqs[term]) for term, docs in term_docs.items()}
+            self._norms = array('d', norms)
+        
+        self._vectors = None
+        if vectors is not None:
+            if np is None:
+                raise ImportError("numpy is required for vector search")
+            self._vectors, self._has_vector = _normalized_matrix(vectors, count)
+        
+        self._filter_cache = {}
+    
+    @classmethod
+    def from_kb(cls, path: str = DEFAULT_KB_PATH, embedding_cache=None,
+                embed: Optional[Callable[[str], Sequence[float]]] = None) -> 'LocalSearch':
+        """Index a KB file; vectors come from an EmbeddingCache when given"""
+        records = list(iter_kb_records(path))
+        vectors = [embedding_cache.get(record.description) for record in records] if embedding_cache is not None else None
+        return cls(records, vectors, embed)
+    
+    def __len__(self):
+        return len(self.records)
+    
+    def _allowed(self, filters: Optional[Dict[str, Any]]):
+        """Document ids matching the filters (None = all), cached per distinct filter"""
+        if not filters:
+            return None
+        key = filters_key(filters)
+        allowed = self._filter_cache.get(key)
+        if allowed is None:
+            allowed = [doc_id for doc_id, record in enumerate(self.records)
+                       if all(record_properties(record).get(prop) == value for prop, value in filters.items())]
+            allowed = np.array(allowed, dtype=np.int64) if np is not None else set(allowed)
+            self._filter_cache[key] = allowed
+        return allowed
+    
+    def _response(self, ranked: List[Tuple[int, float]]) -> SearchResponse:
+        return SearchResponse([SearchObject(self.uuids[doc_id], record_properties(self.records[doc_id]), score)
+                               for doc_id, score in ranked])
+    
+    def bm25_ranking(self, query: str, limit: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        terms = [term for term in dict.fromkeys(tokenize(query)) if self._idf.get(term, 0.0) >= MIN_IDF]
+        allowed = self._allowed(filters)
+        
+        if np is not None:
+            scores = np.zeros(len(self.records), dtype=np.float32)
+            for term in terms:
+                docs, freqs = self._postings[term]
+                scores[docs] += self._idf[term] * freqs * (BM25_K1 + 1) / (freqs + self._norms[docs])
+            if allowed is not None:
+                masked = np.zeros_like(scores)
+                masked[allowed] = scores[allowed]
+                scores = masked
+            return _top_k(scores, limit)
+        
+        scores = collections.defaultdict(float)
+        norms = self._norms
+        for term in terms:
+            docs, freqs = self._postings[term]
+            weight = self._idf[term] * (BM25_K1 + 1)
+            for doc_id, freq in zip(docs, freqs):
+                scores[doc_id] += weight * freq / (freq + norms[doc_id])
+        if allowed is not None:
+            scores = {doc_id: score for doc_id, score in scores.items() if doc_id in allowed}
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+    
+    def vector_ranking(self, vector: Sequence[float], limit: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        if self._vectors is None:
+            raise ValueError("LocalSearch was built without vectors, vector search is unavailable")
+        
+        query = np.asarray(vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if not query_norm:
+            return []
+        query = query / query_norm
+        
+        allowed = self._allowed(filters)
+        candidates = np.flatnonzero(self._has_vector) if allowed is None else allowed[self._has_vector[allowed]]
+        if allowed is None and len(candidates) == len(self.records):
+            return _top_k(self._vectors @ query, limit, require_positive=False)
+        
+        similarities = self._vectors[candidates] @ query
+        return [(int(candidates[i]), score) for i, score in _top_k(similarities, limit, require_positive=False)]
+    
+    def _query_vector(self, query: str) -> Sequence[float]:
+        if self.embed is None:
+            raise ValueError("near_text needs an embed function to vectorize the query")
+        return self.embed(query)
+    
+    def bm25(self, query: str, limit: int = 10, filters: Optional[Dict[str, Any]] = None) -> SearchResponse:
+        return self._response(self.bm25_ranking(query, limit, filters))
+    
+    def near_vector(self, vector: Sequence[float], limit: int = 10, filters: Optional[Dict[str, Any]] = None) -> SearchResponse:
+        return self._response(self.vector_ranking(vector, limit, filters))
+    
+    def near_text(self, query: str, limit: int = 10, filters: Optional[Dict[str, Any]] = None) -> SearchResponse:
+        return self.near_vector(self._query_vector(query), limit, filters)
+    
+    def hybrid(self, query: str, limit: int = 10, filters: Optional[Dict[str, Any]] = None, alpha: float = 0.5,
+               vector: Optional[Sequence[float]] = None, candidates: int = 100) -> SearchResponse:
+        """Reciprocal rank fusion of the BM25 and vector rankings, weighted (1 - alpha)
+        and alpha like Weaviate's hybrid search (alpha=1 is pure vector search). Without
+        vectors or an embed function only the BM25 ranking is used."""
+        fused = collections.defaultdict(float)
+        depth = max(limit, candidates)
+        
+        if alpha < 1:
+            for rank, (doc_id, _) in enumerate(self.bm25_ranking(query, depth, filters)):
+                fused[doc_id] += (1 - alpha) / (RRF_K + rank + 1)
+        
+        if alpha > 0 and self._vectors is not None and (vector is not None or self.embed is not None):
+            vector = vector if vector is not None else self._query_vector(query)
+            for rank, (doc_id, _) in enumerate(self.vector_ranking(vector, depth, filters)):
+                fused[doc_id] += alpha / (RRF_K + rank + 1)
+        
+        return self._response(heapq.nlargest(limit, fused.items(), key=lambda item: item[1]))
+
+def _normalized_matrix(vectors: Sequence[Optional[Sequence[float]]], count: int):
+    """Unit-length float32 rows (zero rows for missing vectors) and a has-vector mask"""
+    dimensions = next((len(vector) for vector in vectors if vector is not None), 0)
+    matrix = np.zeros((count, dimensions), dtype=np.float32)
+    has_vector = np.zeros(count, dtype=bool)
+    for doc_id, vector in enumerate(vectors):
+        if vector is not None:
+            matrix[doc_id] = vector
+            has_vector[doc_id] = True
+    
+    norms = np.linalg.norm(matrix, axis=1)
+    has_vector &= norms > 0
+    matrix[has_vector] /= norms[has_vector, None]
+    return matrix, has_vector
+
+def _top_k(scores, limit: int, require_positive: bool = True) -> List[Tuple[int, float]]:
+    """(index, score) of the `limit` highest scores of a NumPy array, best first"""
+    if limit <= 0 or not len(scores):
+        return []
+    if limit < len(scores):
+        top = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return [(int(i), float(scores[i])) for i in top if not require_positive or scores[i] > 0]
+
+def main():
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description='Local BM25 search over the processed knowledge base')
+    parser.add_argument('query', nargs='+', help='Query text(s)')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv or .kbc file')
+    parser.add_argument('--embedding-cache', default=None, help='EmbeddingCache directory with the entity vectors')
+    parser.add_argument('--limit', type=int, default=2)
+    parser.add_argument('--source', default=None, help='Only return entities of this source')
+    
+    args = parser.parse_args()
+    
+    cache = None
+    if args.embedding_cache:
+        from embedding_cache import EmbeddingCache
+        cache = EmbeddingCache(args.embedding_cache)
+    
+    start = time.perf_counter()
+    search = LocalSearch.from_kb(args.kb, cache)
+    print(f"Indexed {len(search)} entities in {time.perf_counter() - start:.2f}s")
+    filters = {"source": args.source} if args.source else None
+    
+    for query in args.query:
+        start = time.perf_counter()
+        response = search.hybrid(query, args.limit, filters) if cache is not None else search.bm25(query, args.limit, filters)
+        print(f"\n{query} ({(time.perf_counter() - start) * 1000:.2f} ms):")
+        for obj in response.objects:
+            print(f"  {obj.score:.4f}  {obj.properties['source_id']}  {obj.properties['title']}  ({obj.properties['source']})")
+
+if __name__ == "__main__":
+    main()
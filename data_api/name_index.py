@@ -0,0 +1,266 @@
+# offline fuzzy name screening over the processed knowledge base, without a vector DB:
+# every entity name and "Alias:" value goes into a character 4-gram inverted index
+# used for candidate generation, and the best candidates are re-scored with
+# Jaro-Winkler similarity on the compact and token-sorted name forms, which is robust
+# to case, diacritics, spacing ("ALBAN ESE") and token order. Names sharing an exact
+# normalized or phonetic key (data_preprocessing/name_keys.py) are always candidates.
+
+import collections
+import csv
+import heapq
+import itertools
+import math
+import os
+from array import array
+from typing import List, Iterable, Iterator, NamedTuple, Tuple
+
+from kb_records import EntityRecord, DEFAULT_KB_PATH, DATA_PREPROCESSING_DIR, iter_kb_records, open_kb_text
+from data_preprocess import description_field_values
+from name_keys import NameKeys, entity_names, name_keys
+
+try:
+    from rapidfuzz.distance import JaroWinkler
+except ImportError:
+    JaroWinkler = None
+
+NGRAM_SIZE = 4
+
+DEFAULT_NAMES_PATH = os.path.join(DATA_PREPROCESSING_DIR, 'processed_names.csv')
+
+class NameMatch(NamedTuple):
+    entity_id: str
+    source: str
+    name: str
+    score: float
+
+def name_ngrams(compact: str) -> List[str]:
+    padded = f"^{compact}$"
+    return list({padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)})
+
+def jaro_winkler(s1: str, s2: str, prefix_weight: float = 0.1) -> float:
+    if s1 == s2:
+        return 1.0
+    len1, len2 = len(s1), len(s2)
+    if not len1 or not len2:
+        return 0.0
+    
+    window = max(max(len1, len2) // 2 - 1, 0)
+    matched2 = [False] * len2
+    matches1 = []
+    for i, c in enumerate(s1):
+        hi = i + window + 1
+        j = s2.find(c, i - window if i > window else 0, hi)
+        while j != -1 and matched2[j]:
+            j = s2.find(c, j + 1, hi)
+        if j != -1:
+            matched2[j] = True
+            matches1.append(c)
+    
+    m = len(matches1)
+    if not m:
+        return 0.0
+    
+    matches2 = [s2[j] for j in range(len2) if matched2[j]]
+    transpositions = sum(a != b for a, b in zip(matches1, matches2)) // 2
+    jaro = (m / len1 + m / len2 + (m - transpositions) / m) / 3
+    
+    prefix = 0
+    for a, b in zip(s1[:4], s2[:4]):
+        if a != b:
+            break
+        prefix += 1
+    return jaro + prefix * prefix_weight * (1 - jaro)
+
+if JaroWinkler is not None:
+    similarity = JaroWinkler.similarity
+else:
+    similarity = jaro_winkler
+
+class NameIndex:
+    """In-process fuzzy name index over entity names and aliases.
+    
+    Names sharing the query's exact compact, token-sorted or phonetic key
+    (precomputed at build time in processed_names.csv) are blocked in first,
+    as long as the block is smaller than block_limit.
+    
+    Further candidates come from shared n-grams through the inverted index,
+    rarest n-grams first. Enough n-grams are always visited to find every name
+    sharing min_overlap of the query's n-grams; the remaining, more frequent
+    ones only while fewer than max_postings entries were scanned. Out of the
+    4 * rescore_limit names with the most shared n-grams, the rescore_limit
+    best by Dice coefficient are scored with Jaro-Winkler.
+    """
+    
+    def __init__(self, max_postings: int = 2000, rescore_limit: int = 10, min_overlap: float = 0.6,
+                 block_limit: int = 50):
+        self.max_postings = max_postings
+        self.rescore_limit = rescore_limit
+        self.min_overlap = min_overlap
+        self.block_limit = block_limit
+        # KB file or directory the index was built from, when built by from_kb/from_name_keys
+        self.kb_path = None
+        
+        self.entity_ids = []
+        self.entity_sources = []
+        
+        self._names = []
+        self._compact = []
+        self._sorted = []
+        self._name_entity = array('I')
+        self._gram_counts = array('H')
+        self._postings = collections.defaultdict(lambda: array('I'))
+        self._blocks = (collections.defaultdict(list), collections.defaultdict(list), collections.defaultdict(list))
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def _block_keys(self, keys: NameKeys) -> Tuple[str, str, str]:
+        return keys.compact, keys.sorted_tokens, keys.phonetic
+    
+    def _add_name(self, entity_index: int, name: str, keys: NameKeys):
+        name_id = len(self._names)
+        grams = name_ngrams(keys.compact)
+        self._names.append(name)
+        self._compact.append(keys.compact)
+        self._sorted.append(keys.sorted_tokens)
+        self._name_entity.append(entity_index)
+        self._gram_counts.append(min(len(grams), 65535))
+        for gram in grams:
+            self._postings[gram].append(name_id)
+        for block, key in zip(self._blocks, self._block_keys(keys)):
+            if key:
+                block[key].append(name_id)
+    
+    def _add_entity_keys(self, entity_id: str, source: str, names: Iterable[Tuple[str, NameKeys]]):
+        entity_index = len(self.entity_ids)
+        self.entity_ids.append(entity_id)
+        self.entity_sources.append(source)
+        
+        seen = set()
+        for name, keys in names:
+            if not keys.compact or keys.compact in seen:
+                continue
+            seen.add(keys.compact)
+            self._add_name(entity_index, name, keys)
+    
+    def add_entity(self, entity_id: str, source: str, names: Iterable[str]):
+        self._add_entity_keys(entity_id, source, ((name, name_keys(name)) for name in names))
+    
+    def add_record(self, record: EntityRecord):
+        aliases = description_field_values(record.description, "Alias")
+        self.add_entity(record.id, record.source, entity_names(record.name, aliases))
+    
+    def freeze(self) -> 'NameIndex':
+        """Drop the build-time defaultdicts so lookups of unknown keys do not grow them"""
+        self._postings = dict(self._postings)
+        self._blocks = tuple(dict(block) for block in self._blocks)
+        return self
+    
+    @classmethod
+    def from_records(cls, records: Iterable[EntityRecord], **kwargs) -> 'NameIndex':
+        index = cls(**kwargs)
+        for record in records:
+            index.add_record(record)
+        return index.freeze()
+    
+    @classmethod
+    def from_kb(cls, path: str = DEFAULT_KB_PATH, **kwargs) -> 'NameIndex':
+        index = cls.from_records(iter_kb_records(path), **kwargs)
+        index.kb_path = path
+        return index
+    
+    @classmethod
+    def from_name_keys(cls, path: str = DEFAULT_NAMES_PATH, **kwargs) -> 'NameIndex':
+        """Build from processed_names.csv, reusing the keys computed at build time"""
+        index = cls(**kwargs)
+        for (source, entity_id), rows in iter_name_key_groups(path):
+            index._add_entity_keys(entity_id, source, rows)
+        index.kb_path = path
+        return index.freeze()
+    
+    def blocked(self, keys: NameKeys) -> List[int]:
+        """Names sharing one of the query's exact keys, skipping oversized blocks"""
+        name_ids = []
+        for block, key in zip(self._blocks, self._block_keys(keys)):
+            hits = block.get(key) if key else None
+            if hits and len(hits) <= self.block_limit:
+                name_ids.extend(hits)
+        return name_ids
+    
+    def candidates(self, compact: str) -> List[int]:
+        grams = name_ngrams(compact)
+        postings = sorted((self._postings[gram] for gram in grams if gram in self._postings), key=len)
+        
+        # a name sharing at least min_overlap of the query n-grams must contain one
+        # of the `required` rarest of them, so those are always visited
+        required = len(postings) - math.ceil(self.min_overlap * len(grams)) + 1
+        counts = collections.Counter()
+        scanned = 0
+        for visited, posting in enumerate(postings):
+            if visited >= required and scanned >= self.max_postings:
+                break
+            counts.update(posting)
+            scanned += len(posting)
+        
+        # shortlist by raw overlap (C-level heap), then rank by Dice coefficient
+        shortlist = counts.most_common(self.rescore_limit * 4)
+        query_grams = len(grams)
+        gram_counts = self._gram_counts
+        shortlist.sort(key=lambda item: item[1] / (query_grams + gram_counts[item[0]]), reverse=True)
+        return [name_id for name_id, _ in shortlist[:self.rescore_limit]]
+    
+    def search(self, query: str, limit: int = 10, min_score: float = 0.0) -> List[NameMatch]:
+        """Top entities for a query name, best matching name per entity"""
+        keys = name_keys(query)
+        if not keys.compact:
+            return []
+        
+        best = {}
+        for name_id in dict.fromkeys(self.blocked(keys) + self.candidates(keys.compact)):
+            score = max(similarity(keys.compact, self._compact[name_id]),
+                        similarity(keys.sorted_tokens, self._sorted[name_id]))
+            if score < min_score:
+                continue
+            entity_index = self._name_entity[name_id]
+            if score > best.get(entity_index, (-1.0, 0))[0]:
+                best[entity_index] = (score, name_id)
+        
+        ranked = heapq.nlargest(limit, best.items(), key=lambda item: item[1][0])
+        return [
+            NameMatch(self.entity_ids[entity_index], self.entity_sources[entity_index], self._names[name_id], score)
+            for entity_index, (score, name_id) in ranked
+        ]
+
+def iter_name_key_groups(path: str = DEFAULT_NAMES_PATH) -> Iterator[Tuple[Tuple[str, str], List[Tuple[str, NameKeys]]]]:
+    """Group the rows of processed_names.csv by (source, id), in file order"""
+    with open_kb_text(path) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        rows = ((source, entity_id, name, NameKeys(*keys)) for source, entity_id, name, *keys in reader)
+        for entity, group in itertools.groupby(rows, key=lambda row: (row[0], row[1])):
+            yield entity, [(name, keys) for _, _, name, keys in group]
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Fuzzy name screening against the processed knowledge base')
+    parser.add_argument('query', nargs='+', help='Name(s) to screen')
+    parser.add_argument('--kb', default=DEFAULT_KB_PATH, help='processed_entities.csv or .kbc file')
+    parser.add_argument('--names', default=None, help='processed_names.csv with precomputed name keys (used instead of --kb)')
+    parser.add_argument('--limit', type=int, default=5, help='Matches to return per query')
+    
+    args = parser.parse_args()
+    
+    if args.names:
+        index = NameIndex.from_name_keys(args.names)
+    else:
+        index = NameIndex.from_kb(args.kb)
+    print(f"Indexed {len(index)} names of {len(index.entity_ids)} entities")
+    
+    for query in args.query:
+        print(f"\n{query}:")
+        for match in index.search(query, args.limit):
+            print(f"  {match.score:.3f}  {match.entity_id}  {match.name}  ({match.source})")
+
+if __name__ == "__main__":
+    main()
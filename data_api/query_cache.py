@@ -0,0 +1,164 @@
+# in-memory result cache in front of the screening search functions (Weaviate near_text /
+# bm25 calls, the offline NameIndex, ...), so agents repeatedly screening the same
+# counterparties are answered from memory instead of a network round trip plus query
+# vectorization. Entries are keyed by normalized query, search mode, limit and filters,
+# evicted least-recently-used beyond max_entries or after a TTL, and the whole cache is
+# dropped when the knowledge-base build version changes.
+
+import collections
+import json
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from kb_records import DEFAULT_KB_PATH, kb_build_version
+
+def normalize_query(query: str) -> str:
+    """Unicode-, case- and whitespace-insensitive form of a query"""
+    return ' '.join(unicodedata.normalize('NFKC', query).casefold().split())
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> str:
+    return json.dumps(filters, sort_keys=True, ensure_ascii=False, default=str) if filters else ''
+
+class QueryCache:
+    """Thread-safe LRU + TTL cache of search results.
+    
+    version() is called at most every version_check_interval seconds; when its
+    value changes (a new KB build) every entry is invalidated. By default it is
+    the build version of kb_path, the KB the searches run against (a CSV, .kbc
+    or shard directory). Cached results are shared between callers and must
+    not be mutated.
+    """
+    
+    def __init__(self, max_entries: int = 10000, ttl: float = 300.0,
+                 version: Optional[Callable[[], Hashable]] = None, version_check_interval: float = 1.0,
+                 kb_path: str = DEFAULT_KB_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version or (lambda: kb_build_version(kb_path))
+        self.version_check_interval = version_check_interval
+        self.metrics = collections.Counter()
+        
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._current_version = self.version()
+        self._version_checked = time.monotonic()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    @staticmethod
+    def key(query: str, mode: str, limit: int, filters: Optional[Dict[str, Any]] = None) -> Tuple[str, str, int, str]:
+        return normalize_query(query), mode, limit, filters_key(filters)
+    
+    def _check_version(self, now: float):
+        if now - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = now
+        version = self.version()
+        if version != self._current_version:
+            self._current_version = version
+            self._entries.clear()
+            self.metrics['invalidations'] += 1
+    
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """(True, result) on a hit, (False, None) on a miss or expired entry"""
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.metrics['hits'] += 1
+                    return True, result
+                del self._entries[key]
+                self.metrics['expirations'] += 1
+            self.metrics['misses'] += 1
+            return False, None
+    
+    def put(self, key: Hashable, result: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.metrics['evictions'] += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def get_or_search(self, search: Callable[..., Any], query: str, mode: str, limit: int,
+                      filters: Optional[Dict[str, Any]] = None) -> Any:
+        key = self.key(query, mode, limit, filters)
+        hit, result = self.get(key)
+        if hit:
+            return result
+        # search with the normalized query, so the cached result is the same whichever
+        # spelling of it missed first
+        result = search(key[0], limit, filters)
+        self.put(key, result)
+        return result
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.metrics['hits'] + self.metrics['misses']
+        return {
+            "entries": len(self._entries),
+            "hits": self.metrics['hits'],
+            "misses": self.metrics['misses'],
+            "hit_rate": self.metrics['hits'] / lookups if lookups else 0.0,
+            "expirations": self.metrics['expirations'],
+            "evictions": self.metrics['evictions'],
+            "invalidations": self.metrics['invalidations'],
+        }
+
+def weaviate_filters(filters: Optional[Dict[str, Any]]):
+    """Property equality filters {"source": "..."} as a Weaviate filter (None if empty)"""
+    if not filters:
+        return None
+    from weaviate.classes.query import Filter
+    
+    combined = None
+    for prop, value in sorted(filters.items()):
+        condition = Filter.by_property(prop).equal(value)
+        combined = condition if combined is None else combined & condition
+    return combined
+
+class CachedCollectionSearch:
+    """near_text / bm25 / hybrid searches of a Weaviate collection through a QueryCache"""
+    
+    def __init__(self, collection, cache: Optional[QueryCache] = None, kb_path: str = DEFAULT_KB_PATH):
+        """kb_path is the KB the collection was loaded from; its rebuilds invalidate the cache"""
+        self.collection = collection
+        self.cache = cache if cache is not None else QueryCache(kb_path=kb_path)
+    
+    def near_text(self, query: str, limit: int = 10, filters: Optional[Dict[str, Any]] = None):
+        return self.cache.get_or_search(
+            lambda q, n, f: self.collection.query.near_text(query=q, limit=n, filters=weaviate_filters(f)),
+            query, 'near_text', limit, filters)
+    
+    def bm25(self, query: str, limit: int = 10, filters: Optional[Dict[str, Any]] = None):
+        return self.cache.get_or_search(
+            lambda q, n, f: self.collection.query.bm25(query=q, limit=n, filters=weaviate_filters(f)),
+            query, 'bm25', limit, filters)
+    
+    def hybrid(self, query: str, limit: int = 10, filters: Optional[Dict[str, Any]] = None):
+        return self.cache.get_or_search(
+            lambda q, n, f: self.collection.query.hybrid(query=q, limit=n, filters=weaviate_filters(f)),
+            query, 'hybrid', limit, filters)
+
+class CachedNameSearch:
+    """NameIndex.search through a QueryCache; filters are unsupported by the name index"""
+    
+    def __init__(self, index, cache: Optional[QueryCache] = None, min_score: float = 0.0):
+        self.index = index
+        # invalidated by rebuilds of the KB (or processed_names.csv) the index was built from
+        self.cache = cache if cache is not None else QueryCache(kb_path=index.kb_path or DEFAULT_KB_PATH)
+        self.min_score = min_score
+    
+    def search(self, query: str, limit: int = 10):
+        return self.cache.get_or_search(lambda q, n, f: self.index.search(q, n, self.min_score),
+                                        query, f'name_index:{self.min_score}', limit)
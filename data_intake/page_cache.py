@@ -0,0 +1,103 @@
+# persistent cache of fetched pages for the TPS scraper: the body of every page is kept on
+# disk with its ETag, Last-Modified and a content hash, so a later run can revalidate a page
+# with a conditional GET (If-None-Match / If-Modified-Since) and reuse the stored body on a
+# 304 instead of downloading it again, and can tell whether a page actually changed.
+#
+# cache layout:
+#   index.json         url -> {file, etag, last_modified, sha256, fetched_at}
+#   pages/<hash>.html  page bodies, named by the sha256 of the URL
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class PageCache:
+    """On-disk page store with HTTP validators; the index is written by save()"""
+    
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        self._pages_dir = os.path.join(cache_dir, 'pages')
+        self._index_path = os.path.join(cache_dir, 'index.json')
+        self._lock = threading.Lock()
+        
+        os.makedirs(self._pages_dir, exist_ok=True)
+        self._index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+    
+    def __contains__(self, url: str) -> bool:
+        return url in self._index
+    
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Validators of the stored copy of url, empty if there is none"""
+        entry = self._index.get(url)
+        if entry is None or not os.path.exists(os.path.join(self._pages_dir, entry["file"])):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers['If-None-Match'] = entry["etag"]
+        if entry.get("last_modified"):
+            headers['If-Modified-Since'] = entry["last_modified"]
+        return headers
+    
+    def get(self, url: str) -> Optional[str]:
+        entry = self._index.get(url)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self._pages_dir, entry["file"]), 'r', encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def put(self, url: str, body: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> bool:
+        """Store a freshly downloaded page; True if its content differs from the stored copy"""
+        digest = content_hash(body)
+        file_name = hashlib.sha256(url.encode('utf-8')).hexdigest() + '.html'
+        with self._lock:
+            previous = self._index.get(url)
+            changed = previous is None or previous["sha256"] != digest
+            if changed:
+                tmp_path = os.path.join(self._pages_dir, file_name + '.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(body)
+                os.replace(tmp_path, os.path.join(self._pages_dir, file_name))
+            self._index[url] = {
+                "file": file_name,
+                "etag": etag,
+                "last_modified": last_modified,
+                "sha256": digest,
+                "fetched_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        return changed
+    
+    def touch(self, url: str):
+        """Record a successful revalidation (HTTP 304) of the stored copy"""
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is not None:
+                entry["fetched_at"] = time.strftime('%Y-%m-%d %H:%M:%S')
+    
+    def discard(self, url: str):
+        """Forget the stored copy of url, e.g. when its body can no longer be read"""
+        with self._lock:
+            entry = self._index.pop(url, None)
+        if entry is not None:
+            try:
+                os.remove(os.path.join(self._pages_dir, entry["file"]))
+            except FileNotFoundError:
+                pass
+    
+    def save(self):
+        with self._lock:
+            tmp_path = self._index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self._index_path)
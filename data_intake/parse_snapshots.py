@@ -0,0 +1,217 @@
+# field extraction for TPS most-wanted pages, shared by the scraper and an offline parse
+# stage that rebuilds tpl_most_wanted.csv from the snapshot archive (snapshot_archive.py)
+# with no network traffic: pages are parsed with lxml and precompiled regexes in a pool of
+# worker processes, the suspects come from the newest listing snapshot and each suspect's
+# fields from its newest detail snapshot.
+#
+# usage: python parse_snapshots.py [tps_snapshots] [--output tpl_most_wanted.csv] [--workers 8] [--since 20250101]
+
+import csv
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from urllib.parse import urljoin
+
+import lxml.html
+from lxml import etree
+
+from snapshot_archive import iter_snapshots
+
+DEFAULT_BASE_URL = "https://www.tps.ca"
+DEFAULT_CHUNK_SIZE = 64
+
+# Tried in order; the first pattern that finds suspects wins
+SUSPECT_LINK_PATTERNS = [
+    re.compile(r'/organizational-chart/.*/homicide/suspect/\d+/'),
+    re.compile(r'/homicide/suspect/\d+/'),
+    re.compile(r'suspect/\d+/'),
+]
+SUSPECT_ID_PATTERN = re.compile(r'suspect/(\d+)/')
+SKIP_LINK_TEXTS = ['photo of', 'homicide most wanted', 'suspect', 'placeholder']
+
+DETAIL_PATTERNS = {
+    'case_number': re.compile(r'Case #:\s*([^\n]+)'),
+    'division': re.compile(r'(\d+)\s+Division'),
+    'date_of_birth': re.compile(r'Date of Birth:\s*([^\n]+)'),
+    'age': re.compile(r'Age:\s*(\d+)'),
+    'gender': re.compile(r'Gender:\s*([MF])'),
+    'homicide_case': re.compile(r'Homicide #:\s*([^\n]+)'),
+}
+PHOTO_PATTERN = re.compile(r'/media/homicide/suspect/')
+
+CSV_HEADERS = [
+    'name', 'suspect_id', 'link', 'homicide_case', 'case_number',
+    'division', 'date_of_birth', 'age', 'gender', 'photo_url',
+    'scraped_at', 'source'
+]
+
+def parse_document(html: str):
+    try:
+        return lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+def link_text(link) -> str:
+    # like BeautifulSoup's get_text(strip=True): every text node stripped, then joined
+    return ''.join(text.strip() for text in link.itertext())
+
+def suspect_id_of(href: str) -> str:
+    match = SUSPECT_ID_PATTERN.search(href)
+    return match.group(1) if match else 'unknown'
+
+def extract_suspects(html: str, base_url: str = DEFAULT_BASE_URL) -> List[Dict[str, str]]:
+    """Suspects (name, link, suspect_id) linked from a most-wanted listing page"""
+    doc = parse_document(html)
+    if doc is None:
+        return []
+    links = [(link.get('href'), link_text(link)) for link in doc.iter('a') if link.get('href')]
+    
+    suspects = []
+    seen_links = set()
+    for pattern in SUSPECT_LINK_PATTERNS:
+        for href, name in links:
+            if href not in seen_links and pattern.search(href):
+                seen_links.add(href)
+                if name and name != "Photo of" and len(name) > 2:
+                    suspects.append({'name': name, 'link': urljoin(base_url, href), 'suspect_id': suspect_id_of(href)})
+        if suspects:
+            return suspects
+    
+    # no standard suspect links: any "suspect" link with a plausible name
+    for href, text in links:
+        if 'suspect' in href.lower() and len(text) > 5 and text not in seen_links:
+            if any(skip in text.lower() for skip in SKIP_LINK_TEXTS):
+                continue
+            seen_links.add(text)
+            suspects.append({'name': text, 'link': urljoin(base_url, href), 'suspect_id': suspect_id_of(href)})
+    return suspects
+
+def extract_details(html: str, base_url: str = DEFAULT_BASE_URL) -> Dict[str, str]:
+    """Fields of a suspect detail page (case number, division, DOB, age, gender, photo)"""
+    doc = parse_document(html)
+    if doc is None:
+        return {}
+    for element in list(doc.iter('script', 'style')):
+        element.drop_tree()
+    text_content = doc.text_content()
+    
+    details = {}
+    for field, pattern in DETAIL_PATTERNS.items():
+        match = pattern.search(text_content)
+        if match:
+            details[field] = match.group(1).strip()
+    
+    for img in doc.iter('img'):
+        src = img.get('src')
+        if src and PHOTO_PATTERN.search(src):
+            details['photo_url'] = urljoin(base_url, src)
+            break
+    return details
+
+def parse_snapshot(snapshot: Dict[str, Any]) -> Tuple[str, Dict[str, Any], Any]:
+    """(kind, snapshot metadata, extracted suspects or details) of one archived page"""
+    meta = {key: value for key, value in snapshot.items() if key != 'html'}
+    base_url = urljoin(snapshot['url'], '/')
+    if snapshot['kind'] == 'listing':
+        return 'listing', meta, extract_suspects(snapshot['html'], base_url)
+    return 'detail', meta, extract_details(snapshot['html'], base_url)
+
+def _parse_chunk(snapshots: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any], Any]]:
+    return [parse_snapshot(snapshot) for snapshot in snapshots]
+
+def _chunks(snapshots: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for snapshot in snapshots:
+        chunk.append(snapshot)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parse_snapshots(snapshots: Iterable[Dict[str, Any]], workers: int = 1,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[str, Dict[str, Any], Any]]:
+    """Yield parse_snapshot results in archive order, with at most two chunks per worker in flight"""
+    if workers == 1:
+        for snapshot in snapshots:
+            yield parse_snapshot(snapshot)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        chunk_iter = _chunks(snapshots, chunk_size)
+        
+        while True:
+            while len(pending) < workers * 2:
+                chunk = next(chunk_iter, None)
+                if chunk is None:
+                    break
+                pending.append(executor.submit(_parse_chunk, chunk))
+            
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+def rebuild_rows(parsed: Iterable[Tuple[str, Dict[str, Any], Any]]) -> List[Dict[str, str]]:
+    """CSV rows of the suspects on the newest listing, each with its newest detail fields"""
+    listing = []
+    details = {}
+    for kind, meta, extracted in parsed:
+        if kind == 'listing':
+            if extracted:
+                listing = extracted
+        elif meta.get('suspect_id') and extracted:
+            details[meta['suspect_id']] = dict(extracted, scraped_at=meta['fetched_at'])
+    
+    rows = []
+    for suspect in listing:
+        row = dict(suspect)
+        row.update(details.get(suspect['suspect_id'], {}))
+        row['source'] = 'selenium_scraper'
+        rows.append(row)
+    return rows
+
+def write_rows(rows: List[Dict[str, str]], filename: str):
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({header: row.get(header, '') for header in CSV_HEADERS})
+    os.replace(tmp_filename, filename)
+
+def main():
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description='Rebuild the TPS most-wanted CSV from archived page snapshots')
+    parser.add_argument('archive', nargs='?', default='tps_snapshots', help='Snapshot archive directory or file')
+    parser.add_argument('--output', default='tpl_most_wanted.csv', help='CSV file to write')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Parser processes')
+    parser.add_argument('--since', default=None, help='Only read snapshot files from this run on (YYYYmmdd[THHMMSS])')
+    
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    pages = 0
+    
+    def counted(parsed):
+        nonlocal pages
+        for result in parsed:
+            pages += 1
+            yield result
+    
+    rows = rebuild_rows(counted(parse_snapshots(iter_snapshots(args.archive, args.since), args.workers)))
+    if not rows:
+        print(f"No listing snapshot with suspects found in {args.archive}")
+        return
+    write_rows(rows, args.output)
+    
+    elapsed = time.perf_counter() - start
+    print(f"Parsed {pages} snapshots in {elapsed:.2f}s ({pages / elapsed:.0f} pages/s), "
+          f"wrote {len(rows)} suspects to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# compressed archive of the raw pages the TPS scraper fetched, so extraction can be rerun
+# offline (parse_snapshots.py) when the rules change, without touching the network.
+#
+# Every run appends to a file named by its start time, <archive dir>/snapshots-<YYYYmmddTHHMMSS>.jsonl.gz
+# (.jsonl.zst with zstandard); one JSON object per page:
+#   {"url", "kind": "listing" | "detail", "fetched_at", "html"}
+# plus "suspect_id", "name" and "link" of the listing entry for detail pages.
+
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# What reading a file cut off (or damaged) mid-stream raises
+TRUNCATION_ERRORS = (EOFError, gzip.BadGzipFile) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+def _open_snapshots(path: str, mode: str):
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd compressed snapshots")
+        return zstandard.open(path, mode, encoding='utf-8')
+    return gzip.open(path, mode, compresslevel=6, encoding='utf-8')
+
+class SnapshotArchive:
+    """Thread-safe writer of one run's snapshot file"""
+    
+    def __init__(self, archive_dir: str, compression: str = 'gzip'):
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported snapshot compression {compression!r}, expected one of {sorted(COMPRESSION_SUFFIXES)}")
+        os.makedirs(archive_dir, exist_ok=True)
+        self.path = os.path.join(archive_dir, f"snapshots-{time.strftime('%Y%m%dT%H%M%S')}.jsonl{COMPRESSION_SUFFIXES[compression]}")
+        self.count = 0
+        self._file = _open_snapshots(self.path, 'at')
+        self._lock = threading.Lock()
+    
+    def add(self, url: str, html: str, kind: str, **meta: Any):
+        record = {"url": url, "kind": kind, "fetched_at": time.strftime('%Y-%m-%d %H:%M:%S'), **meta, "html": html}
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self.count += 1
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+def snapshot_files(archive: str) -> List[str]:
+    """Snapshot files of an archive directory (or a single file), oldest first"""
+    if os.path.isfile(archive):
+        return [archive]
+    return sorted(glob.glob(os.path.join(archive, 'snapshots-*.jsonl.*')))
+
+def iter_snapshots(archive: str, since: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Snapshot records oldest first; a file cut off by an interrupted run ends at its last complete record"""
+    for path in snapshot_files(archive):
+        if since and os.path.basename(path) < f"snapshots-{since}":
+            continue
+        try:
+            with _open_snapshots(path, 'rt') as f:
+                for line in f:
+                    if line.endswith('\n'):
+                        yield json.loads(line)
+        except TRUNCATION_ERRORS as e:
+            print(f"Snapshot file {path} is truncated ({e}), using the records before the damage")
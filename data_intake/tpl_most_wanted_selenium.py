@@ -1,39 +1,188 @@
 #!/usr/bin/env python3
 
+# scraper for the Toronto Police Service homicide most-wanted list (tpl_most_wanted.csv).
+# By default every page is loaded through one Chrome driver; with --http the pages are
+# fetched by a pool of workers over a pooled HTTP session, capped per host, and only a
+# page answered with a bot challenge is loaded through the (lazily started) browser.
+#
+# Requests are paced by an adaptive token bucket instead of fixed random sleeps: the rate
+# grows while the site answers quickly and is halved on 429/503 (honouring Retry-After)
+# or slow responses. Browser pages are ready as soon as the suspect links or fields are
+# in the DOM and no challenge element is shown.
+#
+# Runs are incremental: only suspects that are new on the listing, whose listing entry
+# (name, link) changed or who got no details last time are fetched, and the results are
+# merged into the existing CSV by suspect_id. In --http mode fetched pages are kept in a
+# page cache (page_cache.py) and revalidated with conditional requests, so a scheduled
+# run over an unchanged listing costs a single 304.
+#
+# Every page is also appended to a compressed snapshot archive (snapshot_archive.py);
+# parse_snapshots.py holds the lxml field extraction used here and can rebuild the CSV
+# from the archive offline.
+#
+# usage: python tpl_most_wanted_selenium.py [--headless] [--http --workers 8 --max-per-host 4]
+#        [--base-url http://localhost:8000]   (e.g. a local server with saved TPS pages)
+#        [--cache-dir tps_page_cache | --no-cache] [--full] [--rate 1 --max-rate 4]
+#        [--snapshots tps_snapshots | --no-snapshots]
+
+import collections
 import csv
-import re
+import os
 import time
-import random
 import logging
-from urllib.parse import urljoin
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
+from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
-from bs4 import BeautifulSoup
+
+from page_cache import PageCache
+from parse_snapshots import CSV_HEADERS, extract_details, extract_suspects
+from snapshot_archive import SnapshotArchive, zstandard
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+DEFAULT_BASE_URL = "https://www.tps.ca"
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+
+CLOUDFLARE_INDICATORS = [
+    'cloudflare',
+    'checking your browser',
+    'please wait',
+    'security check',
+    'ddos protection',
+    'just a moment'
+]
+
+# Elements of a Cloudflare interstitial; the page is not ready while any is present
+CHALLENGE_SELECTOR = "#challenge-form, #challenge-stage, #cf-challenge-running, .cf-browser-verification, iframe[src*='challenges.cloudflare.com']"
+# The same elements as they appear in an HTTP response body; CLOUDFLARE_INDICATORS are too
+# loose for bodies (any page may say "please wait" or link to cloudflare) and are only
+# matched against the browser's page title
+CHALLENGE_MARKERS = ['challenge-form', 'challenge-stage', 'cf-challenge-running', 'cf-browser-verification',
+                     'challenges.cloudflare.com']
+
+# HTTP answers that mean "slow down": the rate limiter backs off, then the page is retried
+# over HTTP, or fetched with the browser if the answer is a challenge page
+THROTTLE_STATUSES = {403, 429, 503}
+
+# Browser readiness: suspect links on the listing, suspect photo or fields on a detail page
+LISTING_READY = (By.CSS_SELECTOR, "a[href*='/homicide/suspect/']")
+DETAIL_READY = (By.XPATH, "//img[contains(@src, '/media/homicide/suspect/')] | //*[contains(text(), 'Case #') or contains(text(), 'Homicide #')]")
+
+# Fields only found on a detail page; a row without any of them is fetched again
+DETAIL_FIELDS = ['case_number', 'age', 'gender', 'division']
+
+def is_challenge_page(page_source, page_title=''):
+    page_source = page_source.lower()
+    page_title = page_title.lower()
+    return any(indicator in page_source or indicator in page_title for indicator in CLOUDFLARE_INDICATORS)
+
+def is_challenge_response(response):
+    """Whether an HTTP response is a Cloudflare challenge rather than the page"""
+    if response.headers.get('cf-mitigated', '').lower() == 'challenge':
+        return True
+    if response.status_code in (403, 503) and 'cloudflare' in response.headers.get('Server', '').lower():
+        return True
+    return any(marker in response.text for marker in CHALLENGE_MARKERS)
+
+def retry_after_seconds(response):
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+class AdaptiveRateLimiter:
+    """Token bucket with an additive-increase / multiplicative-decrease rate: grow
+    while responses come back under target_latency, shrink when they are slow, halve
+    and pause (for Retry-After if given) when the site throttles."""
+    
+    def __init__(self, rate=1.0, burst=2, min_rate=0.1, max_rate=4.0, target_latency=1.5, step=0.25):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.step = step
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+    
+    def record_response(self, latency):
+        with self._lock:
+            if latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate * 0.75)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.step)
+    
+    def record_throttled(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
 class SeleniumTPSScraper:
-    def __init__(self, headless=False):
-        self.base_url = "https://www.tps.ca"
+    def __init__(self, headless=False, base_url=DEFAULT_BASE_URL, http=False, workers=1, max_per_host=4, timeout=30,
+                 cache_dir=None, rate_limiter=None, snapshot_dir=None):
+        self.base_url = base_url.rstrip('/')
         self.most_wanted_url = "/organizational-chart/specialized-operations-command/detective-operations/investigative-services/homicide/most-wanted/"
         self.headless = headless
         self.driver = None
+        self.rate_limiter = rate_limiter if rate_limiter is not None else AdaptiveRateLimiter()
         
+        # HTTP mode: pooled session, bounded worker pool and per-host concurrency cap
+        self.http = http
+        self.workers = max(1, workers)
+        self.max_per_host = max(1, max_per_host)
+        self.timeout = timeout
+        self.session = None
+        self.browser_fallbacks = 0
+        self._driver_lock = threading.Lock()
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+        
+        # conditional requests against the pages of earlier runs (HTTP mode)
+        self.page_cache = PageCache(cache_dir) if cache_dir else None
+        self.fetch_counts = collections.Counter()
+        self._counts_lock = threading.Lock()
+        
+        # raw pages for offline re-parsing, one archive file per run
+        self.snapshot_dir = snapshot_dir
+        self.snapshots = None
+    
     def setup_driver(self):
         chrome_options = Options()
         
         if self.headless:
             chrome_options.add_argument("--headless")
-            
+        
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--disable-blink-features=AutomationControlled")
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
-        chrome_options.add_argument("--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36")
+        chrome_options.add_argument(f"--user-agent={USER_AGENT}")
         
         try:
             self.driver = webdriver.Chrome(options=chrome_options)
@@ -44,37 +193,124 @@ class SeleniumTPSScraper:
             logger.error(f"Failed to initialize WebDriver: {e}")
             return False
     
-    def wait_for_page_load(self, timeout=30):
-        try:
-            WebDriverWait(self.driver, timeout).until(
-                lambda driver: driver.execute_script("return document.readyState") == "complete"
-            )
-            
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                page_source = self.driver.page_source.lower()
-                page_title = self.driver.title.lower()
-                
-                cloudflare_indicators = [
-                    'cloudflare',
-                    'checking your browser',
-                    'please wait',
-                    'security check',
-                    'ddos protection',
-                    'just a moment'
-                ]
-                
-                if any(indicator in page_source or indicator in page_title for indicator in cloudflare_indicators):
-                    logger.info("Detected Cloudflare challenge, waiting...")
-                    time.sleep(2)
+    def setup_session(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(self.workers, self.max_per_host))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': USER_AGENT,
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+            'Accept-Language': 'en-CA,en;q=0.9',
+        })
+        logger.info(f"HTTP session initialized ({self.workers} workers, at most {self.max_per_host} per host)")
+    
+    def host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return slot
+    
+    def count(self, key):
+        with self._counts_lock:
+            self.fetch_counts[key] += 1
+    
+    def fetch_page(self, url, ready_locator=None, attempts=3):
+        """Page source over HTTP, or through the browser if the server answers with a challenge"""
+        headers = self.page_cache.conditional_headers(url) if self.page_cache is not None else {}
+        for _ in range(attempts):
+            with self.host_slot(url):
+                self.rate_limiter.acquire()
+                start_time = time.monotonic()
+                try:
+                    response = self.session.get(url, headers=headers, timeout=self.timeout)
+                    self.count('requests')
+                except requests.RequestException as e:
+                    logger.warning(f"HTTP fetch of {url} failed ({e})")
+                    self.rate_limiter.record_throttled()
                     continue
-                else:
-                    break
             
-            time.sleep(random.uniform(2, 4))
+            if response.status_code in THROTTLE_STATUSES:
+                self.count('throttled')
+                self.rate_limiter.record_throttled(retry_after_seconds(response))
+                logger.info(f"HTTP {response.status_code} for {url}, slowing down to {self.rate_limiter.rate:.2f} requests/s")
+                if is_challenge_response(response):
+                    logger.info(f"Challenge (HTTP {response.status_code}) for {url}, falling back to the browser")
+                    break
+                continue
+            self.rate_limiter.record_response(time.monotonic() - start_time)
+            
+            if response.status_code == 304:
+                cached = self.page_cache.get(url) if self.page_cache is not None else None
+                if cached is not None:
+                    self.page_cache.touch(url)
+                    self.count('not_modified')
+                    return cached
+                # the stored copy went missing since the validators were sent: fetch it whole
+                logger.info(f"HTTP 304 for {url} without a readable cached copy, fetching it again")
+                if self.page_cache is not None:
+                    self.page_cache.discard(url)
+                headers = {}
+                continue
+            if not is_challenge_response(response):
+                response.raise_for_status()
+                if self.page_cache is not None:
+                    self.page_cache.put(url, response.text, response.headers.get('ETag'),
+                                        response.headers.get('Last-Modified'))
+                return response.text
+            logger.info(f"Challenge (HTTP {response.status_code}) for {url}, falling back to the browser")
+            break
+        return self.fetch_page_with_browser(url, ready_locator)
+    
+    def fetch_page_with_browser(self, url, ready_locator=None):
+        # one shared driver, started on the first challenge; WebDriver is not thread-safe
+        with self._driver_lock:
+            self.browser_fallbacks += 1
+            if self.driver is None and not self.setup_driver():
+                raise RuntimeError(f"Cannot load {url}: WebDriver failed to start")
+            self.load_in_browser(url, ready_locator)
+            return self.driver.page_source
+    
+    def load_in_browser(self, url, ready_locator=None):
+        self.rate_limiter.acquire()
+        start_time = time.monotonic()
+        self.driver.get(url)
+        if self.wait_for_page_load(ready_locator):
+            self.rate_limiter.record_response(time.monotonic() - start_time)
+            return True
+        self.rate_limiter.record_throttled()
+        return False
+    
+    def challenge_present(self):
+        return bool(self.driver.find_elements(By.CSS_SELECTOR, CHALLENGE_SELECTOR)) or is_challenge_page('', self.driver.title)
+    
+    def wait_for_page_load(self, ready_locator=None, timeout=30, grace=5):
+        """Wait until the document is complete, no challenge element is shown and
+        ready_locator (a (By, selector) pair) matches. A page that never shows the
+        locator is accepted after `grace` seconds without a challenge."""
+        settled = {}
+        
+        def ready(driver):
+            if driver.execute_script("return document.readyState") != "complete":
+                return False
+            if self.challenge_present():
+                if not settled.get('challenge'):
+                    logger.info("Detected Cloudflare challenge, waiting...")
+                settled.clear()
+                settled['challenge'] = True
+                return False
+            if ready_locator is None or driver.find_elements(*ready_locator):
+                return True
+            settled.setdefault('since', time.monotonic())
+            return time.monotonic() - settled['since'] >= grace
+        
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.25).until(ready)
             logger.info("Page load completed")
             return True
-            
+        
         except TimeoutException:
             logger.warning(f"Page load timeout after {timeout} seconds")
             return False
@@ -84,94 +320,39 @@ class SeleniumTPSScraper:
         logger.info(f"Navigating to: {url}")
         
         try:
-            self.driver.get(url)
-            self.wait_for_page_load()
-            
-            page_title = self.driver.title
-            current_url = self.driver.current_url
-            logger.info(f"Page loaded - Title: '{page_title}', URL: {current_url}")
-            
-            if "403" in page_title or "Forbidden" in self.driver.page_source:
-                logger.error("Page access forbidden")
-                return []
-            
-            if "404" in page_title or "Not Found" in page_title:
-                logger.error("Page not found")
-                return []
-            
-            page_source = self.driver.page_source
-            if "cloudflare" in page_source.lower() or "checking your browser" in page_source.lower():
-                logger.warning("Detected Cloudflare challenge - waiting longer...")
-                time.sleep(10)
+            if self.session is not None:
+                page_source = self.fetch_page(url, LISTING_READY)
+            else:
+                self.load_in_browser(url, LISTING_READY)
+                
+                page_title = self.driver.title
+                current_url = self.driver.current_url
+                logger.info(f"Page loaded - Title: '{page_title}', URL: {current_url}")
+                
+                if "403" in page_title or "Forbidden" in self.driver.page_source:
+                    logger.error("Page access forbidden")
+                    return []
+                
+                if "404" in page_title or "Not Found" in page_title:
+                    logger.error("Page not found")
+                    return []
+                
                 page_source = self.driver.page_source
             
             with open('debug_page_source.html', 'w', encoding='utf-8') as f:
                 f.write(page_source)
             logger.info("Page source saved to debug_page_source.html for inspection")
             
-            soup = BeautifulSoup(page_source, 'html.parser')
+            if self.snapshots is not None:
+                self.snapshots.add(url, page_source, 'listing')
             
-            all_links = soup.find_all('a', href=True)
-            suspect_patterns = [
-                r'/organizational-chart/.*/homicide/suspect/\d+/',
-                r'/homicide/suspect/\d+/',
-                r'suspect/\d+/',
-            ]
-            
-            suspects = []
-            seen_links = set()
-            
-            for pattern in suspect_patterns:
-                suspect_links = soup.find_all('a', href=re.compile(pattern))
-                logger.info(f"Pattern '{pattern}' found {len(suspect_links)} links")
-                
-                for link in suspect_links:
-                    href = link.get('href')
-                    if href and href not in seen_links:
-                        seen_links.add(href)
-                        full_url = urljoin(self.base_url, href)
-                        
-                        name = link.get_text(strip=True)
-                        if name and name != "Photo of" and len(name) > 2:
-                            suspect_id_match = re.search(r'suspect/(\d+)/', href)
-                            suspect_id = suspect_id_match.group(1) if suspect_id_match else 'unknown'
-                            
-                            suspects.append({
-                                'name': name,
-                                'link': full_url,
-                                'suspect_id': suspect_id
-                            })
-                            logger.info(f"Found suspect: {name} (ID: {suspect_id})")
-                
-                if suspects:
-                    break
-            
-            if not suspects:
-                logger.warning("No suspects found with standard patterns, trying manual extraction...")
-                for link in all_links:
-                    href = link.get('href', '')
-                    text = link.get_text(strip=True)
-                    
-                    if 'suspect' in href.lower() and len(text) > 5 and text not in seen_links:
-                        skip_texts = ['photo of', 'homicide most wanted', 'suspect', 'placeholder']
-                        if any(skip in text.lower() for skip in skip_texts):
-                            continue
-                            
-                        seen_links.add(text)
-                        full_url = urljoin(self.base_url, href)
-                        suspect_id_match = re.search(r'suspect/(\d+)/', href)
-                        suspect_id = suspect_id_match.group(1) if suspect_id_match else 'unknown'
-                        
-                        suspects.append({
-                            'name': text,
-                            'link': full_url,
-                            'suspect_id': suspect_id
-                        })
-                        logger.info(f"Manual extraction found suspect: {text} (ID: {suspect_id})")
+            suspects = extract_suspects(page_source, self.base_url)
+            for suspect in suspects:
+                logger.info(f"Found suspect: {suspect['name']} (ID: {suspect['suspect_id']})")
             
             logger.info(f"Total unique suspects found: {len(suspects)}")
             return suspects
-            
+        
         except Exception as e:
             logger.error(f"Error accessing main page: {e}")
             import traceback
@@ -182,73 +363,84 @@ class SeleniumTPSScraper:
         logger.info(f"Getting details for: {suspect_info['name']}")
         
         try:
-            self.driver.get(suspect_info['link'])
-            self.wait_for_page_load()
+            if self.session is not None:
+                page_source = self.fetch_page(suspect_info['link'], DETAIL_READY)
+            else:
+                self.load_in_browser(suspect_info['link'], DETAIL_READY)
+                page_source = self.driver.page_source
             
-            page_source = self.driver.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
+            if self.snapshots is not None:
+                self.snapshots.add(suspect_info['link'], page_source, 'detail', suspect_id=suspect_info['suspect_id'],
+                                   name=suspect_info['name'], link=suspect_info['link'])
             
             details = suspect_info.copy()
-            text_content = soup.get_text()
-            
-            patterns = {
-                'case_number': r'Case #:\s*([^\n]+)',
-                'division': r'(\d+)\s+Division',
-                'date_of_birth': r'Date of Birth:\s*([^\n]+)',
-                'age': r'Age:\s*(\d+)',
-                'gender': r'Gender:\s*([MF])',
-                'homicide_case': r'Homicide #:\s*([^\n]+)'
-            }
-            
-            for field, pattern in patterns.items():
-                match = re.search(pattern, text_content)
-                if match:
-                    details[field] = match.group(1).strip()
-            
-            photo_img = soup.find('img', src=re.compile(r'/media/homicide/suspect/'))
-            if photo_img:
-                details['photo_url'] = urljoin(self.base_url, photo_img['src'])
+            details.update(extract_details(page_source, self.base_url))
             
             details['scraped_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
             details['source'] = 'selenium_scraper'
             
-            time.sleep(random.uniform(2, 5))
-            
             return details
-            
+        
         except Exception as e:
             logger.error(f"Error getting details for {suspect_info['name']}: {e}")
             return suspect_info
     
+    def iter_suspect_details(self, suspects):
+        """Details of every suspect in listing order, fetched by the worker pool in HTTP mode"""
+        if self.session is None or self.workers == 1:
+            for suspect in suspects:
+                yield self.get_suspect_details(suspect)
+            return
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(self.get_suspect_details, suspects)
+    
+    def load_csv(self, filename):
+        """Rows of an earlier run keyed by suspect_id"""
+        if not os.path.exists(filename):
+            return {}
+        with open(filename, 'r', newline='', encoding='utf-8') as csvfile:
+            return {row['suspect_id']: row for row in csv.DictReader(csvfile) if row.get('suspect_id')}
+    
+    def needs_details(self, suspect, previous):
+        if previous is None or suspect['suspect_id'] == 'unknown':
+            return True
+        if previous.get('name') != suspect['name'] or previous.get('link') != suspect['link']:
+            return True
+        return not any(previous.get(key) for key in DETAIL_FIELDS)
+    
     def save_to_csv(self, suspects_data, filename='tpl_most_wanted.csv'):
         if not suspects_data:
             logger.warning("No data to save")
             return None
         
-        headers = [
-            'name', 'suspect_id', 'link', 'homicide_case', 'case_number', 
-            'division', 'date_of_birth', 'age', 'gender', 'photo_url', 
-            'scraped_at', 'source'
-        ]
+        headers = CSV_HEADERS
         
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        # written aside and renamed, the CSV is the state the next incremental run starts from
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.DictWriter(csvfile, fieldnames=headers)
             writer.writeheader()
             
             for suspect in suspects_data:
                 row = {header: suspect.get(header, '') for header in headers}
                 writer.writerow(row)
+        os.replace(tmp_filename, filename)
         
         logger.info(f"Saved {len(suspects_data)} suspects to {filename}")
         return filename
     
-    def run(self):
-        """Main execution method"""
-        if not self.setup_driver():
+    def run(self, output='tpl_most_wanted.csv', full=False):
+        """Main execution method; with full=True every suspect is fetched again"""
+        if self.http:
+            self.setup_session()
+        elif not self.setup_driver():
             return []
+        if self.snapshot_dir:
+            self.snapshots = SnapshotArchive(self.snapshot_dir, 'zstd' if zstandard is not None else 'gzip')
         
         try:
-            logger.info("Starting Selenium scraping of TPS Most Wanted")
+            logger.info(f"Starting {'HTTP' if self.http else 'Selenium'} scraping of TPS Most Wanted")
+            start_time = time.time()
             
             # Get suspects from main page
             suspects = self.get_suspects_from_main_page()
@@ -266,25 +458,47 @@ class SeleniumTPSScraper:
             logger.info(f"Found {len(suspects)} suspects, getting detailed information...")
             print(f"\n✅ Found {len(suspects)} suspects on the main page!")
             
-            # Get detailed information for each suspect
+            # Get detailed information for new and changed suspects only
+            previous = {} if full else self.load_csv(output)
+            stale = [self.needs_details(suspect, previous.get(suspect['suspect_id'])) for suspect in suspects]
+            stale_count = sum(stale)
+            print(f"📥 {stale_count} new or changed suspects to fetch, {len(suspects) - stale_count} unchanged")
+            
+            fetched = self.iter_suspect_details([suspect for suspect, is_stale in zip(suspects, stale) if is_stale])
             detailed_suspects = []
             successful_details = 0
             
-            for i, suspect in enumerate(suspects, 1):
-                logger.info(f"Processing {i}/{len(suspects)}: {suspect['name']}")
-                print(f"Processing {i}/{len(suspects)}: {suspect['name']}")
+            for suspect, is_stale in zip(suspects, stale):
+                if is_stale:
+                    details = next(fetched)
+                    logger.info(f"Processed {len(detailed_suspects) + 1}/{len(suspects)}: {details['name']}")
+                    print(f"Processed {len(detailed_suspects) + 1}/{len(suspects)}: {details['name']}")
+                else:
+                    details = previous[suspect['suspect_id']]
                 
-                details = self.get_suspect_details(suspect)
                 detailed_suspects.append(details)
                 
                 # Check if we got meaningful details
-                if any(details.get(key) for key in ['case_number', 'age', 'gender', 'division']):
+                if any(details.get(key) for key in DETAIL_FIELDS):
                     successful_details += 1
             
-            # Save to CSV
-            filename = self.save_to_csv(detailed_suspects)
+            listed = {suspect['suspect_id'] for suspect in suspects}
+            delisted = [suspect_id for suspect_id in previous if suspect_id not in listed]
+            if delisted:
+                print(f"🗑️  {len(delisted)} suspects no longer listed: {', '.join(delisted)}")
             
-            print(f"\n✅ Selenium scraping completed!")
+            # Save to CSV
+            if stale_count or delisted or not os.path.exists(output):
+                filename = self.save_to_csv(detailed_suspects, output)
+            else:
+                filename = output
+                print("No changes since the last run, CSV left untouched")
+            
+            print(f"\n✅ Scraping completed in {time.time() - start_time:.1f}s!")
+            if self.http:
+                print(f"🌐 {self.fetch_counts['requests']} HTTP requests, {self.fetch_counts['not_modified']} not modified, "
+                      f"{self.fetch_counts['throttled']} throttled, {self.browser_fallbacks} pages needed the browser fallback")
+            print(f"⏱️  Final request rate {self.rate_limiter.rate:.2f}/s")
             print(f"📊 Found {len(detailed_suspects)} suspects")
             print(f"� Got detailed info for {successful_details} suspects")
             print(f"�📄 Data saved to: {filename}")
@@ -294,15 +508,22 @@ class SeleniumTPSScraper:
                 print("This might indicate the individual suspect pages are also protected.")
             
             return detailed_suspects
-            
+        
         except Exception as e:
             logger.error(f"Unexpected error in main execution: {e}")
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
             print(f"\n❌ Unexpected error: {e}")
             return []
-            
+        
         finally:
+            if self.snapshots is not None:
+                self.snapshots.close()
+                logger.info(f"Archived {self.snapshots.count} pages to {self.snapshots.path}")
+            if self.page_cache is not None:
+                self.page_cache.save()
+            if self.session is not None:
+                self.session.close()
             if self.driver:
                 self.driver.quit()
                 logger.info("WebDriver closed")
@@ -313,6 +534,19 @@ def main():
     parser = argparse.ArgumentParser(description='TPS Most Wanted Selenium Scraper')
     parser.add_argument('--headless', action='store_true', help='Run browser in headless mode')
     parser.add_argument('--test', action='store_true', help='Test WebDriver setup only')
+    parser.add_argument('--http', action='store_true',
+                        help='Fetch pages over pooled HTTP, using the browser only for challenge pages')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent detail-page fetches in --http mode')
+    parser.add_argument('--max-per-host', type=int, default=4, help='Concurrent requests per host in --http mode')
+    parser.add_argument('--base-url', default=DEFAULT_BASE_URL, help='Site root, e.g. a local server with saved pages')
+    parser.add_argument('--output', default='tpl_most_wanted.csv', help='CSV file to write')
+    parser.add_argument('--cache-dir', default='tps_page_cache', help='Page cache for conditional requests in --http mode')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the page cache')
+    parser.add_argument('--full', action='store_true', help='Fetch every suspect again instead of only new or changed ones')
+    parser.add_argument('--snapshots', default='tps_snapshots', help='Archive directory for the raw fetched pages')
+    parser.add_argument('--no-snapshots', action='store_true', help='Do not archive the fetched pages')
+    parser.add_argument('--rate', type=float, default=1.0, help='Initial requests per second')
+    parser.add_argument('--max-rate', type=float, default=4.0, help='Requests per second the adaptive rate never exceeds')
     
     args = parser.parse_args()
     
@@ -325,10 +559,14 @@ def main():
             print("❌ WebDriver setup failed!")
         return
     
-    scraper = SeleniumTPSScraper(headless=args.headless)
+    scraper = SeleniumTPSScraper(headless=args.headless, base_url=args.base_url, http=args.http,
+                                 workers=args.workers, max_per_host=args.max_per_host,
+                                 cache_dir=None if args.no_cache or not args.http else args.cache_dir,
+                                 rate_limiter=AdaptiveRateLimiter(rate=args.rate, max_rate=max(args.rate, args.max_rate)),
+                                 snapshot_dir=None if args.no_snapshots else args.snapshots)
     
     try:
-        suspects = scraper.run()
+        suspects = scraper.run(args.output, args.full)
         if suspects:
             print(f"\n📋 Sample suspect data:")
             for key, value in list(suspects[0].items())[:5]:
@@ -336,7 +574,7 @@ def main():
         else:
             print("\n❌ No data was collected")
             print("The website might still be blocking access or there could be technical issues.")
-            
+    
     except KeyboardInterrupt:
         print("\n⚠️ Scraping interrupted by user")
     except Exception as e:
@@ -0,0 +1,89 @@
+# run report of a knowledge-base build: turns the ingestion counters and stage timers that
+# data_preprocess.py collects in its stats Counter into a structured report, written as JSON
+# and as a Prometheus textfile (for node_exporter's textfile collector), so the nightly build
+# can be graphed per stage and alerted on when its throughput drops.
+#
+# Keys of the stats Counter read here:
+#   INGEST_COUNTERS, TPL_COUNTERS,       line outcomes ('lines_read', 'decode_errors', ...)
+#   MERGE_COUNTERS                       and entity merge counts
+#   'seconds_<stage>' for STAGES         time spent per stage, when timing was enabled
+#   ('records', dataset, schema)         records produced per dataset and schema
+
+import collections
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict
+
+from data_preprocess import INGEST_COUNTERS, TPL_COUNTERS, MERGE_COUNTERS, STAGES
+
+METRIC_PREFIX = "kb_build"
+
+def peak_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """Peak resident set size of this process (or of its finished children)"""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def build_report(stats: collections.Counter, started_at: float, elapsed: float, **info: Any) -> Dict[str, Any]:
+    """Run report of a build that started at started_at (epoch seconds) and took
+    elapsed seconds; info (mode, workers, ...) is stored as given"""
+    records = sorted((key[1], key[2], count) for key, count in stats.items()
+                     if isinstance(key, tuple) and key[0] == 'records')
+    lines_read = stats['lines_read']
+    return {
+        "started_at": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started_at)),
+        "started_at_epoch": started_at,
+        "elapsed_seconds": elapsed,
+        **info,
+        "counters": {key: stats[key] for key in INGEST_COUNTERS + TPL_COUNTERS + MERGE_COUNTERS},
+        "stage_seconds": {stage: stats[f'seconds_{stage}'] for stage in STAGES},
+        "records": [{"dataset": dataset, "schema": schema, "count": count} for dataset, schema, count in records],
+        "lines_per_second": lines_read / elapsed if elapsed else 0.0,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_rss_children_bytes": peak_rss_bytes(resource.RUSAGE_CHILDREN),
+    }
+
+def _write_atomic(path: str, text: str):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def write_json_report(report: Dict[str, Any], path: str):
+    _write_atomic(path, json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+
+def _label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(report: Dict[str, Any]) -> str:
+    """The report in the Prometheus text exposition format, every value a gauge of the last run"""
+    lines = []
+    
+    def metric(name: str, help_text: str, samples):
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_label_value(str(label))}"' for key, label in labels.items())
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name} {value}")
+    
+    metric("last_run_timestamp_seconds", "Start time of the last build.",
+           [({}, report["started_at_epoch"])])
+    metric("duration_seconds", "Wall time of the last build.", [({}, report["elapsed_seconds"])])
+    metric("ingest_count", "Ingestion counters of the last build (lines read, skipped, decode errors, records).",
+           [({"counter": key}, value) for key, value in report["counters"].items()])
+    metric("stage_seconds", "Time spent per pipeline stage in the last build.",
+           [({"stage": stage}, seconds) for stage, seconds in report["stage_seconds"].items()])
+    metric("records", "Records produced by the last build per dataset and schema.",
+           [({"dataset": entry["dataset"], "schema": entry["schema"]}, entry["count"]) for entry in report["records"]])
+    metric("lines_per_second", "Input lines per second of the last build.", [({}, report["lines_per_second"])])
+    metric("peak_rss_bytes", "Peak resident set size of the build process.", [({}, report["peak_rss_bytes"])])
+    metric("peak_rss_children_bytes", "Peak resident set size of the largest worker process.",
+           [({}, report["peak_rss_children_bytes"])])
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus_textfile(report: Dict[str, Any], path: str):
+    """Written atomically, as the textfile collector may read at any time"""
+    _write_atomic(path, prometheus_text(report))
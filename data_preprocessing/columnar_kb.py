@@ -0,0 +1,304 @@
+# compact columnar, binary knowledge-base format (processed_entities.kbc) that can be
+# memory-mapped: consumers get random access to record N or a slice of one column
+# without parsing the whole file, and worker processes share the same page cache.
+#
+# file layout (all integers in the byte order recorded in the footer):
+#   MAGIC
+#   per column, 8-byte aligned:
+#     string columns: (count + 1) uint64 offsets, then the utf-8 data blob
+#     dict columns:   count uint32 codes into the footer's value list
+#   footer (JSON: count, byte order, column layout), uint64 footer length, MAGIC
+#
+# When pyarrow is installed the same records can also be written as an Arrow IPC file.
+
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from typing import List, Dict, Iterable, Iterator
+
+from data_preprocess import EntityRecord
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+MAGIC = b'KBCOL001'
+COLUMNAR_FILE = "processed_entities.kbc"
+ARROW_FILE = "processed_entities.arrow"
+
+# (column name, encoding); source has a handful of distinct values so it is dictionary-encoded
+COLUMNS = [('source', 'dict'), ('id', 'string'), ('name', 'string'), ('description', 'string')]
+
+# Offsets/codes buffered in memory before being flushed to the spool files
+FLUSH_EVERY = 65536
+
+def _pad_to_8(f):
+    padding = -f.tell() % 8
+    if padding:
+        f.write(b'\0' * padding)
+
+class ColumnarKBWriter:
+    """Stream records into a columnar KB file. Every column is spooled to its
+    own temporary files while writing and assembled on close, so memory use
+    does not grow with the number of records. The file is renamed into place
+    only once it is complete."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+    
+    def __enter__(self):
+        spool_dir = os.path.dirname(os.path.abspath(self.path))
+        self._dictionaries = {}
+        self._buffers = {}
+        self._data_sizes = {}
+        self._index_spools = {}
+        self._data_spools = {}
+        for name, encoding in COLUMNS:
+            self._index_spools[name] = tempfile.TemporaryFile(dir=spool_dir)
+            if encoding == 'dict':
+                self._dictionaries[name] = {}
+                self._buffers[name] = array('I')
+            else:
+                self._data_spools[name] = tempfile.TemporaryFile(dir=spool_dir)
+                self._data_sizes[name] = 0
+                self._buffers[name] = array('Q', [0])
+        return self
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        for name, encoding in COLUMNS:
+            value = getattr(record, name)
+            if encoding == 'dict':
+                values = self._dictionaries[name]
+                code = values.get(value)
+                if code is None:
+                    code = values[value] = len(values)
+                self._buffers[name].append(code)
+            else:
+                data = value.encode('utf-8')
+                self._data_spools[name].write(data)
+                self._data_sizes[name] += len(data)
+                self._buffers[name].append(self._data_sizes[name])
+        
+        if self.count % FLUSH_EVERY == 0:
+            self._flush()
+    
+    def _flush(self):
+        for name, buffer in self._buffers.items():
+            buffer.tofile(self._index_spools[name])
+            del buffer[:]
+    
+    def _assemble(self):
+        columns = []
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as out:
+            out.write(MAGIC)
+            for name, encoding in COLUMNS:
+                _pad_to_8(out)
+                index_spool = self._index_spools[name]
+                index_spool.seek(0)
+                column = {"name": name, "encoding": encoding, "index_start": out.tell()}
+                shutil.copyfileobj(index_spool, out)
+                if encoding == 'dict':
+                    column["values"] = list(self._dictionaries[name])
+                else:
+                    _pad_to_8(out)
+                    data_spool = self._data_spools[name]
+                    data_spool.seek(0)
+                    column["data_start"] = out.tell()
+                    shutil.copyfileobj(data_spool, out)
+                columns.append(column)
+            
+            footer = json.dumps({"count": self.count, "byteorder": sys.byteorder, "columns": columns},
+                                ensure_ascii=False).encode('utf-8')
+            out.write(footer)
+            out.write(array('Q', [len(footer)]).tobytes())
+            out.write(MAGIC)
+        os.replace(tmp_path, self.path)
+    
+    def __exit__(self, exc_type, exc, tb):
+        completed = False
+        try:
+            if exc_type is None:
+                self._flush()
+                self._assemble()
+                completed = True
+        finally:
+            for spool in [*self._index_spools.values(), *self._data_spools.values()]:
+                spool.close()
+            # a failed stream or assembly leaves no partial file behind
+            if not completed and os.path.exists(self.path + ".tmp"):
+                os.remove(self.path + ".tmp")
+        return False
+
+def write_columnar_kb(records: Iterable[EntityRecord], path: str) -> int:
+    with ColumnarKBWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+class _StringColumn:
+    def __init__(self, kb_map: mmap.mmap, count: int, layout: Dict):
+        self._map = kb_map
+        self._offsets = memoryview(kb_map)[layout["index_start"]:layout["index_start"] + 8 * (count + 1)].cast('Q')
+        self._data_start = layout["data_start"]
+        self._count = count
+    
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("columnar KB index out of range")
+        start = self._data_start + self._offsets[index]
+        end = self._data_start + self._offsets[index + 1]
+        return self._map[start:end].decode('utf-8')
+    
+    def release(self):
+        self._offsets.release()
+
+class _DictColumn:
+    def __init__(self, kb_map: mmap.mmap, count: int, layout: Dict):
+        self._codes = memoryview(kb_map)[layout["index_start"]:layout["index_start"] + 4 * count].cast('I')
+        self._values = layout["values"]
+        self._count = count
+    
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            values = self._values
+            return [values[code] for code in self._codes[index]]
+        return self._values[self._codes[index]]
+    
+    @property
+    def values(self) -> List[str]:
+        return self._values
+    
+    def release(self):
+        self._codes.release()
+
+class ColumnarKB:
+    """Read-only, memory-mapped view of a columnar KB file.
+    
+    kb[n] returns the n-th EntityRecord, kb.column('name')[a:b] a list of values;
+    only the touched pages are read from disk.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        size = len(self._map)
+        if self._map[:8] != MAGIC or self._map[size - 8:] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a columnar KB file")
+        
+        footer_length = array('Q', self._map[size - 16:size - 8])[0]
+        footer = json.loads(self._map[size - 16 - footer_length:size - 16].decode('utf-8'))
+        if footer["byteorder"] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was written with {footer['byteorder']}-endian byte order")
+        
+        self.count = footer["count"]
+        self._columns = {}
+        for layout in footer["columns"]:
+            column_class = _DictColumn if layout["encoding"] == 'dict' else _StringColumn
+            self._columns[layout["name"]] = column_class(self._map, self.count, layout)
+    
+    def __len__(self):
+        return self.count
+    
+    def __getitem__(self, index: int) -> EntityRecord:
+        return EntityRecord(**{name: column[index] for name, column in self._columns.items()})
+    
+    def __iter__(self) -> Iterator[EntityRecord]:
+        for index in range(self.count):
+            yield self[index]
+    
+    def column(self, name: str):
+        return self._columns[name]
+    
+    def close(self):
+        for column in getattr(self, '_columns', {}).values():
+            column.release()
+        self._columns = {}
+        self._map.close()
+        self._file.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class ArrowKBWriter:
+    """Stream records into an Arrow IPC file in record batches (requires pyarrow)"""
+    
+    def __init__(self, path: str, batch_size: int = 65536):
+        if pa is None:
+            raise ImportError("pyarrow is required to write the Arrow knowledge base")
+        self.path = path
+        self.batch_size = batch_size
+        self.count = 0
+        self._schema = pa.schema([(name, pa.string()) for name in EntityRecord._fields])
+    
+    def __enter__(self):
+        self._batch = []
+        self._sink = pa.OSFile(self.path + ".tmp", 'wb')
+        self._writer = pa.ipc.new_file(self._sink, self._schema)
+        return self
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        self._batch.append(record)
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+    
+    def _flush(self):
+        if self._batch:
+            columns = [pa.array(values, pa.string()) for values in zip(*self._batch)]
+            self._writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=self._schema))
+            self._batch = []
+    
+    def __exit__(self, exc_type, exc, tb):
+        completed = False
+        try:
+            if exc_type is None:
+                self._flush()
+            self._writer.close()
+            completed = exc_type is None
+        finally:
+            self._sink.close()
+            # an interrupted stream or a failed flush leaves no partial file behind
+            if completed:
+                os.replace(self.path + ".tmp", self.path)
+            else:
+                os.remove(self.path + ".tmp")
+        return False
+
+def write_arrow_kb(records: Iterable[EntityRecord], path: str) -> int:
+    with ArrowKBWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+def load_arrow_kb(path: str):
+    """Memory-map an Arrow KB file and return it as a pyarrow Table without copying"""
+    if pa is None:
+        raise ImportError("pyarrow is required to read the Arrow knowledge base")
+    
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
@@ -5,7 +5,74 @@
 import json
 import os
 import csv
-from typing import List, Tuple, Dict, Any
+import bz2
+import collections
+import contextlib
+import gzip
+import itertools
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from time import perf_counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple, Dict, Any, Iterable, Iterator, NamedTuple, Optional
+
+from name_keys import entity_names, name_keys
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Byte size of the pieces a large entities file is split into for parallel ingestion
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+# Entities file looked for in every dataset folder, the first one found is read; compressed
+# exports are decompressed while they are read, nothing is unpacked to disk
+ENTITY_FILE_NAMES = [
+    'entities.ftm.json', 'entities.ftm.json.gz', 'entities.ftm.json.bz2', 'entities.ftm.json.zst',
+    'entities.ftm.json.zip', 'entities.ftm.zip',
+]
+# Compressed inputs are decompressed by a background thread in chunks of this many bytes,
+# with up to DECOMPRESS_QUEUE_CHUNKS chunks decompressed ahead of the parser
+DECOMPRESS_CHUNK_SIZE = 4 * 1024 * 1024
+DECOMPRESS_QUEUE_CHUNKS = 4
+
+# Output files selectable in stream_results_to_files; production builds usually only need csv/json/names/kbc
+ALL_OUTPUTS = ['descriptions', 'ids', 'csv', 'json', 'names', 'kbc', 'arrow', 'shards']
+DEFAULT_OUTPUTS = ['descriptions', 'ids', 'csv', 'json', 'names']
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+TARGET_SCHEMAS = frozenset(['Person', 'Organization', 'LegalEntity', 'Vessel'])
+
+# Raw byte patterns of the compact FtM export layout, used to skip lines before decoding
+SCHEMA_FIELD = b'"schema":"'
+TARGET_FALSE_FIELD = b'"target":false'
+TARGET_SCHEMA_BYTES = frozenset(schema.encode('utf-8') for schema in TARGET_SCHEMAS)
+
+INGEST_COUNTERS = [
+    'lines_read', 'blank_lines', 'prefilter_skipped_schema', 'prefilter_skipped_non_target',
+    'decode_errors', 'skipped_non_target', 'skipped_schema', 'records',
+]
+TPL_COUNTERS = ['tpl_rows_read', 'tpl_skipped_no_name', 'tpl_records']
+MERGE_COUNTERS = ['merged_groups', 'merged_entities']
+
+# Pipeline stages timed into stats['seconds_<stage>'] when timing is enabled (see build_metrics.py)
+STAGES = ['read', 'decode', 'filter', 'format', 'write']
+
+# Decode errors past this many are only counted, so a corrupt export does not flood the log
+MAX_PRINTED_DECODE_ERRORS = 10
 
 def infer_dataset_name(folder_path: str) -> str:
     folder_name = os.path.basename(folder_path).lower()
@@ -18,14 +85,145 @@ def infer_dataset_name(folder_path: str) -> str:
     else:
         return "Unknown Dataset"
 
+# Bump whenever the description text changes so incremental builds re-format everything
+DESCRIPTION_FORMAT_VERSION = 1
+
+class FieldSpec(NamedTuple):
+    """One line of an entity description: `label: transform(value of prop)`.
+    
+    scope 'properties' reads a (possibly multi-valued) FtM property and skips
+    empty values; scope 'entity' reads a top-level entity key and only checks
+    that it is present.
+    """
+    prop: str
+    label: str
+    transform: str = 'join'
+    scope: str = 'properties'
+
+# Expression templates (over the value `v`) for every supported transform
+FIELD_TRANSFORMS = {
+    'value': "v",
+    'str': "str(v)",
+    'first': "str(v[0] if isinstance(v, list) else v)",
+    'first_title': "(v[0] if isinstance(v, list) else v).title()",
+    'join': "(slash_join(v) if isinstance(v, list) else v)",
+    'join_upper': "(slash_join(v) if isinstance(v, list) else v).upper()",
+    'join_space': "(space_join(v) if isinstance(v, list) else v)",
+    'gender_code': "gender_map_get(v, v)",
+}
+
+PERSON_FIELDS = [
+    FieldSpec('gender', 'Gender', 'first_title'),
+    FieldSpec('lastName', 'Last Name'),
+    FieldSpec('firstName', 'First Name'),
+    FieldSpec('middleName', 'Middle Name'),
+    FieldSpec('birthDate', 'Date of Birth'),
+    FieldSpec('birthPlace', 'Birth Place'),
+    FieldSpec('height', 'Height', 'first'),
+    FieldSpec('weight', 'Weight', 'first'),
+    FieldSpec('eyeColor', 'Eye Color', 'first'),
+    FieldSpec('hairColor', 'Hair Color', 'first'),
+    FieldSpec('idNumber', 'ID Number'),
+    FieldSpec('passportNumber', 'Passport Number'),
+]
+
+ORGANIZATION_FIELDS = [
+    FieldSpec('incorporationDate', 'Incorporation Date'),
+    FieldSpec('registrationNumber', 'Registration Number'),
+    FieldSpec('taxNumber', 'Tax Number'),
+]
+
+VESSEL_FIELDS = [
+    FieldSpec('imoNumber', 'IMO Number'),
+    FieldSpec('flag', 'Flag', 'join_upper'),
+    FieldSpec('callSign', 'Call Sign'),
+    FieldSpec('mmsi', 'MMSI'),
+    FieldSpec('type', 'Vessel Type'),
+]
+
+# Schema-specific lines, written right after "Type: <schema>". A new schema
+# only needs an entry here (and in TARGET_SCHEMAS to be ingested).
+SCHEMA_FIELDS = {
+    'Person': PERSON_FIELDS,
+    'Organization': ORGANIZATION_FIELDS,
+    'LegalEntity': ORGANIZATION_FIELDS,
+    'Vessel': VESSEL_FIELDS,
+}
+
+# Lines shared by every schema, written after the schema-specific ones
+COMMON_FIELDS = [
+    FieldSpec('sourceUrl', 'Source URL', 'first'),
+    FieldSpec('alias', 'Alias'),
+    FieldSpec('address', 'Address'),
+    FieldSpec('country', 'Country', 'join_upper'),
+    FieldSpec('nationality', 'Nationality', 'join_upper'),
+    FieldSpec('programId', 'Program'),
+    FieldSpec('first_seen', 'First seen', 'str', 'entity'),
+    FieldSpec('last_change', 'Last update', 'str', 'entity'),
+    FieldSpec('notes', 'Notes', 'join_space'),
+    # provenance of entities combined across datasets (see entity_merge.py)
+    FieldSpec('merged_from', 'Merged from', 'join', 'entity'),
+]
+
+TPL_GENDER_MAP = {'M': 'Male', 'F': 'Female'}
+
+TPL_FIELDS = [
+    FieldSpec('name', 'Name', 'value'),
+    FieldSpec('gender', 'Gender', 'gender_code'),
+    FieldSpec('date_of_birth', 'Date of Birth', 'value'),
+    FieldSpec('age', 'Age', 'value'),
+    FieldSpec('link', 'Source URL', 'value'),
+    FieldSpec('homicide_case', 'Homicide Case', 'value'),
+    FieldSpec('case_number', 'Case Number', 'value'),
+    FieldSpec('division', 'Division', 'value'),
+]
+
+def compile_formatter(fields: List[FieldSpec]):
+    """Compile a field spec into straight-line Python so formatting an entity
+    costs one dict lookup and one branch per field, with no per-field dispatch.
+    
+    The returned function has the signature (entity, properties, append).
+    """
+    code = [
+        "def formatter(entity, properties, append, isinstance=isinstance, list=list, str=str,",
+        "              slash_join=' / '.join, space_join=' '.join, gender_map_get=TPL_GENDER_MAP.get):",
+        "    get = properties.get",
+    ]
+    for field in fields:
+        expression = FIELD_TRANSFORMS[field.transform]
+        prefix = repr(f"{field.label}: ")
+        if field.scope == 'entity':
+            code.append(f"    if {field.prop!r} in entity:")
+            code.append(f"        v = entity[{field.prop!r}]")
+        else:
+            code.append(f"    v = get({field.prop!r})")
+            code.append("    if v:")
+        code.append(f"        append({prefix} + {expression})")
+    code.append("    return None")
+    
+    namespace = {'TPL_GENDER_MAP': TPL_GENDER_MAP}
+    exec('\n'.join(code), namespace)
+    return namespace['formatter']
+
+_schema_formatters = {}
+
+format_tpl_fields = compile_formatter(TPL_FIELDS)
+
+def get_schema_formatter(schema: str):
+    formatter = _schema_formatters.get(schema)
+    if formatter is None:
+        formatter = compile_formatter(SCHEMA_FIELDS.get(schema, []) + COMMON_FIELDS)
+        _schema_formatters[schema] = formatter
+    return formatter
+
 def format_entity_description(entity: Dict[str, Any], dataset_name: str) -> str:
     properties = entity.get('properties', {})
     schema = entity.get('schema', 'Unknown')
     lines = [dataset_name]
     
-    name = ""
-    if 'name' in properties and properties['name']:
-        name = properties['name'][0] if isinstance(properties['name'], list) else properties['name']
+    name = properties.get('name')
+    if name:
+        name = name[0] if isinstance(name, list) else name
     elif 'caption' in entity:
         name = entity['caption']
     
@@ -34,130 +232,113 @@ def format_entity_description(entity: Dict[str, Any], dataset_name: str) -> str:
     
     lines.append(f"Type: {schema}")
     
-    if schema == "Person":
-        if 'gender' in properties and properties['gender']:
-            gender = properties['gender'][0] if isinstance(properties['gender'], list) else properties['gender']
-            lines.append(f"Gender: {gender.title()}")
-        
-        if 'lastName' in properties and properties['lastName']:
-            last_names = properties['lastName'] if isinstance(properties['lastName'], list) else [properties['lastName']]
-            lines.append(f"Last Name: {' / '.join(last_names)}")
-        
-        if 'firstName' in properties and properties['firstName']:
-            first_names = properties['firstName'] if isinstance(properties['firstName'], list) else [properties['firstName']]
-            lines.append(f"First Name: {' / '.join(first_names)}")
-        
-        if 'middleName' in properties and properties['middleName']:
-            middle_names = properties['middleName'] if isinstance(properties['middleName'], list) else [properties['middleName']]
-            lines.append(f"Middle Name: {' / '.join(middle_names)}")
-        
-        if 'birthDate' in properties and properties['birthDate']:
-            birth_dates = properties['birthDate'] if isinstance(properties['birthDate'], list) else [properties['birthDate']]
-            lines.append(f"Date of Birth: {' / '.join(birth_dates)}")
-        
-        if 'birthPlace' in properties and properties['birthPlace']:
-            birth_places = properties['birthPlace'] if isinstance(properties['birthPlace'], list) else [properties['birthPlace']]
-            lines.append(f"Birth Place: {' / '.join(birth_places)}")
-        
-        if 'height' in properties and properties['height']:
-            height = properties['height'][0] if isinstance(properties['height'], list) else properties['height']
-            lines.append(f"Height: {height}")
-        
-        if 'weight' in properties and properties['weight']:
-            weight = properties['weight'][0] if isinstance(properties['weight'], list) else properties['weight']
-            lines.append(f"Weight: {weight}")
-        
-        if 'eyeColor' in properties and properties['eyeColor']:
-            eye_color = properties['eyeColor'][0] if isinstance(properties['eyeColor'], list) else properties['eyeColor']
-            lines.append(f"Eye Color: {eye_color}")
-        
-        if 'hairColor' in properties and properties['hairColor']:
-            hair_color = properties['hairColor'][0] if isinstance(properties['hairColor'], list) else properties['hairColor']
-            lines.append(f"Hair Color: {hair_color}")
-        
-        if 'idNumber' in properties and properties['idNumber']:
-            id_numbers = properties['idNumber'] if isinstance(properties['idNumber'], list) else [properties['idNumber']]
-            lines.append(f"ID Number: {' / '.join(id_numbers)}")
-        
-        if 'passportNumber' in properties and properties['passportNumber']:
-            passport_numbers = properties['passportNumber'] if isinstance(properties['passportNumber'], list) else [properties['passportNumber']]
-            lines.append(f"Passport Number: {' / '.join(passport_numbers)}")
-    
-    elif schema in ["Organization", "LegalEntity"]:
-        if 'incorporationDate' in properties and properties['incorporationDate']:
-            inc_dates = properties['incorporationDate'] if isinstance(properties['incorporationDate'], list) else [properties['incorporationDate']]
-            lines.append(f"Incorporation Date: {' / '.join(inc_dates)}")
-        
-        if 'registrationNumber' in properties and properties['registrationNumber']:
-            reg_numbers = properties['registrationNumber'] if isinstance(properties['registrationNumber'], list) else [properties['registrationNumber']]
-            lines.append(f"Registration Number: {' / '.join(reg_numbers)}")
-        
-        if 'taxNumber' in properties and properties['taxNumber']:
-            tax_numbers = properties['taxNumber'] if isinstance(properties['taxNumber'], list) else [properties['taxNumber']]
-            lines.append(f"Tax Number: {' / '.join(tax_numbers)}")
-    
-    elif schema == "Vessel":
-        if 'imoNumber' in properties and properties['imoNumber']:
-            imo_numbers = properties['imoNumber'] if isinstance(properties['imoNumber'], list) else [properties['imoNumber']]
-            lines.append(f"IMO Number: {' / '.join(imo_numbers)}")
-        
-        if 'flag' in properties and properties['flag']:
-            flags = properties['flag'] if isinstance(properties['flag'], list) else [properties['flag']]
-            lines.append(f"Flag: {' / '.join(flags).upper()}")
-        
-        if 'callSign' in properties and properties['callSign']:
-            call_signs = properties['callSign'] if isinstance(properties['callSign'], list) else [properties['callSign']]
-            lines.append(f"Call Sign: {' / '.join(call_signs)}")
-        
-        if 'mmsi' in properties and properties['mmsi']:
-            mmsi_numbers = properties['mmsi'] if isinstance(properties['mmsi'], list) else [properties['mmsi']]
-            lines.append(f"MMSI: {' / '.join(mmsi_numbers)}")
-        
-        if 'type' in properties and properties['type']:
-            vessel_types = properties['type'] if isinstance(properties['type'], list) else [properties['type']]
-            lines.append(f"Vessel Type: {' / '.join(vessel_types)}")
-    
-    if 'sourceUrl' in properties and properties['sourceUrl']:
-        source_urls = properties['sourceUrl'] if isinstance(properties['sourceUrl'], list) else [properties['sourceUrl']]
-        lines.append(f"Source URL: {source_urls[0]}")
-    
-    if 'alias' in properties and properties['alias']:
-        aliases = properties['alias'] if isinstance(properties['alias'], list) else [properties['alias']]
-        lines.append(f"Alias: {' / '.join(aliases)}")
-    
-    if 'address' in properties and properties['address']:
-        addresses = properties['address'] if isinstance(properties['address'], list) else [properties['address']]
-        lines.append(f"Address: {' / '.join(addresses)}")
-    
-    if 'country' in properties and properties['country']:
-        countries = properties['country'] if isinstance(properties['country'], list) else [properties['country']]
-        lines.append(f"Country: {' / '.join(c.upper() for c in countries)}")
-    
-    if 'nationality' in properties and properties['nationality']:
-        nationalities = properties['nationality'] if isinstance(properties['nationality'], list) else [properties['nationality']]
-        lines.append(f"Nationality: {' / '.join(n.upper() for n in nationalities)}")
-    
-    if 'programId' in properties and properties['programId']:
-        program_ids = properties['programId'] if isinstance(properties['programId'], list) else [properties['programId']]
-        lines.append(f"Program: {' / '.join(program_ids)}")
-    
-    if 'first_seen' in entity:
-        lines.append(f"First seen: {entity['first_seen']}")
-    
-    if 'last_change' in entity:
-        lines.append(f"Last update: {entity['last_change']}")
-    
-    if 'notes' in properties and properties['notes']:
-        notes = properties['notes'] if isinstance(properties['notes'], list) else [properties['notes']]
-        lines.append(f"Notes: {' '.join(notes)}")
+    get_schema_formatter(schema)(entity, properties, lines.append)
     
     return '\n'.join(lines)
 
-def process_json_files(data_raw_path: str) -> Tuple[List[str], List[str], List[str], List[str]]:
-    sources = []
-    descriptions = []
-    ids = []
-    names = []
+def description_field_values(description: str, label: str) -> List[str]:
+    """Values of a `Label: a / b / c` line of a formatted entity description"""
+    prefix = f"{label}: "
+    for line in description.split('\n'):
+        if line.startswith(prefix):
+            return [value for value in line[len(prefix):].split(' / ') if value]
+    return []
+
+class EntityRecord(NamedTuple):
+    source: str
+    description: str
+    id: str
+    name: str
+
+def is_compressed_input(path: str) -> bool:
+    return not path.endswith('.json')
+
+def open_compressed_input(path: str):
+    """Binary stream of the decompressed content of a .gz/.bz2/.zst/.zip entities file"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read .zst inputs")
+        return zstandard.open(path, 'rb')
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            members = [name for name in archive.namelist() if name.endswith('.json')]
+            member = next((name for name in members if name.endswith('entities.ftm.json')), members[0] if members else None)
+            if member is None:
+                raise ValueError(f"No .json file in {path}")
+            # the member stays readable after the archive is closed
+            return archive.open(member)
+    raise ValueError(f"Unknown input compression: {path}")
+
+class DecompressingReader:
+    """Lines (without their newline) of a compressed entities file, decompressed by a
+    background thread in large chunks so decompression overlaps decoding and parsing;
+    zlib, bz2 and zstandard release the GIL while they work."""
+    
+    def __init__(self, path: str, chunk_size: int = DECOMPRESS_CHUNK_SIZE,
+                 queue_chunks: int = DECOMPRESS_QUEUE_CHUNKS):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._queue = queue.Queue(maxsize=queue_chunks)
+        self._closed = False
+        self._error = None
+    
+    def __enter__(self):
+        self._stream = open_compressed_input(self.path)
+        self._thread = threading.Thread(target=self._decompress, name=f"decompress {os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+        return self
+    
+    def _decompress(self):
+        try:
+            while not self._closed:
+                chunk = self._stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                self._queue.put(chunk)
+        except Exception as e:
+            self._error = e
+        finally:
+            self._queue.put(None)
+    
+    def __iter__(self) -> Iterator[bytes]:
+        tail = b''
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                break
+            lines = (tail + chunk).split(b'\n')
+            tail = lines.pop()
+            yield from lines
+        if self._error is not None:
+            raise self._error
+        if tail:
+            yield tail
+    
+    def __exit__(self, exc_type, exc, tb):
+        self._closed = True
+        # unblock a thread waiting to hand over a chunk nobody will read
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self._stream.close()
+        return False
+
+def open_entity_lines(path: str):
+    """Context manager giving the raw lines of an entities file, compressed or not"""
+    if is_compressed_input(path):
+        return DecompressingReader(path)
+    return open(path, 'rb')
+
+def find_entity_files(data_raw_path: str) -> List[Tuple[str, str, str]]:
+    """Return (folder_name, json_file_path, dataset_name) for every dataset folder;
+    json_file_path is the first of ENTITY_FILE_NAMES found in the folder"""
+    entity_files = []
     
     for folder_name in os.listdir(data_raw_path):
         folder_path = os.path.join(data_raw_path, folder_name)
@@ -165,91 +346,540 @@ def process_json_files(data_raw_path: str) -> Tuple[List[str], List[str], List[s
         if not os.path.isdir(folder_path):
             continue
         
-        json_file_path = os.path.join(folder_path, 'entities.ftm.json')
+        json_file_path = next((os.path.join(folder_path, file_name) for file_name in ENTITY_FILE_NAMES
+                               if os.path.exists(os.path.join(folder_path, file_name))), None)
         
-        if not os.path.exists(json_file_path):
+        if json_file_path is None:
             continue
         
+        entity_files.append((folder_name, json_file_path, infer_dataset_name(folder_path)))
+    
+    return entity_files
+
+def prefilter_entity_line(line: bytes) -> Optional[str]:
+    """Look at the raw bytes of a line and name the counter of the stage that
+    would drop it, or return None if the line has to be decoded.
+    
+    Only lines with exactly one schema/target field in the compact FtM layout
+    are judged here; anything unusual falls through to the full decode.
+    """
+    schema_pos = line.find(SCHEMA_FIELD)
+    if schema_pos != -1 and line.find(SCHEMA_FIELD, schema_pos + 1) == -1:
+        value_start = schema_pos + len(SCHEMA_FIELD)
+        value_end = line.find(b'"', value_start)
+        if line[value_start:value_end] not in TARGET_SCHEMA_BYTES:
+            return 'prefilter_skipped_schema'
+    
+    if TARGET_FALSE_FIELD in line and line.count(b'"target":') == 1:
+        return 'prefilter_skipped_non_target'
+    
+    return None
+
+def decode_entity_line(line: bytes, json_file_path: str, stats: collections.Counter,
+                       timed: bool = False) -> Optional[Dict[str, Any]]:
+    """Decode one line of entities.ftm.json, or return None if it is skipped.
+    Every line bumps exactly one outcome counter in stats besides lines_read;
+    the 'records' counter is left to the caller. timed=True adds the time
+    spent in the JSON decoder to stats['seconds_decode']."""
+    stats['lines_read'] += 1
+    
+    line = line.strip()
+    if not line:
+        stats['blank_lines'] += 1
+        return None
+    
+    skipped_by = prefilter_entity_line(line)
+    if skipped_by:
+        stats[skipped_by] += 1
+        return None
+    
+    if timed:
+        start = perf_counter()
+    try:
+        entity = json_loads(line)
+    except json.JSONDecodeError as e:
+        stats['decode_errors'] += 1
+        if stats['decode_errors'] <= MAX_PRINTED_DECODE_ERRORS:
+            print(f"Error parsing JSON in {json_file_path}: {e}")
+        if stats['decode_errors'] == MAX_PRINTED_DECODE_ERRORS:
+            print("Further decode errors are only counted")
+        return None
+    finally:
+        if timed:
+            stats['seconds_decode'] += perf_counter() - start
+    
+    if not entity.get('target', True):
+        stats['skipped_non_target'] += 1
+        return None
+    
+    schema = entity.get('schema', '')
+    if schema not in TARGET_SCHEMAS:
+        stats['skipped_schema'] += 1
+        return None
+    
+    return entity
+
+def parse_entity_line(line: bytes, dataset_name: str, json_file_path: str,
+                      stats: collections.Counter, timed: bool = False) -> Optional[EntityRecord]:
+    """Turn one line of entities.ftm.json into a record, or None if it is skipped.
+    With timed=True the line's time is split into the decode, filter (everything
+    in decode_entity_line but the JSON decoder) and format stage timers."""
+    if timed:
+        start = perf_counter()
+        decode_seconds = stats['seconds_decode']
+    
+    entity = decode_entity_line(line, json_file_path, stats, timed)
+    
+    if timed:
+        decoded_at = perf_counter()
+        stats['seconds_filter'] += decoded_at - start - (stats['seconds_decode'] - decode_seconds)
+    if entity is None:
+        return None
+    
+    description = format_entity_description(entity, dataset_name)
+    entity_id = entity.get('id', '')
+    entity_name = entity.get('caption', '')
+    
+    stats['records'] += 1
+    stats[('records', dataset_name, entity['schema'])] += 1
+    if timed:
+        stats['seconds_format'] += perf_counter() - decoded_at
+    return EntityRecord(dataset_name, description, entity_id, entity_name)
+
+def print_ingest_stats(stats: collections.Counter, merge: bool = False):
+    print("Ingestion counters:")
+    for key in INGEST_COUNTERS + (MERGE_COUNTERS if merge else []):
+        print(f"- {key}: {stats[key]}")
+
+def timed_lines(lines: Iterable[bytes], stats: collections.Counter) -> Iterator[bytes]:
+    """Pass lines through, adding the time spent reading them to stats['seconds_read']"""
+    lines = iter(lines)
+    while True:
+        start = perf_counter()
+        line = next(lines, None)
+        stats['seconds_read'] += perf_counter() - start
+        if line is None:
+            return
+        yield line
+
+def iter_json_entities(data_raw_path: str, stats: Optional[collections.Counter] = None,
+                       timed: bool = False) -> Iterator[EntityRecord]:
+    """Yield one record at a time from every data_raw/*/entities.ftm.json[.gz|.bz2|.zst|.zip];
+    timed=True fills the read/decode/filter/format stage timers of stats"""
+    if stats is None:
+        stats = collections.Counter()
+    
+    for folder_name, json_file_path, dataset_name in find_entity_files(data_raw_path):
         print(f"Processing {json_file_path}...")
         
-        dataset_name = infer_dataset_name(folder_path)
-        
-        with open(json_file_path, 'r', encoding='utf-8') as file:
+        with open_entity_lines(json_file_path) as lines:
             line_count = 0
-            for line in file:
-                line = line.strip()
-                if not line:
+            for line in (timed_lines(lines, stats) if timed else lines):
+                record = parse_entity_line(line, dataset_name, json_file_path, stats, timed)
+                if record is None:
                     continue
                 
-                try:
-                    entity = json.loads(line)
-                    
-                    if not entity.get('target', True):
-                        continue
-                    
-                    schema = entity.get('schema', '')
-                    if schema not in ['Person', 'Organization', 'LegalEntity', 'Vessel']:
-                        continue
-                    
-                    description = format_entity_description(entity, dataset_name)
-                    entity_id = entity.get('id', '')
-                    entity_name = entity.get('caption', '')
-                    
-                    sources.append(dataset_name)
-                    descriptions.append(description)
-                    ids.append(entity_id)
-                    names.append(entity_name)
-                    
-                    line_count += 1
-                    
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing JSON in {json_file_path}: {e}")
-                    continue
+                line_count += 1
+                yield record
         
         print(f"Processed {line_count} entities from {folder_name}")
+
+def plan_file_chunks(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[int, int]]:
+    """Split a file into (start, end) byte ranges that begin and end on line boundaries"""
+    file_size = os.path.getsize(file_path)
+    chunks = []
+    
+    with open(file_path, 'rb') as f:
+        start = 0
+        while start < file_size:
+            end = start + chunk_size
+            if end >= file_size:
+                end = file_size
+            else:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            chunks.append((start, end))
+            start = end
+    
+    return chunks
+
+def process_file_chunk(task: Tuple[str, str, int, int, bool]) -> Tuple[List[EntityRecord], collections.Counter]:
+    """Worker: parse and format every line in one byte range of an entities file"""
+    json_file_path, dataset_name, start, end, timed = task
+    records = []
+    stats = collections.Counter()
+    
+    with open(json_file_path, 'rb') as f:
+        f.seek(start)
+        while f.tell() < end:
+            if timed:
+                read_start = perf_counter()
+            line = f.readline()
+            if timed:
+                stats['seconds_read'] += perf_counter() - read_start
+            if not line:
+                break
+            record = parse_entity_line(line, dataset_name, json_file_path, stats, timed)
+            if record is not None:
+                records.append(record)
+    
+    return records, stats
+
+def process_line_chunk(task: Tuple[str, str, List[bytes], bool]) -> Tuple[List[EntityRecord], collections.Counter]:
+    """Worker: parse and format a batch of lines read from a compressed entities file"""
+    json_file_path, dataset_name, lines, timed = task
+    records = []
+    stats = collections.Counter()
+    
+    for line in lines:
+        record = parse_entity_line(line, dataset_name, json_file_path, stats, timed)
+        if record is not None:
+            records.append(record)
+    
+    return records, stats
+
+def iter_line_batches(lines: Iterable[bytes], batch_size: int) -> Iterator[List[bytes]]:
+    """Lists of lines of about batch_size bytes each"""
+    batch = []
+    size = 0
+    for line in lines:
+        batch.append(line)
+        size += len(line)
+        if size >= batch_size:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+def plan_ingest_tasks(data_raw_path: str, chunk_size: int, stats: collections.Counter,
+                      timed: bool = False) -> Iterator[Tuple[str, bool, bool, Any, tuple]]:
+    """(folder_name, is_first, is_last, worker function, task) for every chunk of every
+    entities file: byte ranges of plain files, which the workers read themselves, and
+    batches of lines of compressed files, which are decompressed here as they are needed"""
+    for folder_name, json_file_path, dataset_name in find_entity_files(data_raw_path):
+        if not is_compressed_input(json_file_path):
+            chunks = plan_file_chunks(json_file_path, chunk_size)
+            for chunk_index, (start, end) in enumerate(chunks):
+                is_first, is_last = chunk_index == 0, chunk_index == len(chunks) - 1
+                yield folder_name, is_first, is_last, process_file_chunk, (json_file_path, dataset_name, start, end, timed)
+            continue
+        
+        with open_entity_lines(json_file_path) as lines:
+            batches = iter_line_batches(timed_lines(lines, stats) if timed else lines, chunk_size)
+            batch = next(batches, None)
+            is_first = True
+            while batch is not None:
+                next_batch = next(batches, None)
+                yield folder_name, is_first, next_batch is None, process_line_chunk, (json_file_path, dataset_name, batch, timed)
+                batch = next_batch
+                is_first = False
+
+def iter_json_entities_parallel(data_raw_path: str, workers: Optional[int] = None,
+                                chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                stats: Optional[collections.Counter] = None,
+                                timed: bool = False) -> Iterator[EntityRecord]:
+    """Same records, in the same order, as iter_json_entities, but decoded and
+    formatted by a process pool working on newline-aligned chunks of every file
+    (batches of decompressed lines for compressed files).
+    
+    At most two chunks per worker are in flight so memory stays bounded.
+    Stage timers are summed over the workers, so they can exceed the wall time.
+    """
+    workers = workers or os.cpu_count() or 1
+    if stats is None:
+        stats = collections.Counter()
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        task_iter = plan_ingest_tasks(data_raw_path, chunk_size, stats, timed)
+        line_count = 0
+        
+        while True:
+            while len(pending) < workers * 2:
+                task = next(task_iter, None)
+                if task is None:
+                    break
+                pending.append((task, executor.submit(task[3], task[4])))
+            
+            if not pending:
+                break
+            
+            (folder_name, is_first, is_last, _, chunk_task), future = pending.popleft()
+            if is_first:
+                print(f"Processing {chunk_task[0]}...")
+                line_count = 0
+            
+            records, chunk_stats = future.result()
+            stats.update(chunk_stats)
+            line_count += len(records)
+            yield from records
+            
+            if is_last:
+                print(f"Processed {line_count} entities from {folder_name}")
+
+def collect_records(records: Iterable[EntityRecord]) -> Tuple[List[str], List[str], List[str], List[str]]:
+    sources = []
+    descriptions = []
+    ids = []
+    names = []
+    
+    for record in records:
+        sources.append(record.source)
+        descriptions.append(record.description)
+        ids.append(record.id)
+        names.append(record.name)
     
     return sources, descriptions, ids, names
 
-def save_results_to_files(sources: List[str], descriptions: List[str], ids: List[str], names: List[str], output_dir: str = "."):
-    descriptions_file = os.path.join(output_dir, "entity_descriptions.txt")
-    with open(descriptions_file, 'w', encoding='utf-8') as f:
-        for i, desc in enumerate(descriptions):
-            f.write(f"Entity {i+1}:\n")
-            f.write(desc)
-            f.write("\n" + "="*50 + "\n\n")
-    
-    ids_file = os.path.join(output_dir, "entity_ids.txt")
-    with open(ids_file, 'w', encoding='utf-8') as f:
-        for i, entity_id in enumerate(ids):
-            f.write(f"{i+1}: {entity_id}\n")
-    
-    csv_file = os.path.join(output_dir, "processed_entities.csv")
-    with open(csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Source', 'ID', 'Name', 'Description'])
-        for source, entity_id, name, desc in zip(sources, ids, names, descriptions):
-            writer.writerow([source, entity_id, name, desc])
-    
-    import json
-    data = {
-        "sources": sources,
-        "descriptions": descriptions,
-        "ids": ids,
-        "names": names,
-        "count": len(descriptions)
-    }
-    
-    json_file = os.path.join(output_dir, "processed_entities.json")
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def process_json_files(data_raw_path: str, workers: int = 1, stats: Optional[collections.Counter] = None,
+                       timed: bool = False, merge: bool = False) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """merge=True combines the copies of an entity across datasets (see entity_merge.py);
+    merging reads the files twice in this process, so workers is not used"""
+    if merge:
+        from entity_merge import iter_merged_entities
+        return collect_records(iter_merged_entities(data_raw_path, stats, timed))
+    if workers == 1:
+        return collect_records(iter_json_entities(data_raw_path, stats, timed))
+    return collect_records(iter_json_entities_parallel(data_raw_path, workers, stats=stats, timed=timed))
+
+def open_output(path: str, compression: Optional[str] = None, encoding: str = 'utf-8', newline: Optional[str] = None):
+    """Open a text output file for buffered writing, gzip/zstd compressed if requested"""
+    if compression is None:
+        return open(path, 'w', encoding=encoding, newline=newline, buffering=OUTPUT_BUFFER_SIZE)
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', compresslevel=6, encoding=encoding, newline=newline)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd compressed outputs")
+        return zstandard.open(path, 'wt', encoding=encoding, newline=newline)
+    raise ValueError(f"Unknown compression: {compression}")
+
+class TextOutputWriter:
+    """Base class of the text outputs: writes to a temporary file next to the
+    target and renames it into place only when the whole stream was written."""
+    
+    filename = ""
+    encoding = 'utf-8'
+    newline = None
+    
+    def __init__(self, output_dir: str = ".", compression: Optional[str] = None):
+        self.path = os.path.join(output_dir, self.filename) + COMPRESSION_SUFFIXES[compression]
+        self.output_dir = output_dir
+        self.compression = compression
+        self.count = 0
+    
+    def __enter__(self):
+        self._file = open_output(self.path + ".tmp", self.compression, self.encoding, self.newline)
+        self.start()
+        return self
+    
+    def start(self):
+        pass
+    
+    def finish(self):
+        pass
+    
+    def write(self, record: EntityRecord):
+        raise NotImplementedError
+    
+    def __exit__(self, exc_type, exc, tb):
+        completed = False
+        try:
+            if exc_type is None:
+                self.finish()
+            self._file.close()
+            completed = exc_type is None
+        finally:
+            self._file.close()
+            # also when finish() or the final flush failed
+            if completed:
+                os.replace(self.path + ".tmp", self.path)
+            else:
+                os.remove(self.path + ".tmp")
+        return False
+
+class DescriptionsTextWriter(TextOutputWriter):
+    filename = "entity_descriptions.txt"
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        self._file.write(f"Entity {self.count}:\n{record.description}\n{'=' * 50}\n\n")
+
+class IdsTextWriter(TextOutputWriter):
+    filename = "entity_ids.txt"
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        self._file.write(f"{self.count}: {record.id}\n")
+
+class CsvResultWriter(TextOutputWriter):
+    filename = "processed_entities.csv"
+    encoding = 'utf-8-sig'
+    newline = ''
+    
+    def start(self):
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['Source', 'ID', 'Name', 'Description'])
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        self._writer.writerow([record.source, record.id, record.name, record.description])
+
+class JsonResultWriter(TextOutputWriter):
+    """processed_entities.json keeps its parallel-array layout: the sources
+    array is written straight into the target file while the other three
+    columns are spooled to temporary files and appended when the stream ends."""
+    
+    filename = "processed_entities.json"
+    JSON_COLUMNS = ["sources", "descriptions", "ids", "names"]
+    
+    def start(self):
+        self._file.write('{\n  "sources": [')
+        self._spools = [tempfile.TemporaryFile('w+', encoding='utf-8', dir=self.output_dir) for _ in range(3)]
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        separator = ',\n    ' if self.count > 1 else '\n    '
+        self._file.write(separator + json.dumps(record.source, ensure_ascii=False))
+        for spool, value in zip(self._spools, (record.description, record.id, record.name)):
+            spool.write(separator + json.dumps(value, ensure_ascii=False))
+    
+    def _close_array(self):
+        self._file.write('\n  ]' if self.count else ']')
+    
+    def finish(self):
+        self._close_array()
+        for column, spool in zip(self.JSON_COLUMNS[1:], self._spools):
+            self._file.write(f',\n  "{column}": [')
+            spool.seek(0)
+            shutil.copyfileobj(spool, self._file, OUTPUT_BUFFER_SIZE)
+            self._close_array()
+        self._file.write(f',\n  "count": {self.count}\n}}')
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            return super().__exit__(exc_type, exc, tb)
+        finally:
+            for spool in self._spools:
+                spool.close()
+
+class NameKeysWriter(TextOutputWriter):
+    """processed_names.csv: one row per entity name and alias with its
+    normalized, compact, token-sorted and phonetic keys (see name_keys.py), so
+    screening matchers can block on exact keys without re-normalizing the KB."""
+    
+    filename = "processed_names.csv"
+    encoding = 'utf-8-sig'
+    newline = ''
+    
+    def start(self):
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(['Source', 'ID', 'Name', 'Normalized', 'Compact', 'Sorted', 'Phonetic'])
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        aliases = description_field_values(record.description, "Alias")
+        for name in entity_names(record.name, aliases):
+            keys = name_keys(name)
+            if keys.compact:
+                self._writer.writerow([record.source, record.id, name, *keys])
+
+TEXT_OUTPUT_WRITERS = {
+    'descriptions': DescriptionsTextWriter,
+    'ids': IdsTextWriter,
+    'csv': CsvResultWriter,
+    'json': JsonResultWriter,
+    'names': NameKeysWriter,
+}
+
+def make_output_writer(output: str, output_dir: str = ".", compression: Optional[str] = None):
+    if output in TEXT_OUTPUT_WRITERS:
+        return TEXT_OUTPUT_WRITERS[output](output_dir, compression)
+    
+    if output == 'shards':
+        import sharded_kb
+        return sharded_kb.ShardedKBWriter(os.path.join(output_dir, sharded_kb.SHARDS_DIR), compression)
+    
+    # the binary formats are memory-mapped by consumers and are never compressed
+    import columnar_kb
+    if output == 'kbc':
+        return columnar_kb.ColumnarKBWriter(os.path.join(output_dir, columnar_kb.COLUMNAR_FILE))
+    if output == 'arrow':
+        return columnar_kb.ArrowKBWriter(os.path.join(output_dir, columnar_kb.ARROW_FILE))
+    raise ValueError(f"Unknown output: {output}")
+
+class StreamingResultWriter:
+    """Fan a single pass over the records out to every selected output.
+    
+    outputs is a subset of ALL_OUTPUTS (default: DEFAULT_OUTPUTS, the four original
+    files plus processed_names.csv); compression ('gzip' or 'zstd') applies to the
+    text outputs.
+    """
+    
+    def __init__(self, output_dir: str = ".", outputs: Optional[Iterable[str]] = None,
+                 compression: Optional[str] = None):
+        self.outputs = list(outputs or DEFAULT_OUTPUTS)
+        self.writers = [make_output_writer(output, output_dir, compression) for output in self.outputs]
+        self.paths = [writer.path for writer in self.writers]
+        self.count = 0
+    
+    def __enter__(self):
+        self._stack = contextlib.ExitStack()
+        with self._stack as stack:
+            for writer in self.writers:
+                stack.enter_context(writer)
+            self._stack = stack.pop_all()
+        self._write_functions = [writer.write for writer in self.writers]
+        return self
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        for write in self._write_functions:
+            write(record)
+    
+    def __exit__(self, exc_type, exc, tb):
+        return self._stack.__exit__(exc_type, exc, tb)
+
+def stream_results_to_files(records: Iterable[EntityRecord], output_dir: str = ".", columnar: bool = False,
+                            outputs: Optional[Iterable[str]] = None, compression: Optional[str] = None,
+                            stats: Optional[collections.Counter] = None) -> int:
+    """Write records to the selected outputs in one pass. columnar=True adds the
+    memory-mappable processed_entities.kbc (and processed_entities.arrow when
+    pyarrow is installed), see columnar_kb.py. With stats the time spent in the
+    writers (not in producing the records) is added to stats['seconds_write']."""
+    outputs = list(outputs or DEFAULT_OUTPUTS)
+    if columnar:
+        import columnar_kb
+        outputs += ['kbc', 'arrow'] if columnar_kb.pa is not None else ['kbc']
+    
+    with StreamingResultWriter(output_dir, outputs, compression) as writer:
+        if stats is None:
+            for record in records:
+                writer.write(record)
+        else:
+            for record in records:
+                start = perf_counter()
+                writer.write(record)
+                stats['seconds_write'] += perf_counter() - start
+            start = perf_counter()
+    if stats is not None:
+        # closing flushes, compresses and renames the files
+        stats['seconds_write'] += perf_counter() - start
     
     print(f"Results saved:")
-    print(f"- {descriptions_file}")
-    print(f"- {ids_file}")
-    print(f"- {csv_file}")
-    print(f"- {json_file}")
+    for path in writer.paths:
+        print(f"- {path}")
     
-    print(f"Saved {len(descriptions)} entities to {csv_file}, {json_file}, {descriptions_file}")
+    print(f"Saved {writer.count} entities to {', '.join(writer.paths)}")
+    return writer.count
+
+def save_results_to_files(sources: List[str], descriptions: List[str], ids: List[str], names: List[str], output_dir: str = ".",
+                          columnar: bool = False, outputs: Optional[Iterable[str]] = None, compression: Optional[str] = None,
+                          stats: Optional[collections.Counter] = None):
+    records = (EntityRecord(*row) for row in zip(sources, descriptions, ids, names))
+    stream_results_to_files(records, output_dir, columnar, outputs, compression, stats)
 
 def show_entity_type_examples(sources: List[str], descriptions: List[str], ids: List[str], names: List[str]):
     """Show examples of different entity types"""
@@ -302,19 +932,97 @@ def show_entity_type_examples(sources: List[str], descriptions: List[str], ids:
             print(desc)
             print("-" * 40)
 
-def main(add_tpl_data: bool = False):
-    """Main function to process all JSON files and output results"""
+def sample_entity_type_examples(records: Iterable[EntityRecord], examples: List[EntityRecord], per_type: int = 2) -> Iterator[EntityRecord]:
+    """Pass records through unchanged while keeping a few examples per entity type"""
+    counts = {"Person": 0, "Organization": 0, "Vessel": 0}
+    for record in records:
+        for type_marker, group in (("Type: Person", "Person"), ("Type: Organization", "Organization"),
+                                   ("Type: LegalEntity", "Organization"), ("Type: Vessel", "Vessel")):
+            if type_marker in record.description:
+                if counts[group] < per_type:
+                    counts[group] += 1
+                    examples.append(record)
+                break
+        yield record
+
+def write_build_metrics(stats: collections.Counter, started_at: float, elapsed: float,
+                        metrics_json: Optional[str] = None, metrics_prom: Optional[str] = None, **info: Any):
+    """Write the run report of a build as JSON and/or as a Prometheus textfile"""
+    import build_metrics
+    report = build_metrics.build_report(stats, started_at, elapsed, **info)
+    if metrics_json:
+        build_metrics.write_json_report(report, metrics_json)
+        print(f"Build report saved to {metrics_json}")
+    if metrics_prom:
+        build_metrics.write_prometheus_textfile(report, metrics_prom)
+        print(f"Build metrics saved to {metrics_prom}")
+    return report
+
+def main(add_tpl_data: bool = False, stream: bool = False, workers: int = 1, incremental: bool = False,
+         columnar: bool = False, outputs: Optional[List[str]] = None, compression: Optional[str] = None,
+         metrics_json: Optional[str] = None, metrics_prom: Optional[str] = None, merge: bool = False):
+    """Main function to process all JSON files and output results
+    
+    With stream=True records flow straight from the input files to the output
+    writers and only the number of saved entities is returned. workers > 1
+    (or 0 for one per CPU) decodes and formats the entity files in a process pool.
+    With incremental=True only new or changed entities are formatted against the
+    previous build in the output folder, and the added/changed/removed delta is returned.
+    columnar=True also writes the memory-mappable columnar knowledge base;
+    outputs and compression select and compress the files written; the 'shards'
+    output partitions the records by dataset and schema (see sharded_kb.py).
+    metrics_json / metrics_prom enable the stage timers and write the run report
+    (counters, stage times, records per dataset and schema, peak RSS) there.
+    merge=True combines the copies of an entity listed by several datasets into
+    one record (see entity_merge.py). Incremental builds honour outputs, compression
+    and columnar but always run in one process, without merging or stage timers.
+    """
     
     # Path to data_raw folder
     data_raw_path = "/Users/yuehuan/workplace/agent-ai-learning-data/data_raw"
+    tpl_csv_path = "/Users/yuehuan/workplace/agent-ai-learning-data/data_intake/tpl_most_wanted.csv"
+    
+    if incremental:
+        from incremental_build import incremental_build
+        print("Starting incremental build...")
+        return incremental_build(data_raw_path, ".", tpl_csv_path if add_tpl_data else None,
+                                 outputs, compression, columnar)
+    
+    stats = collections.Counter()
+    timed = bool(metrics_json or metrics_prom)
+    started_at = time.time()
+    start = perf_counter()
+    
+    if stream:
+        print("Starting to stream JSON files...")
+        if merge:
+            from entity_merge import iter_merged_entities
+            records = iter_merged_entities(data_raw_path, stats, timed)
+        elif workers == 1:
+            records = iter_json_entities(data_raw_path, stats, timed)
+        else:
+            records = iter_json_entities_parallel(data_raw_path, workers, stats=stats, timed=timed)
+        if add_tpl_data:
+            records = itertools.chain(records, iter_tpl_entities(tpl_csv_path, stats, timed))
+        
+        examples = []
+        count = stream_results_to_files(sample_entity_type_examples(records, examples), columnar=columnar,
+                                        outputs=outputs, compression=compression, stats=stats if timed else None)
+        
+        print(f"\nProcessed {count} entities total")
+        print_ingest_stats(stats, merge)
+        show_entity_type_examples(*collect_records(examples))
+        if timed:
+            write_build_metrics(stats, started_at, perf_counter() - start, metrics_json, metrics_prom,
+                                mode='stream', workers=workers, merge=merge, records_written=count)
+        return count
     
     print("Starting to process JSON files...")
-    sources, descriptions, ids, names = process_json_files(data_raw_path)
+    sources, descriptions, ids, names = process_json_files(data_raw_path, workers, stats, timed, merge)
     
     # Process TPL data if requested
     if add_tpl_data:
-        tpl_csv_path = "/Users/yuehuan/workplace/agent-ai-learning-data/data_intake/tpl_most_wanted.csv"
-        tpl_sources, tpl_descriptions, tpl_ids, tpl_names = process_tpl_csv(tpl_csv_path)
+        tpl_sources, tpl_descriptions, tpl_ids, tpl_names = process_tpl_csv(tpl_csv_path, stats, timed)
         
         # Combine the data
         sources.extend(tpl_sources)
@@ -323,43 +1031,39 @@ def main(add_tpl_data: bool = False):
         names.extend(tpl_names)
     
     print(f"\nProcessed {len(descriptions)} entities total")
+    print_ingest_stats(stats, merge)
     
     # Show different entity type examples
     show_entity_type_examples(sources, descriptions, ids, names)
     
     # Save results to files including CSV
-    save_results_to_files(sources, descriptions, ids, names)
-    
-    return sources, descriptions, ids, names
-    
-    print(f"\nProcessed {len(descriptions)} entities total")
-    
-    # Show different entity type examples
-    show_entity_type_examples(sources, descriptions, ids, names)
+    save_results_to_files(sources, descriptions, ids, names, columnar=columnar, outputs=outputs, compression=compression,
+                          stats=stats if timed else None)
     
-    # Save results to files including CSV
-    save_results_to_files(sources, descriptions, ids, names)
+    if timed:
+        write_build_metrics(stats, started_at, perf_counter() - start, metrics_json, metrics_prom,
+                            mode='batch', workers=workers, merge=merge, records_written=len(ids))
     
     return sources, descriptions, ids, names
 
 # def demonstrate_usage():
 #     """Demonstrate how to access and use the processed data"""
-    
+
 #     # Load the processed data from JSON file
 #     with open("processed_data.json", 'r', encoding='utf-8') as f:
 #         data = json.load(f)
-    
+
 #     sources = data['sources']
 #     descriptions = data['descriptions']
 #     ids = data['ids']
 #     names = data['names']
-    
+
 #     print("="*60)
 #     print("DEMONSTRATION: How to use the processed data")
 #     print("="*60)
-    
+
 #     print(f"\nTotal entities processed: {data['count']}")
-    
+
 #     # Find a specific entity by ID
 #     target_id = "NK-22HtK7WrxZ2sU3rmhz6PuZ"  # Michael Kuajien
 #     try:
@@ -372,32 +1076,32 @@ def main(add_tpl_data: bool = False):
 #         print(descriptions[index])
 #     except ValueError:
 #         print(f"Entity with ID '{target_id}' not found")
-    
+
 #     # Show stats by source
 #     print(f"\nDataset statistics:")
 #     ofac_count = sum(1 for source in sources if "US OFAC" in source)
 #     fbi_count = sum(1 for source in sources if "US FBI" in source)
 #     canada_count = sum(1 for source in sources if "Canadian" in source)
 #     tpl_count = sum(1 for source in sources if "Toronto Police" in source)
-    
+
 #     print(f"- US OFAC SDN: {ofac_count} entities")
 #     print(f"- US FBI Most Wanted: {fbi_count} entities") 
 #     print(f"- Canadian Sanctions: {canada_count} entities")
 #     if tpl_count > 0:
 #         print(f"- Toronto Police Service Most Wanted: {tpl_count} entities")
-    
+
 #     # Show entity type breakdown
 #     person_count = sum(1 for desc in descriptions if "Type: Person" in desc)
 #     org_count = sum(1 for desc in descriptions if "Type: Organization" in desc)
 #     legal_count = sum(1 for desc in descriptions if "Type: LegalEntity" in desc)
 #     vessel_count = sum(1 for desc in descriptions if "Type: Vessel" in desc)
-    
+
 #     print(f"\nEntity type breakdown:")
 #     print(f"- Persons: {person_count}")
 #     print(f"- Organizations: {org_count}")
 #     print(f"- Legal Entities: {legal_count}")
 #     print(f"- Vessels: {vessel_count}")
-    
+
 #     print(f"\nCSV file structure:")
 #     print("Column 1: Source (e.g., 'US OFAC Specially Designated Nationals (SDN)')")
 #     print("Column 2: ID (e.g., 'NK-22HtK7WrxZ2sU3rmhz6PuZ')")
@@ -407,33 +1111,7 @@ def main(add_tpl_data: bool = False):
 def format_tpl_entity_description(row: Dict[str, str]) -> str:
     lines = ["Toronto Police Service Most Wanted"]
     
-    if row.get('name'):
-        lines.append(f"Name: {row['name']}")
-
-    # lines.append("Type: Person")
-
-    if row.get('gender'):
-        gender_map = {'M': 'Male', 'F': 'Female'}
-        gender = gender_map.get(row['gender'], row['gender'])
-        lines.append(f"Gender: {gender}")
-    
-    if row.get('date_of_birth'):
-        lines.append(f"Date of Birth: {row['date_of_birth']}")
-    
-    if row.get('age'):
-        lines.append(f"Age: {row['age']}")
-    
-    if row.get('link'):
-        lines.append(f"Source URL: {row['link']}")
-    
-    if row.get('homicide_case'):
-        lines.append(f"Homicide Case: {row['homicide_case']}")
-    
-    if row.get('case_number'):
-        lines.append(f"Case Number: {row['case_number']}")
-    
-    if row.get('division'):
-        lines.append(f"Division: {row['division']}")
+    format_tpl_fields(row, row, lines.append)
     
     return '\n'.join(lines)
 
@@ -447,17 +1125,15 @@ def extract_id_from_url(url: str) -> str:
     
     return ""
 
-def process_tpl_csv(tpl_csv_path: str) -> Tuple[List[str], List[str], List[str], List[str]]:
-    """Process TPL CSV file and return lists of sources, descriptions, IDs, and names"""
-    
-    sources = []
-    descriptions = []
-    ids = []
-    names = []
+def iter_tpl_entities(tpl_csv_path: str, stats: Optional[collections.Counter] = None,
+                      timed: bool = False) -> Iterator[EntityRecord]:
+    """Yield one record at a time from the TPL CSV file"""
+    if stats is None:
+        stats = collections.Counter()
     
     if not os.path.exists(tpl_csv_path):
         print(f"TPL CSV file not found: {tpl_csv_path}")
-        return sources, descriptions, ids, names
+        return
     
     print(f"Processing {tpl_csv_path}...")
     
@@ -466,9 +1142,13 @@ def process_tpl_csv(tpl_csv_path: str) -> Tuple[List[str], List[str], List[str],
         line_count = 0
         
         for row in reader:
+            stats['tpl_rows_read'] += 1
             if not row.get('name'):
+                stats['tpl_skipped_no_name'] += 1
                 continue
             
+            if timed:
+                start = perf_counter()
             description = format_tpl_entity_description(row)
             
             entity_id = row.get('suspect_id', '')
@@ -480,32 +1160,60 @@ def process_tpl_csv(tpl_csv_path: str) -> Tuple[List[str], List[str], List[str],
             
             entity_name = row.get('name', '')
             
-            sources.append("Toronto Police Service Most Wanted")
-            descriptions.append(description)
-            ids.append(entity_id)
-            names.append(entity_name)
-            
             line_count += 1
+            stats['tpl_records'] += 1
+            stats[('records', "Toronto Police Service Most Wanted", 'Person')] += 1
+            if timed:
+                stats['seconds_format'] += perf_counter() - start
+            yield EntityRecord("Toronto Police Service Most Wanted", description, entity_id, entity_name)
     
     print(f"Processed {line_count} entities from TPL CSV")
-    return sources, descriptions, ids, names
+
+def process_tpl_csv(tpl_csv_path: str, stats: Optional[collections.Counter] = None,
+                    timed: bool = False) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """Process TPL CSV file and return lists of sources, descriptions, IDs, and names"""
+    return collect_records(iter_tpl_entities(tpl_csv_path, stats, timed))
 
 if __name__ == "__main__":
-    import sys
-    
-    # Configuration variable
-    add_tpl_data = False
-    
-    # Check for command line arguments
-    if len(sys.argv) > 1:
-        if '--include-tpl' in sys.argv or '--tpl' in sys.argv:
-            add_tpl_data = True
-            print("Including TPL data in processing...")
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Preprocess raw datasets into the unified knowledge base format')
+    parser.add_argument('--include-tpl', '--tpl', dest='add_tpl_data', action='store_true', help='Include TPL data in processing')
+    parser.add_argument('--stream', action='store_true', help='Stream records directly to the output files')
+    parser.add_argument('--incremental', action='store_true', help='Only re-format entities changed since the previous build')
+    parser.add_argument('--columnar', action='store_true', help='Also write the memory-mappable columnar knowledge base')
+    parser.add_argument('--outputs', type=lambda value: value.split(','), default=None,
+                        help=f"Comma-separated outputs to write, from {','.join(ALL_OUTPUTS)} (default: {','.join(DEFAULT_OUTPUTS)})")
+    parser.add_argument('--compress', dest='compression', choices=['gzip', 'zstd'], default=None, help='Compress the text outputs')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes for JSON ingestion (0 = one per CPU)')
+    parser.add_argument('--merge', action='store_true', help='Merge the copies of an entity across datasets by id and referents')
+    parser.add_argument('--metrics-json', default=None, help='Time the pipeline stages and write the run report as JSON here')
+    parser.add_argument('--metrics-prom', default=None, help='Time the pipeline stages and write the run report as a Prometheus textfile here')
+    
+    args = parser.parse_args()
+    if args.incremental and (args.workers != 1 or args.merge or args.metrics_json or args.metrics_prom):
+        parser.error("--incremental does not support --workers, --merge, --metrics-json or --metrics-prom")
     
     # You can also set this directly in the code
-    # add_tpl_data = True
-    
-    sources, descriptions, ids, names = main(add_tpl_data=add_tpl_data)
+    # args.add_tpl_data = True
+    
+    if args.add_tpl_data:
+        print("Including TPL data in processing...")
+    if args.stream:
+        print("Streaming records directly to output files...")
+    
+    if args.incremental:
+        main(add_tpl_data=args.add_tpl_data, incremental=True, columnar=args.columnar,
+             outputs=args.outputs, compression=args.compression)
+    elif args.stream:
+        main(add_tpl_data=args.add_tpl_data, stream=True, workers=args.workers, columnar=args.columnar,
+             outputs=args.outputs, compression=args.compression,
+             metrics_json=args.metrics_json, metrics_prom=args.metrics_prom, merge=args.merge)
+    else:
+        sources, descriptions, ids, names = main(add_tpl_data=args.add_tpl_data, workers=args.workers, columnar=args.columnar,
+                                                 outputs=args.outputs, compression=args.compression,
+                                                 metrics_json=args.metrics_json, metrics_prom=args.metrics_prom,
+                                                 merge=args.merge)
     
     # Demonstrate usage
     # demonstrate_usage()
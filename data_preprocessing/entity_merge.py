@@ -0,0 +1,213 @@
+# cross-dataset entity merging: the same person or company is often listed by several
+# datasets (the FBI entity of Alireza Shafie Nasab carries the referent ofac-48642 of its
+# OFAC SDN entry), and without merging every copy becomes its own description, embedding
+# and search candidate.
+#
+# Entities are grouped by their id and referents with a union-find over the whole corpus,
+# in two passes over the entity files:
+#   1. decode every target entity and union its id with each of its referents; only an
+#      integer per key and per entity is kept
+#   2. decode again; an entity alone in its group is formatted straight away, the members
+#      of a larger group are held until its last member has been read and are then
+#      combined into one record whose description lists the datasets and ids merged
+# Both passes are linear in the number of lines (union by size with path halving).
+#
+# usage: python entity_merge.py DATA_RAW_PATH   (prints the largest groups)
+
+import collections
+from array import array
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from data_preprocess import (
+    EntityRecord,
+    decode_entity_line,
+    description_field_values,
+    find_entity_files,
+    format_entity_description,
+    open_entity_lines,
+    perf_counter,
+    timed_lines,
+)
+
+# When the copies of an entity disagree on the schema the most specific one wins
+SCHEMA_PRIORITY = {'Person': 0, 'Vessel': 1, 'Organization': 2, 'LegalEntity': 3}
+
+class UnionFind:
+    """Disjoint sets over string keys (entity ids and referents), union by size with path halving"""
+    
+    def __init__(self):
+        self.keys = {}
+        self.parent = array('l')
+        self.size = array('l')
+    
+    def __len__(self):
+        return len(self.parent)
+    
+    def add(self, key: str) -> int:
+        index = self.keys.get(key)
+        if index is None:
+            index = len(self.parent)
+            self.keys[key] = index
+            self.parent.append(index)
+            self.size.append(1)
+        return index
+    
+    def find(self, index: int) -> int:
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+    
+    def union(self, a: int, b: int) -> int:
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return a
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return a
+
+def iter_decoded_entities(data_raw_path: str, stats: collections.Counter,
+                          timed: bool = False) -> Iterator[Tuple[Dict[str, Any], str]]:
+    """(entity, dataset name) of every target entity of every data_raw/*/entities.ftm.json[.gz|...]"""
+    for folder_name, json_file_path, dataset_name in find_entity_files(data_raw_path):
+        with open_entity_lines(json_file_path) as lines:
+            for line in (timed_lines(lines, stats) if timed else lines):
+                entity = decode_entity_line(line, json_file_path, stats, timed)
+                if entity is not None:
+                    yield entity, dataset_name
+
+def entity_key(entity: Dict[str, Any], position: int) -> str:
+    # an entity without an id can only be linked through its referents
+    return entity.get('id') or f"#{position}"
+
+def group_entities(data_raw_path: str) -> Tuple[UnionFind, array]:
+    """Pass 1: union every target entity's id with its referents. Returns the sets and
+    the key index of every entity, in read order."""
+    groups = UnionFind()
+    entity_keys = array('l')
+    for position, (entity, _) in enumerate(iter_decoded_entities(data_raw_path, collections.Counter())):
+        key = groups.add(entity_key(entity, position))
+        for referent in entity.get('referents') or []:
+            groups.union(key, groups.add(referent))
+        entity_keys.append(key)
+    return groups, entity_keys
+
+def as_list(values) -> list:
+    return values if isinstance(values, list) else [values]
+
+def merge_entities(members: List[Tuple[Dict[str, Any], str]]) -> Tuple[Dict[str, Any], str]:
+    """Combine the copies of one entity, read from one or more datasets, into one entity.
+    
+    The copy with the most specific schema (the first one read on a tie) gives the id,
+    caption and schema, and its property values come first; the others add the values
+    not seen yet. Returns the entity and the ' / '-joined names of its datasets.
+    """
+    ranked = sorted(members, key=lambda member: SCHEMA_PRIORITY.get(member[0].get('schema'), len(SCHEMA_PRIORITY)))
+    primary = ranked[0][0]
+    
+    properties = {}
+    for entity, _ in ranked:
+        for prop, values in entity.get('properties', {}).items():
+            merged_values = properties.setdefault(prop, [])
+            for value in as_list(values):
+                if value not in merged_values:
+                    merged_values.append(value)
+    
+    merged = {key: primary[key] for key in ('id', 'caption', 'schema') if key in primary}
+    merged['properties'] = properties
+    
+    first_seen = [entity['first_seen'] for entity, _ in members if entity.get('first_seen')]
+    if first_seen:
+        merged['first_seen'] = min(first_seen)
+    last_change = [entity['last_change'] for entity, _ in members if entity.get('last_change')]
+    if last_change:
+        merged['last_change'] = max(last_change)
+    
+    for key in ('referents', 'datasets'):
+        merged[key] = list(dict.fromkeys(value for entity, _ in members for value in as_list(entity.get(key) or [])))
+    merged['target'] = True
+    merged['merged_from'] = [f"{dataset_name} {entity.get('id', '')}" for entity, dataset_name in members]
+    
+    dataset_names = list(dict.fromkeys(dataset_name for _, dataset_name in members))
+    return merged, ' / '.join(dataset_names)
+
+def entity_record(entity: Dict[str, Any], dataset_name: str, stats: collections.Counter,
+                  timed: bool = False) -> EntityRecord:
+    if timed:
+        start = perf_counter()
+    description = format_entity_description(entity, dataset_name)
+    stats['records'] += 1
+    stats[('records', dataset_name, entity['schema'])] += 1
+    if timed:
+        stats['seconds_format'] += perf_counter() - start
+    return EntityRecord(dataset_name, description, entity.get('id', ''), entity.get('caption', ''))
+
+def iter_merged_entities(data_raw_path: str, stats: Optional[collections.Counter] = None,
+                         timed: bool = False) -> Iterator[EntityRecord]:
+    """Like iter_json_entities, but with the copies of an entity across (and within)
+    datasets merged into one record. Counts merged_groups (records made of more than
+    one entity) and merged_entities (entities folded into those records) in stats."""
+    if stats is None:
+        stats = collections.Counter()
+    
+    print("Grouping entities by id and referents...")
+    groups, entity_keys = group_entities(data_raw_path)
+    group_sizes = collections.Counter(groups.find(key) for key in entity_keys)
+    del entity_keys
+    print(f"Found {len(group_sizes)} distinct entities among {sum(group_sizes.values())} target entities")
+    
+    pending = {}
+    for position, (entity, dataset_name) in enumerate(iter_decoded_entities(data_raw_path, stats, timed)):
+        key = groups.keys.get(entity_key(entity, position))
+        root = groups.find(key) if key is not None else None
+        if root is None or group_sizes[root] == 1:
+            yield entity_record(entity, dataset_name, stats, timed)
+            continue
+        
+        members = pending.setdefault(root, [])
+        members.append((entity, dataset_name))
+        if len(members) == group_sizes[root]:
+            del pending[root]
+            yield merged_record(members, stats, timed)
+    
+    # only left over if the files changed between the two passes
+    for members in pending.values():
+        yield merged_record(members, stats, timed)
+    
+    print(f"Merged {stats['merged_entities']} entities into {stats['merged_groups']} records")
+
+def merged_record(members: List[Tuple[Dict[str, Any], str]], stats: collections.Counter,
+                  timed: bool = False) -> EntityRecord:
+    if len(members) == 1:
+        return entity_record(*members[0], stats, timed)
+    stats['merged_groups'] += 1
+    stats['merged_entities'] += len(members)
+    return entity_record(*merge_entities(members), stats, timed)
+
+def main():
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(description='Show the entities that would be merged across datasets')
+    parser.add_argument('data_raw_path', help='Folder with one <dataset>/entities.ftm.json per dataset')
+    parser.add_argument('--top', type=int, default=10, help='Largest merged records to print')
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    stats = collections.Counter()
+    merged = []
+    for record in iter_merged_entities(args.data_raw_path, stats):
+        merged_from = description_field_values(record.description, "Merged from")
+        if merged_from:
+            merged.append((len(merged_from), record, merged_from))
+    print(f"{stats['records']} records in {time.perf_counter() - start:.1f}s")
+    
+    merged.sort(key=lambda item: -item[0])
+    for _, record, merged_from in merged[:args.top]:
+        print(f"- {record.name}: {', '.join(merged_from)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# incremental rebuilds of the knowledge base: a build manifest remembers the content
+# hash of every input file and, per entity, its last_change and description hash, so a
+# rebuild only re-formats new or changed entities, reuses the previous output for the
+# rest and writes the added/changed/removed delta for downstream vector ingestion.
+
+import collections
+import csv
+import gzip
+import hashlib
+import json
+import os
+from typing import List, Dict, Any, Iterator, Optional
+
+from data_preprocess import (
+    COMPRESSION_SUFFIXES,
+    DEFAULT_OUTPUTS,
+    DESCRIPTION_FORMAT_VERSION,
+    EntityRecord,
+    decode_entity_line,
+    find_entity_files,
+    format_entity_description,
+    iter_tpl_entities,
+    open_entity_lines,
+    print_ingest_stats,
+    stream_results_to_files,
+    zstandard,
+)
+
+MANIFEST_FILE = "build_manifest.json"
+DELTA_FILE = "entity_delta.json"
+DELTA_CSV_FILE = "processed_entities_delta.csv"
+OUTPUT_CSV_FILE = "processed_entities.csv"
+
+TPL_MANIFEST_KEY = "tpl_most_wanted.csv"
+
+def entity_key(source: str, entity_id: str) -> str:
+    # the same FtM id can be published by several datasets with different descriptions
+    return f"{source}|{entity_id}"
+
+def file_sha256(path: str, block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def description_hash(description: str) -> str:
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+def empty_manifest() -> Dict[str, Any]:
+    return {"format_version": DESCRIPTION_FORMAT_VERSION, "files": {}, "entities": {}}
+
+def load_manifest(manifest_path: str) -> Dict[str, Any]:
+    """Load the previous build manifest; a missing manifest or one written for
+    another description format yields an empty one, i.e. a full rebuild."""
+    if not os.path.exists(manifest_path):
+        return empty_manifest()
+    
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    
+    if manifest.get("format_version") != DESCRIPTION_FORMAT_VERSION:
+        print(f"Build manifest {manifest_path} is for another description format, rebuilding everything")
+        return empty_manifest()
+    
+    return manifest
+
+def save_manifest(manifest: Dict[str, Any], manifest_path: str):
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+
+def previous_csv_path(output_dir: str, compression: Optional[str] = None) -> Optional[str]:
+    """The previous processed_entities.csv[.gz|.zst], preferring the current compression
+    in case the previous build was written with another one"""
+    suffixes = [COMPRESSION_SUFFIXES[compression]] + [suffix for suffix in COMPRESSION_SUFFIXES.values()
+                                                       if suffix != COMPRESSION_SUFFIXES[compression]]
+    for suffix in suffixes:
+        path = os.path.join(output_dir, OUTPUT_CSV_FILE + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+def open_previous_csv(csv_path: str):
+    if csv_path.endswith('.gz'):
+        return gzip.open(csv_path, 'rt', newline='', encoding='utf-8-sig')
+    if csv_path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read the previous zstd compressed build")
+        return zstandard.open(csv_path, 'rt', newline='', encoding='utf-8-sig')
+    return open(csv_path, 'r', newline='', encoding='utf-8-sig')
+
+def load_previous_records(csv_path: Optional[str]) -> Dict[str, EntityRecord]:
+    """Index the previous processed_entities.csv[.gz|.zst] by entity key"""
+    records = {}
+    if csv_path is None or not os.path.exists(csv_path):
+        return records
+    
+    csv.field_size_limit(2**31 - 1)
+    with open_previous_csv(csv_path) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for source, entity_id, name, description in reader:
+            records[entity_key(source, entity_id)] = EntityRecord(source, description, entity_id, name)
+    
+    return records
+
+class IncrementalBuild:
+    """State of one incremental build: the previous manifest and output, the
+    manifest being built, and the delta against the previous build.
+    
+    outputs, compression and columnar select the files written as in
+    stream_results_to_files; the csv output is always written, as the next
+    build reuses its records.
+    """
+    
+    def __init__(self, output_dir: str = ".", outputs: Optional[List[str]] = None,
+                 compression: Optional[str] = None, columnar: bool = False):
+        self.output_dir = output_dir
+        self.outputs = list(outputs or DEFAULT_OUTPUTS)
+        if 'csv' not in self.outputs:
+            self.outputs.append('csv')
+        self.compression = compression
+        self.columnar = columnar
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+        self.previous_manifest = load_manifest(self.manifest_path)
+        self.previous_entities = self.previous_manifest["entities"]
+        self.previous_records = {}
+        if self.previous_entities:
+            self.previous_records = load_previous_records(previous_csv_path(output_dir, compression))
+        
+        self.manifest = empty_manifest()
+        self.delta = {"added": [], "changed": [], "removed": []}
+        self.stats = collections.Counter()
+        self._delta_file = None
+        self._delta_writer = None
+    
+    def register(self, key: str, last_change: Optional[str], record: EntityRecord):
+        new_hash = description_hash(record.description)
+        previous = self.previous_entities.get(key)
+        
+        if previous is None:
+            change = "added"
+        elif previous[1] != new_hash:
+            change = "changed"
+        else:
+            change = None
+        
+        if change:
+            self.delta[change].append({"source": record.source, "id": record.id})
+            self._delta_writer.writerow([record.source, record.id, record.name, record.description])
+        
+        self.manifest["entities"][key] = [last_change, new_hash]
+    
+    def _reuse_file(self, file_key: str, digest: str) -> Optional[List[str]]:
+        """Keys of a file whose content is unchanged since the previous build, if
+        all of its records are still available in the previous output"""
+        previous_file = self.previous_manifest["files"].get(file_key)
+        if not previous_file or previous_file["sha256"] != digest:
+            return None
+        if not all(key in self.previous_records for key in previous_file["keys"]):
+            return None
+        return previous_file["keys"]
+    
+    def iter_entity_file(self, folder_name: str, json_file_path: str, dataset_name: str) -> Iterator[EntityRecord]:
+        digest = file_sha256(json_file_path)
+        reused_keys = self._reuse_file(folder_name, digest)
+        
+        if reused_keys is not None:
+            print(f"Unchanged {json_file_path}, reusing {len(reused_keys)} entities")
+            for key in reused_keys:
+                self.manifest["entities"][key] = self.previous_entities[key]
+                self.stats['reused_unchanged_file'] += 1
+                self.stats['records'] += 1
+                yield self.previous_records[key]
+            self.manifest["files"][folder_name] = {"sha256": digest, "keys": reused_keys}
+            return
+        
+        print(f"Processing {json_file_path}...")
+        keys = []
+        with open_entity_lines(json_file_path) as lines:
+            for line in lines:
+                entity = decode_entity_line(line, json_file_path, self.stats)
+                if entity is None:
+                    continue
+                
+                entity_id = entity.get('id', '')
+                key = entity_key(dataset_name, entity_id)
+                last_change = entity.get('last_change')
+                previous = self.previous_entities.get(key)
+                
+                if previous and last_change and previous[0] == last_change and key in self.previous_records:
+                    record = self.previous_records[key]
+                    self.manifest["entities"][key] = previous
+                    self.stats['reused_unchanged_entity'] += 1
+                else:
+                    description = format_entity_description(entity, dataset_name)
+                    record = EntityRecord(dataset_name, description, entity_id, entity.get('caption', ''))
+                    self.register(key, last_change, record)
+                    self.stats['formatted'] += 1
+                
+                self.stats['records'] += 1
+                keys.append(key)
+                yield record
+        
+        print(f"Processed {len(keys)} entities from {folder_name}")
+        self.manifest["files"][folder_name] = {"sha256": digest, "keys": keys}
+    
+    def iter_tpl_file(self, tpl_csv_path: str) -> Iterator[EntityRecord]:
+        # TPL rows carry no last_change and are cheap to format, so they are always re-formatted
+        keys = []
+        for record in iter_tpl_entities(tpl_csv_path):
+            key = entity_key(record.source, record.id)
+            self.register(key, None, record)
+            keys.append(key)
+            yield record
+        self.manifest["files"][TPL_MANIFEST_KEY] = {"sha256": None, "keys": keys}
+    
+    def iter_records(self, data_raw_path: str, tpl_csv_path: Optional[str] = None) -> Iterator[EntityRecord]:
+        for folder_name, json_file_path, dataset_name in find_entity_files(data_raw_path):
+            yield from self.iter_entity_file(folder_name, json_file_path, dataset_name)
+        
+        if tpl_csv_path:
+            yield from self.iter_tpl_file(tpl_csv_path)
+    
+    def run(self, data_raw_path: str, tpl_csv_path: Optional[str] = None) -> Dict[str, List[Dict[str, str]]]:
+        delta_csv_path = os.path.join(self.output_dir, DELTA_CSV_FILE)
+        with open(delta_csv_path, 'w', newline='', encoding='utf-8-sig') as self._delta_file:
+            self._delta_writer = csv.writer(self._delta_file)
+            self._delta_writer.writerow(['Source', 'ID', 'Name', 'Description'])
+            stream_results_to_files(self.iter_records(data_raw_path, tpl_csv_path), self.output_dir, self.columnar,
+                                    self.outputs, self.compression)
+        
+        for key in self.previous_entities.keys() - self.manifest["entities"].keys():
+            source, entity_id = key.split("|", 1)
+            self.delta["removed"].append({"source": source, "id": entity_id})
+        self.delta["removed"].sort(key=lambda item: (item["source"], item["id"]))
+        
+        with open(os.path.join(self.output_dir, DELTA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.delta, f, indent=2, ensure_ascii=False)
+        save_manifest(self.manifest, self.manifest_path)
+        
+        print_ingest_stats(self.stats)
+        print(f"- formatted: {self.stats['formatted']}")
+        print(f"- reused_unchanged_entity: {self.stats['reused_unchanged_entity']}")
+        print(f"- reused_unchanged_file: {self.stats['reused_unchanged_file']}")
+        print(f"Delta: {len(self.delta['added'])} added, {len(self.delta['changed'])} changed, "
+              f"{len(self.delta['removed'])} removed (records in {delta_csv_path})")
+        
+        return self.delta
+
+def incremental_build(data_raw_path: str, output_dir: str = ".", tpl_csv_path: Optional[str] = None,
+                      outputs: Optional[List[str]] = None, compression: Optional[str] = None,
+                      columnar: bool = False) -> Dict[str, List[Dict[str, str]]]:
+    """Rebuild the knowledge base in output_dir against its previous build and
+    return the added/changed/removed entities"""
+    return IncrementalBuild(output_dir, outputs, compression, columnar).run(data_raw_path, tpl_csv_path)
@@ -0,0 +1,98 @@
+# name normalization and phonetic keys, computed once per name and alias at build time
+# (processed_names.csv) and per query by the screening matchers, so both sides agree on
+# the exact keys used for cheap blocking before fuzzy scoring.
+
+import re
+import unicodedata
+from typing import List, NamedTuple
+
+_APOSTROPHES = re.compile(r"['‘’ʼ`´]")
+_SEPARATORS = re.compile(r"[\W_]+")
+_NON_LATIN = re.compile(r"[^A-Z]")
+
+class NameKeys(NamedTuple):
+    normalized: str
+    compact: str
+    sorted_tokens: str
+    phonetic: str
+
+def normalize_name(name: str) -> str:
+    """Case- and accent-folded name with apostrophes removed, other punctuation
+    turned into spaces and single spaces between tokens"""
+    folded = unicodedata.normalize('NFKD', name)
+    folded = ''.join(c for c in folded if not unicodedata.combining(c)).casefold()
+    folded = _APOSTROPHES.sub('', folded)
+    return _SEPARATORS.sub(' ', folded).strip()
+
+def nysiis(token: str) -> str:
+    """NYSIIS phonetic code of one name token (Latin letters only, '' otherwise)"""
+    name = _NON_LATIN.sub('', token.upper())
+    if not name:
+        return ''
+    
+    for prefix, replacement in (('MAC', 'MCC'), ('KN', 'NN'), ('K', 'C'), ('PH', 'FF'), ('PF', 'FF'), ('SCH', 'SSS')):
+        if name.startswith(prefix):
+            name = replacement + name[len(prefix):]
+            break
+    for suffix, replacement in (('EE', 'Y'), ('IE', 'Y'), ('DT', 'D'), ('RT', 'D'), ('RD', 'D'), ('NT', 'D'), ('ND', 'D')):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)] + replacement
+            break
+    
+    chars = list(name)
+    key = chars[0]
+    i = 1
+    while i < len(chars):
+        c = chars[i]
+        if c == 'E' and i + 1 < len(chars) and chars[i + 1] == 'V':
+            chars[i:i + 2] = ['A', 'F']
+        elif c in 'AEIOU':
+            chars[i] = 'A'
+        elif c == 'Q':
+            chars[i] = 'G'
+        elif c == 'Z':
+            chars[i] = 'S'
+        elif c == 'M':
+            chars[i] = 'N'
+        elif c == 'K':
+            chars[i] = 'N' if i + 1 < len(chars) and chars[i + 1] == 'N' else 'C'
+        elif c == 'S' and chars[i + 1:i + 3] == ['C', 'H']:
+            chars[i:i + 3] = ['S', 'S', 'S']
+        elif c == 'P' and i + 1 < len(chars) and chars[i + 1] == 'H':
+            chars[i:i + 2] = ['F', 'F']
+        elif c == 'H' and (chars[i - 1] not in 'AEIOU' or (i + 1 < len(chars) and chars[i + 1] not in 'AEIOU')):
+            chars[i] = chars[i - 1]
+        elif c == 'W' and chars[i - 1] in 'AEIOU':
+            chars[i] = chars[i - 1]
+        
+        if chars[i] != key[-1]:
+            key += chars[i]
+        i += 1
+    
+    if len(key) > 1 and key.endswith('S'):
+        key = key[:-1]
+    if key.endswith('AY'):
+        key = key[:-2] + 'Y'
+    if len(key) > 1 and key.endswith('A'):
+        key = key[:-1]
+    return key
+
+def name_keys(name: str) -> NameKeys:
+    """All precomputed forms of a name:
+    - normalized: folded tokens in their original order
+    - compact: tokens without spaces, insensitive to spacing ("ALBAN ESE")
+    - sorted_tokens: tokens in sorted order, insensitive to token order
+    - phonetic: sorted distinct NYSIIS codes of the tokens
+    """
+    normalized = normalize_name(name)
+    tokens = normalized.split()
+    codes = sorted({code for code in map(nysiis, tokens) if code})
+    return NameKeys(normalized, ''.join(tokens), ' '.join(sorted(tokens)), ' '.join(codes))
+
+def entity_names(name: str, aliases: List[str]) -> List[str]:
+    """Primary name followed by the aliases, without exact duplicates"""
+    names = []
+    for value in [name] + aliases:
+        if value and value not in names:
+            names.append(value)
+    return names
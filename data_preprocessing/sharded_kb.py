@@ -0,0 +1,265 @@
+# sharded knowledge-base output (processed_entities_shards/): the records are partitioned
+# by dataset and schema into size-bounded CSV shards, in the processed_entities.csv format
+# and compressed like the other text outputs, so consumers can read shards in parallel
+# and load only the datasets and schemas they need (vessel screening never has to read
+# a person record).
+#
+# directory layout:
+#   manifest.json                                 written last; lists every shard with its
+#                                                 dataset, schema, record count, byte size
+#                                                 and sha256
+#   <dataset slug>.<schema>.<nnnnn>.csv[.gz|.zst] one shard; nnnnn numbers all shards
+#
+# The whole directory is written next to the previous one and swapped into place once
+# every shard and the manifest are complete.
+#
+# usage: python sharded_kb.py processed_entities_shards [--verify]   (prints the manifest)
+
+import collections
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Iterator, Optional
+
+from data_preprocess import COMPRESSION_SUFFIXES, EntityRecord, description_field_values, open_output, zstandard
+
+SHARDS_DIR = "processed_entities_shards"
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Upper bound of the uncompressed CSV text of one shard (counted in characters, so
+# shards of non-ASCII records can end up somewhat larger in bytes)
+DEFAULT_MAX_SHARD_BYTES = 64 * 1024 * 1024
+
+CSV_HEADER = ['Source', 'ID', 'Name', 'Description']
+
+# TPL descriptions have no Type line; the TPL rows are all people
+DEFAULT_SCHEMA = 'Person'
+
+def record_schema(record: EntityRecord) -> str:
+    schemas = description_field_values(record.description, "Type")
+    return schemas[0] if schemas else DEFAULT_SCHEMA
+
+def dataset_slug(dataset: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', dataset.lower()).strip('_') or 'unknown'
+
+class _Shard:
+    def __init__(self, path: str, dataset: str, schema: str, compression: Optional[str]):
+        self.path = path
+        self.dataset = dataset
+        self.schema = schema
+        self.count = 0
+        self.size = 0
+        self._file = open_output(path, compression, 'utf-8-sig', '')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_HEADER)
+    
+    def write(self, record: EntityRecord, size: int):
+        self.count += 1
+        self.size += size
+        self._writer.writerow([record.source, record.id, record.name, record.description])
+    
+    def close(self):
+        self._file.close()
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ShardedKBWriter:
+    """Stream records into size-bounded shards per (dataset, schema). One shard per
+    partition is open at a time and is closed when the next record would take it over
+    max_shard_bytes; the shards are hashed for the manifest when the stream ends."""
+    
+    def __init__(self, path: str, compression: Optional[str] = None,
+                 max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES):
+        self.path = path
+        self.compression = compression
+        self.max_shard_bytes = max_shard_bytes
+        self.count = 0
+    
+    def __enter__(self):
+        self._tmp_path = self.path + ".tmp"
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+        os.makedirs(self._tmp_path)
+        self._open = {}
+        self._shards = []
+        return self
+    
+    def _new_shard(self, dataset: str, schema: str) -> _Shard:
+        filename = (f"{dataset_slug(dataset)}.{dataset_slug(schema)}.{len(self._shards):05d}.csv"
+                    + COMPRESSION_SUFFIXES[self.compression])
+        shard = _Shard(os.path.join(self._tmp_path, filename), dataset, schema, self.compression)
+        self._shards.append(shard)
+        return shard
+    
+    def write(self, record: EntityRecord):
+        self.count += 1
+        key = (record.source, record_schema(record))
+        # the CSV row: four values, quotes, commas and the line break
+        size = len(record.source) + len(record.id) + len(record.name) + len(record.description) + 11
+        shard = self._open.get(key)
+        if shard is not None and shard.count and shard.size + size > self.max_shard_bytes:
+            shard.close()
+            shard = None
+        if shard is None:
+            shard = self._open[key] = self._new_shard(*key)
+        shard.write(record, size)
+    
+    def manifest(self) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "count": self.count,
+            "compression": self.compression,
+            "max_shard_bytes": self.max_shard_bytes,
+            "columns": CSV_HEADER,
+            "shards": [{
+                "path": os.path.basename(shard.path),
+                "dataset": shard.dataset,
+                "schema": shard.schema,
+                "records": shard.count,
+                "bytes": os.path.getsize(shard.path),
+                "sha256": file_sha256(shard.path),
+            } for shard in self._shards],
+        }
+    
+    def _swap_into_place(self):
+        old_path = self.path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        os.replace(self._tmp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+    
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            for shard in self._open.values():
+                shard.close()
+            if exc_type is None:
+                with open(os.path.join(self._tmp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+                    json.dump(self.manifest(), f, indent=2, ensure_ascii=False)
+                self._swap_into_place()
+        finally:
+            shutil.rmtree(self._tmp_path, ignore_errors=True)
+        return False
+
+def write_sharded_kb(records: Iterable[EntityRecord], path: str, compression: Optional[str] = None,
+                     max_shard_bytes: int = DEFAULT_MAX_SHARD_BYTES) -> int:
+    with ShardedKBWriter(path, compression, max_shard_bytes) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+def shards_dir(path: str) -> str:
+    """The shard directory, given either the directory or its manifest.json"""
+    return os.path.dirname(path) if os.path.basename(path) == MANIFEST_FILE else path
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    with open(os.path.join(shards_dir(path), MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"{path}: unsupported shard manifest version {manifest.get('version')}")
+    return manifest
+
+def select_shards(manifest: Dict[str, Any], datasets: Optional[Iterable[str]] = None,
+                  schemas: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Manifest entries of the shards holding the given datasets and schemas (all when
+    None). A merged record's source lists its datasets joined by ' / ' and is selected
+    by any of them."""
+    datasets = set(datasets) if datasets is not None else None
+    schemas = set(schemas) if schemas is not None else None
+    return [shard for shard in manifest["shards"]
+            if (datasets is None or datasets.intersection(shard["dataset"].split(' / ')))
+            and (schemas is None or shard["schema"] in schemas)]
+
+def open_shard(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd compressed shards")
+        return zstandard.open(path, 'rt', encoding='utf-8-sig', newline='')
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+def verify_shard(path: str, shard: Dict[str, Any]):
+    shard_path = os.path.join(shards_dir(path), shard["path"])
+    if os.path.getsize(shard_path) != shard["bytes"] or file_sha256(shard_path) != shard["sha256"]:
+        raise ValueError(f"{shard_path} does not match its manifest entry")
+
+def iter_shard_records(path: str, shard: Dict[str, Any], verify: bool = False) -> Iterator[EntityRecord]:
+    """Records of one shard of the shard directory at path"""
+    if verify:
+        verify_shard(path, shard)
+    csv.field_size_limit(2**31 - 1)
+    with open_shard(os.path.join(shards_dir(path), shard["path"])) as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for source, entity_id, name, description in reader:
+            yield EntityRecord(source, description, entity_id, name)
+
+def read_shard(path: str, shard: Dict[str, Any], verify: bool = False) -> List[EntityRecord]:
+    return list(iter_shard_records(path, shard, verify))
+
+def iter_sharded_kb(path: str, datasets: Optional[Iterable[str]] = None, schemas: Optional[Iterable[str]] = None,
+                    workers: int = 1, verify: bool = False) -> Iterator[EntityRecord]:
+    """Records of the selected shards in manifest order.
+    
+    workers > 1 parses that many shards at a time in a process pool; at most two
+    shards per worker are in flight, so a slow consumer holds only a few parsed
+    shards in memory.
+    """
+    shards = select_shards(load_manifest(path), datasets, schemas)
+    if workers == 1 or len(shards) < 2:
+        for shard in shards:
+            yield from iter_shard_records(path, shard, verify)
+        return
+    
+    workers = min(workers, len(shards))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        shard_iter = iter(shards)
+        
+        while True:
+            while len(pending) < workers * 2:
+                shard = next(shard_iter, None)
+                if shard is None:
+                    break
+                pending.append(executor.submit(read_shard, path, shard, verify))
+            
+            if not pending:
+                break
+            yield from pending.popleft().result()
+
+def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Show the shards of a sharded knowledge base')
+    parser.add_argument('path', nargs='?', default=SHARDS_DIR, help='Shard directory or its manifest.json')
+    parser.add_argument('--verify', action='store_true', help='Check the byte size and sha256 of every shard')
+    args = parser.parse_args()
+    
+    manifest = load_manifest(args.path)
+    print(f"{manifest['count']} records in {len(manifest['shards'])} shards, built {manifest['created_at']}")
+    totals = {}
+    for shard in manifest["shards"]:
+        records, size = totals.get((shard["dataset"], shard["schema"]), (0, 0))
+        totals[(shard["dataset"], shard["schema"])] = (records + shard["records"], size + shard["bytes"])
+        if args.verify:
+            verify_shard(args.path, shard)
+    for (dataset, schema), (records, size) in sorted(totals.items()):
+        print(f"- {dataset}, {schema}: {records} records, {size / 1024 / 1024:.1f} MB")
+    if args.verify:
+        print("All shards match the manifest")
+
+if __name__ == "__main__":
+    main()